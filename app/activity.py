@@ -0,0 +1,248 @@
+"""Buffered activity log writer.
+
+Routes record audit events through ``activity_log.record`` instead of calling
+``store.log_activity`` directly. In ``async`` mode events go onto a bounded
+in-memory queue and a background thread writes them to the store in batches,
+so audit logging no longer adds a connection and a commit to every mutating
+request. ``sync`` mode keeps the old write-through behaviour.
+
+Reads that must see recent events (the timeline) call ``wait_for_queued``:
+it waits, bounded, for the background thread to write what was queued
+before the read, and never writes or sleeps in the request thread itself.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.storage import store
+
+logger = logging.getLogger(__name__)
+
+# pause before the background thread retries a failed batch; inline writes retry at once
+_RETRY_DELAY = 0.5
+
+
+class ActivityLogWriter:
+    """Bounded queue of activity events flushed to the store in batches."""
+
+    def __init__(
+        self,
+        store,
+        mode: str = "async",
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: str = "sync",
+        read_wait: float = 1.0,
+        retention_days: int = 0,
+        rollup: bool = True,
+        maintenance_interval: float = 3600.0,
+    ):
+        self._store = store
+        self.mode = mode
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.read_wait = read_wait
+        self.retention_days = retention_days
+        self.rollup = rollup
+        self.maintenance_interval = maintenance_interval
+        self._last_maintenance = time.monotonic()
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # events queued and events handled (written or dropped) by the background thread, for wait_for_queued
+        self._progress = threading.Condition()
+        self._queued = 0
+        self._handled = 0
+        self.written = 0
+        self.dropped = 0
+
+    # Lifecycle -----------------------------------------------------------
+    def start(self) -> None:
+        """Start the background thread (it also runs partition maintenance in sync mode)."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the background thread and write everything still buffered."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    # Recording -----------------------------------------------------------
+    def record(
+        self,
+        owner: str,
+        action: str,
+        resource_type: str,
+        resource_id: Optional[int] = None,
+        resource_name: Optional[str] = None,
+        details: Optional[str] = None,
+        case_id: Optional[int] = None,
+    ) -> None:
+        event = self._event(owner, action, resource_type, resource_id, resource_name, details, case_id)
+        if self.mode != "async" or not self._enqueue(event):
+            self._write([event])
+
+    async def arecord(
+        self,
+        owner: str,
+        action: str,
+        resource_type: str,
+        resource_id: Optional[int] = None,
+        resource_name: Optional[str] = None,
+        details: Optional[str] = None,
+        case_id: Optional[int] = None,
+    ) -> None:
+        """``record`` for ``async def`` routes: queueing stays on the loop, inline writes go to a thread."""
+        event = self._event(owner, action, resource_type, resource_id, resource_name, details, case_id)
+        if self.mode != "async" or not self._enqueue(event):
+            await run_in_threadpool(self._write, [event])
+
+    def flush(self) -> int:
+        """Drain the queue in the calling thread. Returns the number of events written."""
+        total = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return total
+            total += self._write_queued(batch)
+
+    def wait_for_queued(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to ``timeout`` (default ``read_wait``) seconds until the events queued so far are written.
+
+        Returns True if they were. Events queued after the call are not waited for.
+        """
+        with self._progress:
+            target = self._queued
+            return self._progress.wait_for(
+                lambda: self._handled >= target, self.read_wait if timeout is None else timeout
+            )
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def maintain(self) -> None:
+        """Roll activity partitions forward and apply the retention policy."""
+        self._last_maintenance = time.monotonic()
+        try:
+            dropped = self._store.maintain_activity_logs(self.retention_days, self.rollup)
+            if dropped:
+                logger.info("Dropped expired activity log partitions: %s", ", ".join(dropped))
+        except Exception:
+            logger.exception("Activity log maintenance failed")
+
+    # Internals -----------------------------------------------------------
+    @staticmethod
+    def _event(
+        owner: str,
+        action: str,
+        resource_type: str,
+        resource_id: Optional[int],
+        resource_name: Optional[str],
+        details: Optional[str],
+        case_id: Optional[int],
+    ) -> dict:
+        return {
+            "owner": owner,
+            "action": action,
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "resource_name": resource_name,
+            "details": details,
+            "case_id": case_id,
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    def _enqueue(self, event: dict) -> bool:
+        """Queue ``event`` for the background thread; False if it has to be written inline instead."""
+        self.start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            if self.overflow != "drop":
+                return False
+            self.dropped += 1
+            logger.warning("Activity log queue full; dropped event %s %s", event["action"], event["resource_type"])
+            return True
+        with self._progress:
+            self._queued += 1
+        return True
+
+    def _drain(self, limit: int) -> List[dict]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if time.monotonic() - self._last_maintenance >= self.maintenance_interval:
+                self.maintain()
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first] + self._drain(self.batch_size - 1)
+            self._write_queued(batch, _RETRY_DELAY)
+
+    def _write_queued(self, batch: List[dict], retry_delay: float = 0.0) -> int:
+        try:
+            return self._write(batch, retry_delay)
+        finally:
+            with self._progress:
+                self._handled += len(batch)
+                self._progress.notify_all()
+
+    def _write(self, batch: List[dict], retry_delay: float = 0.0) -> int:
+        for attempt in range(2):
+            try:
+                written = self._store.log_activities(batch)
+                self.written += written
+                return written
+            except Exception:
+                if attempt == 0:
+                    time.sleep(retry_delay)
+                    continue
+                self.dropped += len(batch)
+                logger.exception("Failed to write %d activity log events", len(batch))
+        return 0
+
+
+def _build_writer() -> ActivityLogWriter:
+    settings = get_settings()
+    return ActivityLogWriter(
+        store,
+        mode=settings.activity_log_mode,
+        queue_size=settings.activity_log_queue_size,
+        batch_size=settings.activity_log_batch_size,
+        flush_interval=settings.activity_log_flush_interval,
+        overflow=settings.activity_log_overflow,
+        read_wait=settings.activity_log_read_wait,
+        retention_days=settings.activity_log_retention_days,
+        rollup=settings.activity_log_rollup,
+    )
+
+
+activity_log = _build_writer()
@@ -0,0 +1,123 @@
+"""Structured entity attributes and the filter/sort syntax for querying them.
+
+Transforms store what a provider returned (scores, ASNs, countries, counts)
+in ``entities.attributes``, a JSON object, next to the human-readable
+``description``. Attribute writes merge into the object key by key; a
+``None`` value removes its key.
+
+List endpoints filter with ``attr`` expressions and order with ``attr_sort``:
+
+- ``abuse_score>80``, ``open_ports>=10``, ``country=US``, ``verdict!=clean``
+- ``registrant.country=RU`` (dotted paths reach into nested objects)
+- ``asn`` (the attribute is present)
+- ``attr_sort=-abuse_score`` (descending; entities without it sort last)
+
+Values are read as JSON when they parse (``80``, ``true``, ``"80"``) and as
+plain strings otherwise. Range comparisons only match values of the same
+JSON type, so ``abuse_score>80`` never matches a string. Each backend turns
+these into SQL, so filtering and sorting never load rows into Python.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+# Numeric attributes that get an expression index for range filters and sorting;
+# equality and containment go through the GIN index on the whole object.
+INDEXED_ATTRIBUTES = ("abuse_score", "malicious", "open_ports", "verdict_score")
+
+RANGE_OPS = (">", ">=", "<", "<=")
+_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_FILTER = re.compile(r"^\s*(?P<path>[^<>=!\s]+)\s*(?:(?P<op>>=|<=|!=|=|>|<)\s*(?P<value>.*?))?\s*$")
+
+
+@dataclass(frozen=True)
+class AttributeFilter:
+    path: Tuple[str, ...]
+    op: str  # "exists", "=", "!=", ">", ">=", "<" or "<="
+    value: Any = None
+
+
+@dataclass(frozen=True)
+class AttributeSort:
+    path: Tuple[str, ...]
+    descending: bool = False
+
+
+def parse_path(text: str) -> Tuple[str, ...]:
+    path = tuple(text.split("."))
+    # keys are inlined into SQL (so the expression indexes match), hence the strict check
+    if not all(_KEY.match(key) for key in path) or len(path) > 8:
+        raise ValueError(f"Invalid attribute path '{text}'")
+    return path
+
+
+def parse_value(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_filter(expr: str) -> AttributeFilter:
+    match = _FILTER.match(expr or "")
+    if not match:
+        raise ValueError(f"Invalid attribute filter '{expr}'")
+    path = parse_path(match["path"])
+    if match["op"] is None:
+        return AttributeFilter(path, "exists")
+    value = parse_value(match["value"])
+    if match["op"] in RANGE_OPS and (isinstance(value, bool) or not isinstance(value, (int, float, str))):
+        raise ValueError(f"'{match['op']}' needs a number or a string in '{expr}'")
+    return AttributeFilter(path, match["op"], value)
+
+
+def parse_sort(expr: str) -> AttributeSort:
+    expr = (expr or "").strip()
+    descending = expr.startswith("-")
+    return AttributeSort(parse_path(expr.lstrip("-+")), descending)
+
+
+def json_type(value: Any) -> str:
+    """The ``jsonb_typeof`` name of a filter value."""
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "null" if value is None else ("array" if isinstance(value, list) else "object")
+
+
+def nest(path: Tuple[str, ...], value: Any) -> dict:
+    """``("a", "b"), 1`` -> ``{"a": {"b": 1}}``, the containment form of an equality filter."""
+    for key in reversed(path):
+        value = {key: value}
+    return value
+
+
+def clean_attributes(attributes: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {key: value for key, value in (attributes or {}).items() if value is not None}
+
+
+def merge_attributes(current: Optional[Dict[str, Any]], patch: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(current or {})
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+def attribute_changes(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """``{key: {"old": ..., "new": ...}}`` for each top-level key whose value differs (missing is None)."""
+    before, after = before or {}, after or {}
+    return {
+        key: {"old": before.get(key), "new": after.get(key)}
+        for key in sorted(before.keys() | after.keys())
+        if before.get(key) != after.get(key)
+    }
@@ -0,0 +1,305 @@
+"""Cache tier shared by the workers of one deployment.
+
+``cache`` is selected by ``APP_CACHE_URL``:
+
+- ``memory://`` (default): a bounded per-process LRU. Fine for one worker;
+  with several, each keeps its own copy and Postgres NOTIFY keeps them honest.
+- ``sqlite:///dev/shm/ghostlock-cache.db``: a WAL-mode SQLite file that every
+  worker on the node reads and writes, so a value loaded by one worker is
+  served by all of them. ``/dev/shm`` keeps it in memory.
+- ``redis://host:6379/0``: any Redis-compatible server (needs the optional
+  ``redis`` package).
+
+Values are bytes; callers serialize (JSON for models, ``CaseGraph.to_bytes``
+for graphs). ``shared`` tells callers whether other workers see the same
+entries, e.g. so ETag counters can live here instead of in each process.
+``lookup``/``remember``/``cached`` are the read-through helpers for callers
+that must keep working (straight from the database) when the tier is down.
+``alookup``/``aremember`` are their awaitable forms for ``async def`` code:
+a shared tier is a blocking SQLite or Redis call, so it runs in a worker
+thread instead of on the event loop.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import anyio
+
+from app.config import get_settings
+
+try:
+    import redis
+except ImportError:  # optional: only needed for redis:// cache URLs
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Key prefixes, kept here so writers and readers agree.
+USER_KEY = "user:{}"
+API_KEYS_KEY = "apikeys:{}"
+GRAPH_KEY = "graph:{}:{}:{}"
+GRAPH_GENERATION_KEY = "graphgen:{}:{}"
+
+
+class CacheBackend(ABC):
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None: ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes) -> bool:
+        """Set ``key`` only if it is absent; returns whether it was set."""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Atomically increment a counter (missing counters start at 0) and return it."""
+
+    @abstractmethod
+    def counters(self, *keys: str) -> List[int]:
+        """Current values of several counters, 0 for missing ones."""
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[object, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _put(self, key: str, value, ttl: Optional[float]) -> None:
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._live(key)
+        return value if isinstance(value, bytes) else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def add(self, key: str, value: bytes) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._put(key, value, None)
+            return True
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = (self._live(key) or 0) + 1
+            self._put(key, value, None)
+            return value
+
+    def counters(self, *keys: str) -> List[int]:
+        with self._lock:
+            return [self._live(key) or 0 for key in keys]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache(CacheBackend):
+    """Node-local cache in a WAL-mode SQLite file shared by every worker process."""
+
+    shared = True
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        os.register_at_fork(after_in_child=self._forget_connections)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+
+    def _forget_connections(self) -> None:
+        # a connection must never be used on both sides of a fork
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def _after_write(self, conn: sqlite3.Connection) -> None:
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            conn.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone()
+        return row[0] if row and isinstance(row[0], bytes) else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+        self._after_write(conn)
+
+    def add(self, key: str, value: bytes) -> bool:
+        conn = self._connect()
+        conn.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, time.time()))
+        return conn.execute(
+            "INSERT INTO cache (key, value) VALUES (?, ?) ON CONFLICT(key) DO NOTHING", (key, value)
+        ).rowcount == 1
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._connect().execute(
+                f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(keys))})", keys
+            )
+
+    def incr(self, key: str) -> int:
+        return self._connect().execute(
+            """INSERT INTO cache (key, value) VALUES (?, 1)
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+            RETURNING value""",
+            (key,),
+        ).fetchone()[0]
+
+    def counters(self, *keys: str) -> List[int]:
+        rows = dict(self._connect().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({', '.join('?' * len(keys))})", keys
+        ).fetchall())
+        return [int(rows.get(key) or 0) for key in keys]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+
+class RedisCache(CacheBackend):
+    shared = True
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("APP_CACHE_URL points at Redis but the redis package is not installed")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: bytes) -> bool:
+        return bool(self._client.set(key, value, nx=True))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._client.delete(*keys)
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+    def counters(self, *keys: str) -> List[int]:
+        return [int(v or 0) for v in self._client.mget(keys)]
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def create_cache(url: str = None) -> CacheBackend:
+    url = url if url is not None else get_settings().cache_url
+    parsed = urlparse(url or "memory://")
+    if parsed.scheme == "memory":
+        return MemoryCache()
+    if parsed.scheme == "sqlite":
+        return SQLiteCache(parsed.path)
+    if parsed.scheme in ("redis", "rediss", "unix"):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported cache URL: {url}")
+
+
+cache = create_cache()
+
+
+def lookup(key: str) -> Optional[bytes]:
+    try:
+        return cache.get(key)
+    except Exception:
+        logger.exception("Cache read failed for %s", key)
+        return None
+
+
+def remember(key: str, value: bytes, ttl: Optional[float] = None) -> None:
+    try:
+        cache.set(key, value, ttl if ttl is not None else get_settings().cache_ttl)
+    except Exception:
+        logger.exception("Cache write failed for %s", key)
+
+
+def cached(key: str, load: Callable[[], Optional[bytes]], ttl: Optional[float] = None) -> Optional[bytes]:
+    """Return the cached value of ``key``, calling ``load`` on a miss and caching what it returns (unless None)."""
+    value = lookup(key)
+    if value is None:
+        value = load()
+        if value is not None:
+            remember(key, value, ttl)
+    return value
+
+
+async def alookup(key: str) -> Optional[bytes]:
+    if not cache.shared:
+        return lookup(key)
+    return await anyio.to_thread.run_sync(lookup, key)
+
+
+async def aremember(key: str, value: bytes, ttl: Optional[float] = None) -> None:
+    if not cache.shared:
+        remember(key, value, ttl)
+        return
+    await anyio.to_thread.run_sync(remember, key, value, ttl)
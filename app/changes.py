@@ -0,0 +1,105 @@
+"""Per-owner change counters for conditional GETs.
+
+Every store write bumps the owner's counter after its transaction commits.
+An owner's JSON GET responses are tagged with an ETag built from the process
+boot id, that counter and the request target. So while nothing changes for
+an owner, a revalidation can be answered with 304 before the route or the
+database is touched. The boot id rolls over on restart, which invalidates
+every outstanding tag, so counters never need to be persisted.
+
+With several workers the counters must agree between them, or a tag minted
+by one worker would be wrongly confirmed by another. When the cache tier is
+shared the counters and boot id live there; otherwise each process keeps
+its own and writes made by other processes reach it through ``observe``
+(called by the NOTIFY listener).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import uuid
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+import anyio
+
+from app.cache import CacheBackend, cache
+
+_EPOCH_KEY = "changes:*"
+_OWNER_KEY = "changes:{}"
+_BOOT_KEY = "changes:boot"
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeTracker:
+    def __init__(self, shared: Optional[CacheBackend] = None):
+        self._shared = shared if shared is not None and shared.shared else None
+        self._versions: Dict[str, int] = {}
+        # bumped for changes that are not attributable to one owner (e.g. retention drops)
+        self._epoch = 0
+        self._lock = Lock()
+        self._reboot()
+        os.register_at_fork(after_in_child=self._reboot)
+
+    def _reboot(self) -> None:
+        boot_id = uuid.uuid4().hex[:12]
+        if self._shared is not None:
+            # the first process to start claims the id; the others adopt it
+            self._shared.add(_BOOT_KEY, boot_id.encode())
+            boot_id = (self._shared.get(_BOOT_KEY) or boot_id.encode()).decode()
+        self.boot_id = boot_id
+
+    def bump(self, owner: str) -> None:
+        if self._shared is not None:
+            self._incr(_OWNER_KEY.format(owner))
+            return
+        with self._lock:
+            self._versions[owner] = self._versions.get(owner, 0) + 1
+
+    def bump_all(self) -> None:
+        if self._shared is not None:
+            self._incr(_EPOCH_KEY)
+            return
+        with self._lock:
+            self._epoch += 1
+
+    def _incr(self, key: str) -> None:
+        # called after the write committed: a cache outage must not fail the request
+        try:
+            self._shared.incr(key)
+        except Exception:
+            logger.exception("Could not bump shared change counter %s", key)
+
+    def observe(self, owner: str) -> None:
+        """Record a change made by another process (a no-op when counters are shared)."""
+        if self._shared is None:
+            self.bump(owner)
+
+    def observe_all(self) -> None:
+        if self._shared is None:
+            self.bump_all()
+
+    def version(self, owner: str) -> Tuple[int, int]:
+        if self._shared is not None:
+            epoch, counter = self._shared.counters(_EPOCH_KEY, _OWNER_KEY.format(owner))
+            return epoch, counter
+        with self._lock:
+            return self._epoch, self._versions.get(owner, 0)
+
+    def etag(self, owner: str, target: str) -> str:
+        """Weak ETag for ``target`` (path + query) as seen by ``owner`` right now."""
+        epoch, counter = self.version(owner)
+        digest = hashlib.blake2b(f"{owner}\0{target}".encode(), digest_size=8).hexdigest()
+        return f'W/"{self.boot_id}.{epoch}.{counter}.{digest}"'
+
+    async def aetag(self, owner: str, target: str) -> str:
+        """``etag`` for async code; shared counters are read in a worker thread, off the event loop."""
+        if self._shared is None:
+            return self.etag(owner, target)
+        return await anyio.to_thread.run_sync(self.etag, owner, target)
+
+
+changes = ChangeTracker(cache)
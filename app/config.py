@@ -22,14 +22,212 @@ class Settings(BaseSettings):
         description="Origins allowed by CORS middleware.",
         env="APP_ALLOW_ORIGINS",
     )
+    storage_backend: str = Field(
+        "postgres",
+        description="'postgres' (uses DATABASE_URL) or 'sqlite' for an embedded single-node database.",
+        env="APP_STORAGE_BACKEND",
+    )
+    sqlite_path: str = Field(
+        "ghostlock.db", description="Database file used by the sqlite storage backend.", env="APP_SQLITE_PATH"
+    )
+    db_pool_min_size: int = Field(
+        1, description="Postgres connections opened when the store starts.", env="APP_DB_POOL_MIN_SIZE"
+    )
+    db_pool_max_size: int = Field(
+        20, description="Upper bound on pooled Postgres connections per worker.", env="APP_DB_POOL_MAX_SIZE"
+    )
+    store_max_concurrency: int = Field(
+        40,
+        description="Storage calls from async routes running at once; further requests wait without holding a thread.",
+        env="APP_STORE_MAX_CONCURRENCY",
+    )
+    activity_log_mode: str = Field(
+        "async",
+        description="'async' buffers activity events and writes them in batches; 'sync' writes each event inline.",
+        env="APP_ACTIVITY_LOG_MODE",
+    )
+    activity_log_queue_size: int = Field(
+        10000, description="Maximum number of buffered activity events.", env="APP_ACTIVITY_LOG_QUEUE_SIZE"
+    )
+    activity_log_batch_size: int = Field(
+        500, description="Maximum number of activity events written per batch.", env="APP_ACTIVITY_LOG_BATCH_SIZE"
+    )
+    activity_log_flush_interval: float = Field(
+        1.0, description="Seconds between background activity log flushes.", env="APP_ACTIVITY_LOG_FLUSH_INTERVAL"
+    )
+    activity_log_read_wait: float = Field(
+        1.0,
+        description="Longest a timeline read waits for already-queued activity events to be written.",
+        env="APP_ACTIVITY_LOG_READ_WAIT",
+    )
+    activity_log_overflow: str = Field(
+        "sync",
+        description="What to do when the activity queue is full: 'sync' writes the event inline, 'drop' discards it.",
+        env="APP_ACTIVITY_LOG_OVERFLOW",
+    )
+    activity_log_retention_days: int = Field(
+        0,
+        description="Drop activity log partitions older than this many days (0 keeps history forever).",
+        env="APP_ACTIVITY_LOG_RETENTION_DAYS",
+    )
+    activity_log_rollup: bool = Field(
+        True,
+        description="Fold daily activity counts into activity_log_rollups before dropping a partition.",
+        env="APP_ACTIVITY_LOG_ROLLUP",
+    )
+
+    cache_url: str = Field(
+        "memory://",
+        description="Cache tier for principals, API keys and graphs: memory://, sqlite:///path or redis://host:port/db.",
+        env="APP_CACHE_URL",
+    )
+    cache_ttl: int = Field(300, description="Seconds cached principals, API keys and graphs stay valid.", env="APP_CACHE_TTL")
+    cache_invalidation: bool = Field(
+        True,
+        description="LISTEN for Postgres NOTIFY invalidations (or poll the SQLite change log) so other processes' "
+        "writes reach this process's caches.",
+        env="APP_CACHE_INVALIDATION",
+    )
+
+    transform_job_max_attempts: int = Field(
+        5, description="Attempts before a transform job is dead-lettered.", env="APP_TRANSFORM_JOB_MAX_ATTEMPTS"
+    )
+    transform_job_lease_seconds: int = Field(
+        120,
+        description="Seconds a claimed job stays leased without a heartbeat before another worker may take it.",
+        env="APP_TRANSFORM_JOB_LEASE_SECONDS",
+    )
+    transform_job_retry_delay: float = Field(
+        15.0,
+        description="Seconds before the first retry of a failed job; doubles with each attempt.",
+        env="APP_TRANSFORM_JOB_RETRY_DELAY",
+    )
+    transform_fresh_hours: float = Field(
+        0.0,
+        description="Queued and enrichment runs skip a transform that succeeded on the entity within this many "
+        "hours (0 to always run).",
+        env="APP_TRANSFORM_FRESH_HOURS",
+    )
+    refresh_transforms: List[str] = Field(
+        default_factory=list,
+        description="Transforms (by name, comma-separated) that workers re-run on entities whose last run is stale.",
+        env="APP_REFRESH_TRANSFORMS",
+    )
+    refresh_stale_hours: float = Field(
+        24.0, description="Hours after its last run before a transform is re-run on an entity.",
+        env="APP_REFRESH_STALE_HOURS",
+    )
+    refresh_interval: float = Field(
+        300.0, description="Seconds between scans for stale entities; queued refreshes are spread over it.",
+        env="APP_REFRESH_INTERVAL",
+    )
+    refresh_max_per_hour: int = Field(
+        60, description="Refresh jobs queued per transform per hour, across all workers.",
+        env="APP_REFRESH_MAX_PER_HOUR",
+    )
+    worker_concurrency: int = Field(
+        8, description="Transform jobs one worker process runs at once.", env="APP_WORKER_CONCURRENCY"
+    )
+    worker_poll_interval: float = Field(
+        1.0, description="Seconds an idle worker waits before polling for jobs again.", env="APP_WORKER_POLL_INTERVAL"
+    )
+
+    provider_breaker_window: int = Field(
+        20, description="Recent calls per provider the circuit breaker judges.", env="APP_PROVIDER_BREAKER_WINDOW"
+    )
+    provider_breaker_min_calls: int = Field(
+        5, description="Calls in the window before a provider's breaker may open.", env="APP_PROVIDER_BREAKER_MIN_CALLS"
+    )
+    provider_breaker_failure_rate: float = Field(
+        0.5,
+        description="Share of failed calls (timeouts, connection errors, 5xx, 429) that opens a provider's breaker.",
+        env="APP_PROVIDER_BREAKER_FAILURE_RATE",
+    )
+    provider_breaker_slow_call_seconds: float = Field(
+        15.0, description="Calls slower than this count as slow.", env="APP_PROVIDER_BREAKER_SLOW_CALL_SECONDS"
+    )
+    provider_breaker_slow_call_rate: float = Field(
+        0.5, description="Share of slow calls that opens a provider's breaker.", env="APP_PROVIDER_BREAKER_SLOW_CALL_RATE"
+    )
+    provider_breaker_open_seconds: float = Field(
+        30.0,
+        description="Seconds an open breaker fails fast before letting one probe call through.",
+        env="APP_PROVIDER_BREAKER_OPEN_SECONDS",
+    )
+    provider_max_concurrency: int = Field(
+        8,
+        description="Calls to one provider in flight at once per process; more fail fast (0 for no limit).",
+        env="APP_PROVIDER_MAX_CONCURRENCY",
+    )
+
+    enrichment_budget: int = Field(
+        25, description="Default number of provider runs one enrichment may start.", env="APP_ENRICHMENT_BUDGET"
+    )
+    enrichment_concurrency: int = Field(
+        4, description="Provider runs one enrichment keeps in flight at once.", env="APP_ENRICHMENT_CONCURRENCY"
+    )
+
+    ip_intel_dir: str = Field(
+        "", description="Directory of offline IP intelligence datasets (country, ASN, blocklists).",
+        env="APP_IP_INTEL_DIR",
+    )
+    ip_intel_check_interval: float = Field(
+        30.0, description="Seconds between checks for updated IP intelligence dataset files.",
+        env="APP_IP_INTEL_CHECK_INTERVAL",
+    )
+    hash_reputation_dir: str = Field(
+        "", description="Directory of known_bad/ and known_good/ hash list files checked before VirusTotal.",
+        env="APP_HASH_REPUTATION_DIR",
+    )
+    hash_reputation_check_interval: float = Field(
+        30.0, description="Seconds between checks for updated hash list files.",
+        env="APP_HASH_REPUTATION_CHECK_INTERVAL",
+    )
+
+    raw_response_archive: bool = Field(
+        True, description="Archive the raw provider responses transforms fetch.", env="APP_RAW_RESPONSE_ARCHIVE"
+    )
+    raw_response_compression_level: int = Field(
+        6,
+        description="Compression level for archived responses (zstd 1-22 when installed, else zlib 1-9).",
+        env="APP_RAW_RESPONSE_COMPRESSION_LEVEL",
+    )
+    raw_response_prune_interval: float = Field(
+        3600.0,
+        description="Seconds between worker sweeps that drop archived responses no entity links to (0 to never prune).",
+        env="APP_RAW_RESPONSE_PRUNE_INTERVAL",
+    )
+
+    graph_cache_entries: int = Field(
+        256, description="Maximum number of case graphs held in memory.", env="APP_GRAPH_CACHE_ENTRIES"
+    )
+    graph_cache_mb: int = Field(
+        256, description="Memory budget in MiB for cached case graphs.", env="APP_GRAPH_CACHE_MB"
+    )
+
+    compression_min_size: int = Field(
+        1024, description="Responses smaller than this many bytes are sent uncompressed.", env="APP_COMPRESSION_MIN_SIZE"
+    )
+    gzip_level: int = Field(6, description="gzip compression level (1-9).", env="APP_GZIP_LEVEL")
+    brotli_quality: int = Field(
+        5, description="Brotli quality (0-11) when the optional brotli package is installed.", env="APP_BROTLI_QUALITY"
+    )
+    static_max_age: int = Field(
+        31536000,
+        description="Cache lifetime in seconds for content-hashed static asset URLs.",
+        env="APP_STATIC_MAX_AGE",
+    )
+    json_etags: bool = Field(
+        True, description="Tag JSON GET responses with per-owner change ETags and answer 304s.", env="APP_JSON_ETAGS"
+    )
 
     class Config:
         env_file = ".env"
 
         @classmethod
         def parse_env_var(cls, field_name: str, raw_value: str):  # type: ignore[override]
-            if field_name == "allow_origins":
-                return [origin.strip() for origin in raw_value.split(",") if origin.strip()]
+            if field_name in ("allow_origins", "refresh_transforms"):
+                return [item.strip() for item in raw_value.split(",") if item.strip()]
             return raw_value
 
 
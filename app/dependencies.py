@@ -3,14 +3,15 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from app.cache import USER_KEY, alookup, aremember
 from app.schemas import UserPublic
 from app.security import decode_access_token
-from app.storage import store
+from app.storage import astore
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPublic:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPublic:
     try:
         payload = decode_access_token(token)
         username: str | None = payload.get("sub")
@@ -20,8 +21,14 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPublic:
     if username is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
-    user = store.get_user(username)
+    key = USER_KEY.format(username)
+    cached = await alookup(key)
+    if cached is not None:
+        return UserPublic.parse_raw(cached)
+
+    user = await astore.get_user(username)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
+    await aremember(key, user.json().encode())
     return user
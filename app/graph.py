@@ -0,0 +1,255 @@
+"""Server-side traversal over a case's entity/relationship graph.
+
+Relationships are treated as undirected for traversal. All walks are
+bounded by depth, total node count and per-node fan-out so a single hub in
+a large case cannot blow up a request.
+"""
+
+from __future__ import annotations
+
+import itertools
+import struct
+from array import array
+from bisect import bisect_left
+from collections import deque
+from threading import Lock
+from typing import Iterable, List, Optional, Set, Tuple
+
+_graph_tokens = itertools.count(1)
+
+
+class CaseGraph:
+    """Array-backed adjacency for one case.
+
+    Node ids and the edge list live in flat ``array('q')`` buffers; neighbour
+    lookups go through a CSR index (``offsets`` into ``adj_nodes``/``adj_edges``)
+    that is rebuilt lazily after edges are appended. This keeps a 100k-edge
+    case to a few megabytes instead of a dict of Python tuples.
+    """
+
+    def __init__(self, case_id: int, node_ids: Iterable[int], edges: Iterable[Tuple[int, int, int]]):
+        self.case_id = case_id
+        # (token, version) identifies this exact graph state for derived caches such as analytics
+        self.token = next(_graph_tokens)
+        self.version = 0
+        self.edge_ids = array("q")
+        self.edge_src = array("q")
+        self.edge_dst = array("q")
+        for rel_id, source, target in edges:
+            self.edge_ids.append(rel_id)
+            self.edge_src.append(source)
+            self.edge_dst.append(target)
+        self.nodes = array("q", sorted(set(node_ids).union(self.edge_src, self.edge_dst)))
+        # (nodes, offsets, adj_nodes, adj_edges) snapshot, swapped in as one attribute so
+        # readers never see a mix of old and new buffers while the cache appends edges.
+        self._csr: Optional[Tuple[array, array, array, array]] = None
+        self._lock = Lock()
+
+    # Mutation -------------------------------------------------------------
+    def add_node(self, node: int) -> None:
+        with self._lock:
+            self._insert_node(node)
+
+    def add_edge(self, rel_id: int, source: int, target: int) -> None:
+        with self._lock:
+            self._insert_node(source)
+            self._insert_node(target)
+            self.edge_ids.append(rel_id)
+            self.edge_src.append(source)
+            self.edge_dst.append(target)
+            self.version += 1
+            self._csr = None
+
+    def _insert_node(self, node: int) -> None:
+        pos = bisect_left(self.nodes, node)
+        if pos == len(self.nodes) or self.nodes[pos] != node:
+            self.nodes.insert(pos, node)
+            self.version += 1
+            self._csr = None
+
+    # Lookup ---------------------------------------------------------------
+    @staticmethod
+    def _position(nodes: array, node: int) -> int:
+        pos = bisect_left(nodes, node)
+        if pos < len(nodes) and nodes[pos] == node:
+            return pos
+        return -1
+
+    def __contains__(self, node: int) -> bool:
+        return self._position(self.nodes, node) >= 0
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _build(self) -> Tuple[array, array, array, array]:
+        with self._lock:
+            if self._csr is not None:
+                return self._csr
+            nodes = array("q", self.nodes)
+            edges = list(zip(self.edge_ids, self.edge_src, self.edge_dst))
+        count = len(nodes)
+        degree = [0] * (count + 1)
+        positions = []
+        for _, source, target in edges:
+            s, t = self._position(nodes, source), self._position(nodes, target)
+            positions.append((s, t))
+            degree[s + 1] += 1
+            if t != s:
+                degree[t + 1] += 1
+        for i in range(count):
+            degree[i + 1] += degree[i]
+        offsets = array("q", degree)
+        fill = list(degree[:count])
+        adj_nodes = array("q", bytes(8 * degree[count]))
+        adj_edges = array("q", bytes(8 * degree[count]))
+        for (rel_id, _, _), (s, t) in zip(edges, positions):
+            adj_nodes[fill[s]] = nodes[t]
+            adj_edges[fill[s]] = rel_id
+            fill[s] += 1
+            if t != s:
+                adj_nodes[fill[t]] = nodes[s]
+                adj_edges[fill[t]] = rel_id
+                fill[t] += 1
+        csr = (nodes, offsets, adj_nodes, adj_edges)
+        with self._lock:
+            if len(self.edge_ids) == len(edges) and len(self.nodes) == count:
+                self._csr = csr
+        return csr
+
+    def neighbors(self, node: int) -> List[Tuple[int, int]]:
+        nodes, offsets, adj_nodes, adj_edges = self._csr or self._build()
+        pos = self._position(nodes, node)
+        if pos < 0:
+            return []
+        lo, hi = offsets[pos], offsets[pos + 1]
+        return list(zip(adj_nodes[lo:hi], adj_edges[lo:hi]))
+
+    def nbytes(self) -> int:
+        buffers = [self.nodes, self.edge_ids, self.edge_src, self.edge_dst]
+        buffers.extend(self._csr or ())
+        return sum(b.itemsize * len(b) for b in buffers)
+
+    # Serialization (shared cache tier) ------------------------------------
+    _HEADER = struct.Struct("<qq")
+
+    def to_bytes(self) -> bytes:
+        """Node and edge buffers in native byte order; workers of one deployment share an architecture."""
+        with self._lock:
+            buffers = (self.nodes, self.edge_ids, self.edge_src, self.edge_dst)
+            return self._HEADER.pack(len(self.nodes), len(self.edge_ids)) + b"".join(b.tobytes() for b in buffers)
+
+    @classmethod
+    def from_bytes(cls, case_id: int, data: bytes) -> "CaseGraph":
+        n, m = cls._HEADER.unpack_from(data)
+        values = array("q")
+        values.frombytes(data[cls._HEADER.size:])
+        graph = cls(case_id, (), ())
+        graph.nodes = values[:n]
+        graph.edge_ids = values[n:n + m]
+        graph.edge_src = values[n + m:n + 2 * m]
+        graph.edge_dst = values[n + 2 * m:n + 3 * m]
+        return graph
+
+
+def k_hop(
+    graph: CaseGraph, start: int, depth: int, max_nodes: int, max_fanout: int
+) -> Tuple[Set[int], Set[int], bool]:
+    """Breadth-first neighbourhood of ``start`` up to ``depth`` hops.
+
+    Returns ``(node_ids, relationship_ids, truncated)``; ``truncated`` is set
+    when a node or fan-out limit cut the walk short.
+    """
+    nodes = {start}
+    edges: Set[int] = set()
+    truncated = False
+    frontier = [start]
+    for _ in range(depth):
+        next_frontier = []
+        for node in frontier:
+            neighbors = graph.neighbors(node)
+            if len(neighbors) > max_fanout:
+                truncated = True
+                neighbors = neighbors[:max_fanout]
+            for neighbor, rel_id in neighbors:
+                if neighbor in nodes:
+                    edges.add(rel_id)
+                    continue
+                if len(nodes) >= max_nodes:
+                    truncated = True
+                    continue
+                nodes.add(neighbor)
+                edges.add(rel_id)
+                next_frontier.append(neighbor)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+    return nodes, edges, truncated
+
+
+def shortest_path(
+    graph: CaseGraph, source: int, target: int, max_depth: int, max_visited: int = 100000
+) -> Optional[Tuple[List[int], List[int]]]:
+    """Bidirectional BFS. Returns ``(node_ids, relationship_ids)`` along the path, or None."""
+    if source not in graph or target not in graph:
+        return None
+    if source == target:
+        return [source], []
+
+    # parent maps: node -> (previous node, relationship id) towards the side's root
+    parents = ({source: None}, {target: None})
+    frontiers = ([source], [target])
+    hops = 0
+    while frontiers[0] and frontiers[1] and hops < max_depth:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        own, other = parents[side], parents[1 - side]
+        next_frontier = []
+        for node in frontiers[side]:
+            for neighbor, rel_id in graph.neighbors(node):
+                if neighbor in own:
+                    continue
+                own[neighbor] = (node, rel_id)
+                if neighbor in other:
+                    return _join_path(parents, neighbor)
+                next_frontier.append(neighbor)
+        if len(parents[0]) + len(parents[1]) > max_visited:
+            return None
+        frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+        hops += 1
+    return None
+
+
+def _join_path(parents, meeting: int) -> Tuple[List[int], List[int]]:
+    nodes, edges = [meeting], []
+    node = meeting
+    while parents[0][node] is not None:
+        node, rel_id = parents[0][node]
+        nodes.insert(0, node)
+        edges.insert(0, rel_id)
+    node = meeting
+    while parents[1][node] is not None:
+        node, rel_id = parents[1][node]
+        nodes.append(node)
+        edges.append(rel_id)
+    return nodes, edges
+
+
+def connected_components(graph: CaseGraph, min_size: int = 1) -> List[List[int]]:
+    """All connected components with at least ``min_size`` nodes, largest first."""
+    seen: Set[int] = set()
+    components = []
+    for root in graph.nodes:
+        if root in seen:
+            continue
+        seen.add(root)
+        component = [root]
+        queue = deque([root])
+        while queue:
+            for neighbor, _ in graph.neighbors(queue.popleft()):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    component.append(neighbor)
+                    queue.append(neighbor)
+        if len(component) >= min_size:
+            components.append(sorted(component))
+    components.sort(key=len, reverse=True)
+    return components
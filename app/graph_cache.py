@@ -0,0 +1,200 @@
+"""Bounded in-memory cache of per-case graphs.
+
+``Store.load_case_graph`` goes through ``graph_cache`` so hot cases are
+traversed from memory. Store write paths keep cached graphs current: new
+entities and relationships are appended in place, deletes drop the affected
+case so it is reloaded on next use.
+
+When the cache tier is shared between workers (``APP_CACHE_URL`` is sqlite
+or redis) it backs this in-process LRU: a graph one worker loaded is read
+from there by the others. Entries are keyed by a per-case generation that
+every write bumps, so a write by any worker retires the shared copy at once.
+Other workers' in-process copies are dropped by the NOTIFY listener.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+from app.cache import GRAPH_GENERATION_KEY, GRAPH_KEY, CacheBackend, cache
+from app.config import get_settings
+from app.graph import CaseGraph
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, int]
+
+
+class GraphCache:
+    """LRU of ``CaseGraph`` objects keyed by (owner, case_id), capped by entries and bytes."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 256 * 1024 * 1024,
+        shared: Optional[CacheBackend] = None,
+        shared_ttl: float = 300.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._shared = shared if shared is not None and shared.shared else None
+        self.shared_ttl = shared_ttl
+        self._graphs: "OrderedDict[CacheKey, CaseGraph]" = OrderedDict()
+        self._sizes: Dict[CacheKey, int] = {}
+        # bumped on every change to a key so a load racing with a write is not cached
+        self._versions: Dict[CacheKey, int] = {}
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.shared_hits = 0
+
+    def get_or_load(self, owner: str, case_id: int, loader: Callable[[], CaseGraph]) -> CaseGraph:
+        key = (owner, case_id)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+                self.hits += 1
+                return graph
+            self.misses += 1
+            version = self._versions.get(key, 0)
+
+        graph = self._load_shared(owner, case_id, loader)
+        with self._lock:
+            if self._versions.get(key, 0) == version and key not in self._graphs:
+                self._store(key, graph)
+        return graph
+
+    def _load_shared(self, owner: str, case_id: int, loader: Callable[[], CaseGraph]) -> CaseGraph:
+        if self._shared is None:
+            return loader()
+        try:
+            # read the generation before loading: a write after this point bumps it,
+            # so whatever we load is stored under a key nobody reads any more
+            generation = self._shared.counters(GRAPH_GENERATION_KEY.format(owner, case_id))[0]
+            shared_key = GRAPH_KEY.format(owner, case_id, generation)
+            data = self._shared.get(shared_key)
+        except Exception:
+            logger.exception("Shared graph cache read failed")
+            return loader()
+        if data is not None:
+            with self._lock:
+                self.shared_hits += 1
+            return CaseGraph.from_bytes(case_id, data)
+        graph = loader()
+        if graph.nbytes() <= self.max_bytes:
+            try:
+                self._shared.set(shared_key, graph.to_bytes(), self.shared_ttl)
+            except Exception:
+                logger.exception("Shared graph cache write failed")
+        return graph
+
+    def _retire_shared(self, owner: str, case_id: int) -> None:
+        if self._shared is None:
+            return
+        try:
+            self._shared.incr(GRAPH_GENERATION_KEY.format(owner, case_id))
+        except Exception:
+            logger.exception("Could not retire shared graph for case %s", case_id)
+
+    # Write-through hooks -------------------------------------------------
+    def add_node(self, owner: str, case_id: int, entity_id: int) -> None:
+        key = (owner, case_id)
+        with self._lock:
+            self._bump(key)
+            graph = self._graphs.get(key)
+            if graph is not None:
+                graph.add_node(entity_id)
+                self._resize(key)
+        self._retire_shared(owner, case_id)
+
+    def add_edge(self, owner: str, case_id: int, relationship_id: int, source: int, target: int) -> None:
+        key = (owner, case_id)
+        with self._lock:
+            self._bump(key)
+            graph = self._graphs.get(key)
+            if graph is not None:
+                graph.add_edge(relationship_id, source, target)
+                self._resize(key)
+        self._retire_shared(owner, case_id)
+
+    def invalidate(self, owner: str, case_id: int, local_only: bool = False) -> None:
+        """Drop the case's graph; ``local_only`` leaves the shared tier alone (the writer already retired it)."""
+        key = (owner, case_id)
+        with self._lock:
+            self._bump(key)
+            self._drop(key)
+        if not local_only:
+            self._retire_shared(owner, case_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._graphs):
+                self._bump(key)
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._graphs),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "shared": self._shared is not None,
+                "shared_hits": self.shared_hits,
+            }
+
+    # Internals (caller holds the lock) ------------------------------------
+    def _bump(self, key: CacheKey) -> None:
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _store(self, key: CacheKey, graph: CaseGraph) -> None:
+        size = graph.nbytes()
+        if size > self.max_bytes:
+            return
+        self._graphs[key] = graph
+        self._sizes[key] = size
+        self._bytes += size
+        self._evict()
+
+    def _resize(self, key: CacheKey) -> None:
+        size = self._graphs[key].nbytes()
+        self._bytes += size - self._sizes[key]
+        self._sizes[key] = size
+        self._evict()
+
+    def _drop(self, key: CacheKey) -> None:
+        if self._graphs.pop(key, None) is not None:
+            self._bytes -= self._sizes.pop(key)
+            self.invalidations += 1
+
+    def _evict(self) -> None:
+        while self._graphs and (len(self._graphs) > self.max_entries or self._bytes > self.max_bytes):
+            key, _ = self._graphs.popitem(last=False)
+            self._bytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+
+def _build_cache() -> GraphCache:
+    settings = get_settings()
+    return GraphCache(
+        max_entries=settings.graph_cache_entries,
+        max_bytes=settings.graph_cache_mb * 1024 * 1024,
+        shared=cache,
+        shared_ttl=settings.cache_ttl,
+    )
+
+
+graph_cache = _build_cache()
@@ -0,0 +1,148 @@
+"""Type-aware normalization of indicator values.
+
+Entity names are free text, so the same IP, domain or hash shows up with
+different casing, whitespace, defanging or URL prefixes. ``normalize_indicator``
+reduces a value to one canonical form per kind; the result is stored in
+``entities.indicator`` and used for cross-case pivoting.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import re
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+KIND_ALIASES = {
+    "ipv4": "ip",
+    "ipv6": "ip",
+    "hostname": "domain",
+    "nameserver": "domain",
+    "md5": "hash",
+    "sha1": "hash",
+    "sha256": "hash",
+}
+INDICATOR_KINDS = ("ip", "domain", "url", "email", "hash", "phone")
+
+_HEX = re.compile(r"^[0-9a-f]+$")
+_HASH_LENGTHS = (32, 40, 64, 128)
+_DOMAIN = re.compile(r"^(?=.{1,253}$)([a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9])?\.)+[a-z0-9-]{2,63}$")
+_PHONE = re.compile(r"^\+?[\d\s().-]{7,}$")
+
+
+def canonical_kind(kind: Optional[str]) -> Optional[str]:
+    kind = (kind or "").lower().strip()
+    kind = KIND_ALIASES.get(kind, kind)
+    return kind if kind in INDICATOR_KINDS else None
+
+
+def refang(value: str) -> str:
+    value = value.strip()
+    value = re.sub(r"^hxxp", "http", value, flags=re.IGNORECASE)
+    for defanged in ("[.]", "(.)", "{.}", "[dot]"):
+        value = value.replace(defanged, ".")
+    return value.replace("[@]", "@").replace("[at]", "@")
+
+
+def _normalize_ip(value: str) -> str:
+    value = value.strip("[]")
+    try:
+        return ipaddress.ip_address(value).compressed
+    except ValueError:
+        pass
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit():
+        try:
+            return ipaddress.ip_address(host.strip("[]")).compressed
+        except ValueError:
+            pass
+    try:
+        return ipaddress.ip_network(value, strict=False).compressed
+    except ValueError:
+        return value.lower()
+
+
+def _normalize_domain(value: str) -> str:
+    value = value.lower()
+    if "://" in value:
+        value = urlsplit(value).hostname or value
+    value = value.split("/", 1)[0].rstrip(".")
+    try:
+        return value.encode("idna").decode("ascii")
+    except UnicodeError:
+        return value
+
+
+def _normalize_url(value: str) -> str:
+    if "://" not in value:
+        value = f"http://{value}"
+    parts = urlsplit(value)
+    scheme = parts.scheme.lower()
+    host = _normalize_domain(parts.hostname or "")
+    netloc = host
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    path = parts.path if parts.path not in ("", "/") else ""
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def _normalize_phone(value: str) -> str:
+    digits = re.sub(r"\D", "", value)
+    if value.startswith("+"):
+        return f"+{digits}"
+    if value.startswith("00"):
+        return f"+{digits[2:]}"
+    return digits
+
+
+def normalize_indicator(kind: Optional[str], value: Optional[str]) -> Optional[str]:
+    """Return the canonical form of ``value`` for ``kind``, or None for non-indicator kinds."""
+    kind = canonical_kind(kind)
+    if kind is None or not value or not value.strip():
+        return None
+    value = refang(value)
+    if kind == "ip":
+        return _normalize_ip(value)
+    if kind == "domain":
+        return _normalize_domain(value)
+    if kind == "url":
+        return _normalize_url(value)
+    if kind == "email":
+        return value.lower().removeprefix("mailto:")
+    if kind == "hash":
+        return re.sub(r"\s", "", value).lower()
+    if kind == "phone":
+        return _normalize_phone(value)
+    return None
+
+
+def renamed_indicators(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """``value``'s indicator under every indicator kind and alias, for renames that keep the stored kind."""
+    indicators = {kind: normalize_indicator(kind, value) for kind in INDICATOR_KINDS}
+    return {**indicators, **{alias: indicators[kind] for alias, kind in KIND_ALIASES.items()}}
+
+
+def detect_kind(value: str) -> Optional[str]:
+    """Best-effort guess of the indicator kind of a raw value."""
+    value = refang(value)
+    lowered = value.lower()
+    try:
+        ipaddress.ip_address(value.strip("[]"))
+        return "ip"
+    except ValueError:
+        pass
+    if "://" in lowered:
+        return "url"
+    if "@" in value and "/" not in value:
+        return "email"
+    if _HEX.match(lowered) and len(lowered) in _HASH_LENGTHS:
+        return "hash"
+    if _PHONE.match(value) and len(re.sub(r"\D", "", value)) >= 7:
+        return "phone"
+    if "/" in lowered and _DOMAIN.match(lowered.split("/", 1)[0]):
+        return "url"
+    if _DOMAIN.match(lowered.rstrip(".")):
+        return "domain"
+    return None
@@ -0,0 +1,169 @@
+"""Cross-process cache invalidation over Postgres LISTEN/NOTIFY or the SQLite change log.
+
+Every committed write to a cached table sends a notification (see the
+``ghostlock_notify`` trigger in ``app.storage.postgres``). Each worker runs
+one ``InvalidationListener`` thread on a dedicated connection and applies
+them to what it holds in process: cached case graphs, the per-process ETag
+counters and, when ``APP_CACHE_URL`` is ``memory://``, cached principals and
+API keys. Notifications from the worker's own pooled connections are skipped,
+since the writing process already updated its caches.
+
+If the connection drops, notifications sent meanwhile are lost, so after a
+reconnect everything held in process is dropped or bumped before listening
+resumes.
+
+With the SQLite backend the web process and ``app.worker`` share one file
+but no server, so writes are stamped into a ``change_log`` table by triggers
+instead (see ``SQLiteStore.poll_changes``) and the listener polls it every
+``poll_interval`` seconds.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import select
+import threading
+from typing import Optional
+
+from app.cache import API_KEYS_KEY, USER_KEY, MemoryCache, cache
+from app.changes import changes
+from app.config import get_settings
+from app.graph_cache import graph_cache
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationListener:
+    """Background thread that LISTENs for invalidations and applies them."""
+
+    def __init__(
+        self, enabled: bool = True, poll_interval: float = 1.0, max_backoff: float = 30.0, backend: str = "postgres"
+    ):
+        self.enabled = enabled
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.received = 0
+        self.reconnects = 0
+
+    # Lifecycle -----------------------------------------------------------
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Applying ------------------------------------------------------------
+    def apply(self, payload: dict) -> None:
+        table, owner = payload.get("t"), payload.get("o")
+        if table == "*":
+            changes.observe_all()
+            return
+        if owner is None:
+            return
+        if not cache.shared:
+            # a shared tier was already updated by the writer
+            if table == "users":
+                cache.delete(USER_KEY.format(owner))
+            elif table == "api_keys":
+                cache.delete(API_KEYS_KEY.format(owner))
+        if payload.get("c") is not None:
+            graph_cache.invalidate(owner, int(payload["c"]), local_only=True)
+        changes.observe(owner)
+
+    def reset(self) -> None:
+        """Forget everything held in process (used when notifications may have been missed)."""
+        graph_cache.clear()
+        changes.observe_all()
+        if isinstance(cache, MemoryCache):
+            cache.clear()
+
+    # Listening -----------------------------------------------------------
+    def _run(self) -> None:
+        if self.backend == "sqlite":
+            self._poll_sqlite()
+        else:
+            self._listen_postgres()
+
+    def _poll_sqlite(self) -> None:
+        from app.storage import store
+
+        while not self._stop.wait(self.poll_interval):
+            try:
+                payloads = store.poll_changes()
+            except Exception:
+                logger.exception("Could not read the SQLite change log")
+                continue
+            if payloads is None:
+                # more changes piled up than the store keeps
+                self.reconnects += 1
+                self.reset()
+                continue
+            for payload in payloads:
+                self.received += 1
+                self.apply(payload)
+
+    def _listen_postgres(self) -> None:
+        import psycopg2
+
+        from app.storage.postgres import DATABASE_URL, INVALIDATION_CHANNEL, own_backend_pids
+
+        backoff = 0.5
+        connected_before = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+                if connected_before:
+                    self.reconnects += 1
+                    self.reset()
+                connected_before = True
+                backoff = 0.5
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_interval)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            if notify.pid in own_backend_pids:
+                                continue
+                            self.received += 1
+                            try:
+                                self.apply(json.loads(notify.payload))
+                            except Exception:
+                                logger.exception("Bad invalidation payload %r", notify.payload)
+            except Exception:
+                logger.exception("Invalidation listener lost its connection; retrying in %.1fs", backoff)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+def _build_listener() -> InvalidationListener:
+    settings = get_settings()
+    backend = settings.storage_backend.lower()
+    return InvalidationListener(
+        enabled=settings.cache_invalidation and backend in ("postgres", "sqlite"),
+        backend=backend,
+    )
+
+
+invalidation_listener = _build_listener()
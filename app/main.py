@@ -1,17 +1,51 @@
 """GhostLock backend entrypoint."""
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
 
+from app.activity import activity_log
 from app.config import get_settings
-from app.routes import apikeys, auth, cases, comments, entities, import_export, relationships, timeline, transforms
+from app.invalidation import invalidation_listener
+from app.middleware import CompressionMiddleware, ConditionalGetMiddleware
+from app.routes import apikeys, auth, cases, comments, entities, graph, import_export, indicators, relationships, search, timeline, transforms
 from app.schemas import HealthResponse
+from app.static_assets import HashedStaticFiles, IndexPage
+from app.storage import store
 
 settings = get_settings()
-app = FastAPI(title="GhostLock Backend", version="1.0")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # connect and run schema setup here rather than at import time
+    await run_in_threadpool(store.open)
+    activity_log.start()
+    invalidation_listener.start()
+    yield
+    await run_in_threadpool(invalidation_listener.stop)
+    await run_in_threadpool(activity_log.stop)
+    store.close()
+
+
+app = FastAPI(title="GhostLock Backend", version="1.0", lifespan=lifespan)
+
+if settings.json_etags:
+    app.add_middleware(
+        ConditionalGetMiddleware,
+        prefixes=["/apikeys", "/cases", "/comments", "/entities", "/graph", "/indicators", "/relationships",
+                  "/search", "/timeline"],
+        exclude=["/graph/cache"],
+    )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_size,
+    gzip_level=settings.gzip_level,
+    brotli_quality=settings.brotli_quality,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allow_origins,
@@ -20,13 +54,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+static_files = HashedStaticFiles(directory="static", max_age=settings.static_max_age)
+index_page = IndexPage("static/index.html", static_files.hashes)
+app.mount("/static", static_files, name="static")
 
 
 @app.get("/")
-def root():
-    """Serve the frontend."""
-    return FileResponse("static/index.html", headers={"Cache-Control": "no-cache"})
+def root(request: Request) -> Response:
+    """Serve the frontend with content-hashed asset URLs."""
+    return index_page.response(request)
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -40,8 +76,14 @@ app.include_router(apikeys.router)
 app.include_router(cases.router)
 app.include_router(comments.router)
 app.include_router(entities.router)
+app.include_router(graph.router)
 app.include_router(import_export.router)
 app.include_router(import_export.export_router)
+app.include_router(indicators.router)
 app.include_router(relationships.router)
+app.include_router(search.router)
 app.include_router(timeline.router)
 app.include_router(transforms.router)
+app.include_router(transforms.jobs_router)
+app.include_router(transforms.providers_router)
+app.include_router(transforms.runs_router)
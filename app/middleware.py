@@ -0,0 +1,291 @@
+"""ASGI middleware for response compression and conditional JSON GETs."""
+
+from __future__ import annotations
+
+import logging
+import zlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.changes import changes
+from app.security import decode_access_token
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+_COMPRESSIBLE = ("application/json", "application/javascript", "application/xml", "image/svg+xml", "text/")
+_ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+
+def _accepted_encodings(header: str) -> dict:
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(header: str) -> Optional[str]:
+    """Pick ``br`` or ``gzip`` from an Accept-Encoding header, preferring brotli."""
+    accepted = _accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def _compressible(content_type: str) -> bool:
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    return content_type.startswith(_COMPRESSIBLE) or content_type.endswith(("+json", "+xml"))
+
+
+class _Compressor:
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=level)
+            self.compress, self.finish = self._obj.process, self._obj.finish
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self.compress, self.finish = self._obj.compress, self._obj.flush
+
+
+class CompressionMiddleware:
+    """gzip/brotli response compression with a size threshold.
+
+    Only text-like content types at least ``minimum_size`` bytes long are
+    compressed. Bodies carrying a strong ETag (content-hashed static assets)
+    are compressed once at the maximum level and kept in a small LRU; strong
+    ETags get an encoding suffix so each representation has its own tag,
+    and the suffix is stripped from If-None-Match on the way in.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        cache_entries: int = 64,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._cache_lock = Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        scope, matched_suffix = self._strip_etag_suffixes(scope)
+        responder = _CompressionResponder(self, encoding, matched_suffix, send)
+        await self.app(scope, receive, responder.send)
+
+    @staticmethod
+    def _strip_etag_suffixes(scope: Scope) -> Tuple[Scope, Optional[str]]:
+        headers = Headers(scope=scope)
+        if_none_match = headers.get("if-none-match")
+        if not if_none_match:
+            return scope, None
+        matched = None
+        tags = []
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            for suffix in _ENCODING_SUFFIXES.values():
+                if not tag.startswith("W/") and tag.endswith(f'{suffix}"'):
+                    tag = tag[: -len(suffix) - 1] + '"'
+                    matched = suffix
+                    break
+            tags.append(tag)
+        raw = [(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+        raw.append((b"if-none-match", ", ".join(tags).encode("latin-1")))
+        return {**scope, "headers": raw}, matched
+
+    def cached(self, key: Tuple[str, str]) -> Optional[bytes]:
+        with self._cache_lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def remember(self, key: Tuple[str, str], body: bytes) -> None:
+        with self._cache_lock:
+            self._cache[key] = body
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, matched_suffix: Optional[str], send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.matched_suffix = matched_suffix
+        self._send = send
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            if message["status"] == 304:
+                headers = MutableHeaders(raw=message["headers"])
+                self._tag_etag(headers, self.matched_suffix)
+                self.passthrough = True
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if (
+                "content-encoding" in headers
+                or not _compressible(headers.get("content-type", ""))
+                or (not more_body and len(body) < self.middleware.minimum_size)
+            ):
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag", "")
+            strong = etag.startswith('"')
+            self._tag_etag(headers, _ENCODING_SUFFIXES[self.encoding])
+            if not more_body:
+                body = self._compress_whole(body, etag if strong else None)
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start)
+                await self._send({**message, "body": body})
+                return
+            del headers["Content-Length"]
+            self.compressor = _Compressor(self.encoding, self.middleware.levels[self.encoding])
+            await self._send(self.start)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self._send({**message, "body": chunk})
+
+    def _compress_whole(self, body: bytes, strong_etag: Optional[str]) -> bytes:
+        if strong_etag is None:
+            compressor = _Compressor(self.encoding, self.middleware.levels[self.encoding])
+            return compressor.compress(body) + compressor.finish()
+        key = (strong_etag, self.encoding)
+        compressed = self.middleware.cached(key)
+        if compressed is None:
+            # immutable content: spend the time once on the best ratio
+            compressor = _Compressor(self.encoding, 11 if self.encoding == "br" else 9)
+            compressed = compressor.compress(body) + compressor.finish()
+            self.middleware.remember(key, compressed)
+        return compressed
+
+    @staticmethod
+    def _tag_etag(headers: MutableHeaders, suffix: Optional[str]) -> None:
+        etag = headers.get("etag")
+        if suffix and etag and etag.startswith('"') and not etag.endswith(f'{suffix}"'):
+            headers["ETag"] = etag[:-1] + suffix + '"'
+
+
+def _bearer_owner(headers: Headers) -> Optional[str]:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_access_token(token).get("sub")
+    except Exception:  # invalid tokens fall through to the route's 401
+        return None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip() in ("*", etag, opaque) or tag.strip().removeprefix("W/") == opaque
+               for tag in if_none_match.split(","))
+
+
+class ConditionalGetMiddleware:
+    """Per-owner ETags and 304s for JSON GETs under ``prefixes``.
+
+    The tag comes from ``app.changes`` and the verified bearer token, so a
+    matching If-None-Match is answered without running the route or touching
+    the database.
+    """
+
+    def __init__(self, app: ASGIApp, prefixes: Iterable[str], exclude: Iterable[str] = ()):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not path.startswith(self.prefixes)
+            or path.startswith(self.exclude)
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        owner = _bearer_owner(headers)
+        if owner is None:
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get("query_string", b"").decode("latin-1")
+        try:
+            etag = await changes.aetag(owner, f"{path}?{query}")
+        except Exception:
+            # shared counters unreachable: serve normally rather than risk a wrong 304
+            logger.exception("Could not compute ETag")
+            await self.app(scope, receive, send)
+            return
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+        if _etag_matches(headers.get("if-none-match", ""), etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in cache_headers.items()],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = MutableHeaders(raw=message["headers"])
+                if "etag" not in response_headers:
+                    response_headers["ETag"] = etag
+                    response_headers.setdefault("Cache-Control", cache_headers["Cache-Control"])
+                    response_headers.add_vary_header("Authorization")
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
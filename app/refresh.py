@@ -0,0 +1,118 @@
+"""Scheduled re-enrichment of stale entities.
+
+Threat intel goes stale: abuse scores move, open ports change. Worker
+processes (``python -m app.worker``) therefore run a ``RefreshScheduler``
+next to their job loop when ``APP_REFRESH_TRANSFORMS`` names any
+transforms. Every ``APP_REFRESH_INTERVAL`` seconds it queues refresh jobs
+for the entities whose last run of each transform is older than
+``APP_REFRESH_STALE_HOURS``, and runs them through the same queue, workers,
+breakers and retries as user-queued jobs.
+
+Load is bounded and spread out. At most ``APP_REFRESH_MAX_PER_HOUR``
+refresh jobs per transform are queued per hour, counted across all
+workers. Each scan's jobs get ``run_at`` times staggered over the
+interval, so providers see a steady trickle rather than a burst. A
+transform whose breaker is open in this process is left alone until it
+closes.
+
+A refresh run records only what changed: the attribute delta lands on the
+run (``transform_runs.changes``), and re-created child entities are
+dropped (see ``app.transforms.dispatcher``).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.transforms.dispatcher import TRANSFORM_MAP, transform_providers
+from app.transforms.upstream import CircuitBreaker, provider_stats
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_targets(transforms: List[str]) -> Dict[str, Tuple[List[str], Set[str]]]:
+    """``{transform: (entity kinds it runs on, providers it calls)}`` for the configured transform names."""
+    wanted = {name.lower() for name in transforms}
+    targets: Dict[str, Tuple[List[str], Set[str]]] = {}
+    for kind, providers in TRANSFORM_MAP.items():
+        for provider in providers:
+            if provider["name"].lower() in wanted:
+                kinds, upstream = targets.setdefault(provider["name"], ([], set()))
+                kinds.append(kind)
+                upstream.update(transform_providers(provider))
+    unknown = wanted - {name.lower() for name in targets}
+    if unknown:
+        logger.warning("Not refreshing unknown transforms: %s", ", ".join(sorted(unknown)))
+    return targets
+
+
+class RefreshScheduler:
+    def __init__(
+        self,
+        store,
+        transforms: List[str],
+        stale_hours: float = 24.0,
+        interval: float = 300.0,
+        max_per_hour: int = 60,
+        max_attempts: int = 5,
+    ):
+        self._store = store
+        self.targets = refresh_targets(transforms)
+        self.stale_hours = stale_hours
+        self.interval = max(1.0, interval)
+        self.max_per_hour = max_per_hour
+        self.max_attempts = max_attempts
+        self.queued = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Lifecycle -----------------------------------------------------------
+    def start(self) -> None:
+        if not self.targets or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="refresh-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Refreshing %s every %.0fs once older than %gh", ", ".join(sorted(self.targets)), self.interval,
+            self.stale_hours,
+        )
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # Scheduling ----------------------------------------------------------
+    def schedule(self) -> int:
+        """Queue this interval's refresh jobs for every configured transform; returns how many were queued."""
+        open_circuits = {s["provider"] for s in provider_stats() if s["state"] == CircuitBreaker.OPEN}
+        stale_before = datetime.now(timezone.utc) - timedelta(hours=self.stale_hours)
+        # the share of the hourly cap that falls into one interval
+        per_scan = max(1, round(self.max_per_hour * self.interval / 3600))
+        queued = 0
+        for transform, (kinds, providers) in self.targets.items():
+            if providers & open_circuits:
+                logger.info("Not refreshing %s while its circuit is open", transform)
+                continue
+            try:
+                jobs = self._store.schedule_refresh_jobs(
+                    transform, kinds, stale_before, per_scan, self.max_per_hour, self.max_attempts, self.interval
+                )
+            except Exception:
+                logger.exception("Could not schedule %s refreshes", transform)
+                continue
+            if jobs:
+                logger.info("Queued %d %s refreshes", len(jobs), transform)
+            queued += len(jobs)
+        self.queued += queued
+        return queued
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.schedule()
+            self._stop.wait(self.interval)
@@ -0,0 +1,30 @@
+"""High-throughput JSON responses.
+
+``FastJSONResponse`` renders with orjson, which serializes the slotted row
+dataclasses from ``app.rows``, datetimes and plain containers natively and
+falls back to ``.dict()`` for pydantic models. Routes that return it bypass
+FastAPI's response_model re-validation and ``jsonable_encoder``; they keep
+``response_model`` for the OpenAPI schema, and the emitted JSON matches what
+the default path would produce for the same data.
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any, indent: bool = False) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_INDENT_2 if indent else 0)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -2,41 +2,43 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 
+from app.activity import activity_log
 from app.dependencies import get_current_user
 from app.schemas import Case, CaseCreate, CaseUpdate, UserPublic
-from app.storage import store
+from app.storage import astore
 
 router = APIRouter(prefix="/cases", tags=["cases"])
 
 
 @router.get("/", response_model=list[Case])
-def list_cases(current_user: UserPublic = Depends(get_current_user)) -> list[Case]:
+async def list_cases(current_user: UserPublic = Depends(get_current_user)) -> list[Case]:
     """Return cases created by the authenticated user."""
 
-    return store.list_cases(owner=current_user.username)
+    return await astore.list_cases(owner=current_user.username)
 
 
 @router.post("/", response_model=Case, status_code=status.HTTP_201_CREATED)
-def create_case(payload: CaseCreate, current_user: UserPublic = Depends(get_current_user)) -> Case:
+async def create_case(payload: CaseCreate, current_user: UserPublic = Depends(get_current_user)) -> Case:
     """Create a new case owned by the current user."""
 
-    case = store.create_case(owner=current_user.username, payload=payload)
-    store.log_activity(
+    case = await astore.create_case(owner=current_user.username, payload=payload)
+    await activity_log.arecord(
         owner=current_user.username,
         action="created",
         resource_type="case",
         resource_id=case.id,
-        resource_name=case.name
+        resource_name=case.name,
+        case_id=case.id
     )
     return case
 
 
 @router.get("/{case_id}", response_model=Case)
-def get_case(case_id: int, current_user: UserPublic = Depends(get_current_user)) -> Case:
+async def get_case(case_id: int, current_user: UserPublic = Depends(get_current_user)) -> Case:
     """Retrieve a case by ID."""
 
     try:
-        return store.get_case(owner=current_user.username, case_id=case_id)
+        return await astore.get_case(owner=current_user.username, case_id=case_id)
     except KeyError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -45,13 +47,13 @@ def get_case(case_id: int, current_user: UserPublic = Depends(get_current_user))
 
 
 @router.patch("/{case_id}", response_model=Case)
-def update_case(
+async def update_case(
     case_id: int, payload: CaseUpdate, current_user: UserPublic = Depends(get_current_user)
 ) -> Case:
     """Update a case's details."""
 
     try:
-        return store.update_case(owner=current_user.username, case_id=case_id, payload=payload)
+        return await astore.update_case(owner=current_user.username, case_id=case_id, payload=payload)
     except KeyError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -60,18 +62,18 @@ def update_case(
 
 
 @router.delete("/{case_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_case(case_id: int, current_user: UserPublic = Depends(get_current_user)) -> None:
+async def delete_case(case_id: int, current_user: UserPublic = Depends(get_current_user)) -> None:
     """Delete a case and its related entities/relationships."""
 
     try:
-        case = store.get_case(owner=current_user.username, case_id=case_id)
-        store.delete_case(owner=current_user.username, case_id=case_id)
-        store.log_activity(
+        case = await astore.delete_case(owner=current_user.username, case_id=case_id)
+        await activity_log.arecord(
             owner=current_user.username,
             action="deleted",
             resource_type="case",
             resource_id=case_id,
-            resource_name=case.name
+            resource_name=case.name,
+            case_id=case_id
         )
     except KeyError as exc:
         raise HTTPException(
@@ -1,39 +1,57 @@
 """Entity management endpoints."""
 
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
+from app.activity import activity_log
+from app.attributes import parse_filter, parse_sort
 from app.dependencies import get_current_user
+from app.responses import FastJSONResponse
 from app.schemas import Entity, EntityCreate, EntityUpdate, UserPublic
-from app.storage import store
+from app.storage import astore
 
 router = APIRouter(prefix="/entities", tags=["entities"])
 
 
 @router.get("/", response_model=list[Entity])
-def list_entities(
+async def list_entities(
     case_id: Optional[int] = Query(None, description="Filter entities by case ID"),
+    attr: Optional[List[str]] = Query(
+        None, description="Attribute filters such as abuse_score>80, country=US or asn (present); all must match"
+    ),
+    attr_sort: Optional[str] = Query(None, description="Order by an attribute, e.g. -abuse_score for descending"),
+    limit: Optional[int] = Query(None, ge=1, le=10000),
     current_user: UserPublic = Depends(get_current_user),
-) -> list[Entity]:
-    """Return entities for the authenticated user, optionally filtered by case."""
+) -> FastJSONResponse:
+    """Return entities for the authenticated user, optionally filtered by case and attributes."""
 
-    return store.list_entities(owner=current_user.username, case_id=case_id)
+    try:
+        filters = [parse_filter(expr) for expr in attr or []]
+        sort = parse_sort(attr_sort) if attr_sort else None
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    rows = await astore.list_entity_rows(
+        owner=current_user.username, case_id=case_id, filters=filters, sort=sort, limit=limit
+    )
+    return FastJSONResponse(rows)
 
 
 @router.post("/", response_model=Entity, status_code=status.HTTP_201_CREATED)
-def create_entity(payload: EntityCreate, current_user: UserPublic = Depends(get_current_user)) -> Entity:
+async def create_entity(payload: EntityCreate, current_user: UserPublic = Depends(get_current_user)) -> Entity:
     """Create a new entity within an existing case."""
 
     try:
-        entity = store.create_entity(owner=current_user.username, payload=payload)
-        store.log_activity(
+        entity = await astore.create_entity(owner=current_user.username, payload=payload)
+        await activity_log.arecord(
             owner=current_user.username,
             action="created",
             resource_type="entity",
             resource_id=entity.id,
             resource_name=entity.name,
-            details=f"Type: {entity.kind}"
+            details=f"Type: {entity.kind}",
+            case_id=entity.case_id
         )
         return entity
     except KeyError as exc:
@@ -44,11 +62,11 @@ def create_entity(payload: EntityCreate, current_user: UserPublic = Depends(get_
 
 
 @router.get("/{entity_id}", response_model=Entity)
-def get_entity(entity_id: int, current_user: UserPublic = Depends(get_current_user)) -> Entity:
+async def get_entity(entity_id: int, current_user: UserPublic = Depends(get_current_user)) -> Entity:
     """Retrieve an entity by ID."""
 
     try:
-        return store.get_entity(owner=current_user.username, entity_id=entity_id)
+        return await astore.get_entity(owner=current_user.username, entity_id=entity_id)
     except KeyError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -57,13 +75,13 @@ def get_entity(entity_id: int, current_user: UserPublic = Depends(get_current_us
 
 
 @router.patch("/{entity_id}", response_model=Entity)
-def update_entity(
+async def update_entity(
     entity_id: int, payload: EntityUpdate, current_user: UserPublic = Depends(get_current_user)
 ) -> Entity:
     """Update entity attributes."""
 
     try:
-        return store.update_entity(owner=current_user.username, entity_id=entity_id, payload=payload)
+        return await astore.update_entity(owner=current_user.username, entity_id=entity_id, payload=payload)
     except KeyError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,18 +90,18 @@ def update_entity(
 
 
 @router.delete("/{entity_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_entity(entity_id: int, current_user: UserPublic = Depends(get_current_user)) -> None:
+async def delete_entity(entity_id: int, current_user: UserPublic = Depends(get_current_user)) -> None:
     """Delete an entity and any connected relationships."""
 
     try:
-        entity = store.get_entity(owner=current_user.username, entity_id=entity_id)
-        store.delete_entity(owner=current_user.username, entity_id=entity_id)
-        store.log_activity(
+        entity = await astore.delete_entity(owner=current_user.username, entity_id=entity_id)
+        await activity_log.arecord(
             owner=current_user.username,
             action="deleted",
             resource_type="entity",
             resource_id=entity_id,
-            resource_name=entity.name
+            resource_name=entity.name,
+            case_id=entity.case_id
         )
     except KeyError as exc:
         raise HTTPException(
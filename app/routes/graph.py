@@ -0,0 +1,147 @@
+"""Server-side graph traversal endpoints."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.dependencies import get_current_user
+from app.graph import connected_components, k_hop, shortest_path
+from app.graph_cache import graph_cache
+from app.responses import FastJSONResponse
+from app.schemas import GraphAnalytics, GraphCacheStats, GraphComponent, GraphComponents, GraphNeighborhood, GraphPath, UserPublic
+from app.storage import store
+
+router = APIRouter(prefix="/graph", tags=["graph"])
+
+_NO_PATH = {"found": False, "length": None, "nodes": [], "edges": []}
+
+
+def _get_entity_or_404(owner: str, entity_id: int):
+    try:
+        return store.get_entity(owner=owner, entity_id=entity_id)
+    except KeyError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=exc.args[0] if exc.args else "Entity not found",
+        ) from exc
+
+
+@router.get("/entities/{entity_id}/neighbors", response_model=GraphNeighborhood)
+def entity_neighbors(
+    entity_id: int,
+    depth: int = Query(1, ge=1, le=5, description="Number of hops to expand"),
+    max_nodes: int = Query(500, ge=1, le=5000, description="Stop after this many entities"),
+    max_fanout: int = Query(200, ge=1, le=5000, description="Follow at most this many edges per entity"),
+    current_user: UserPublic = Depends(get_current_user),
+) -> FastJSONResponse:
+    """Return the k-hop neighbourhood of an entity."""
+
+    owner = current_user.username
+    entity = _get_entity_or_404(owner, entity_id)
+    graph = store.load_case_graph(owner=owner, case_id=entity.case_id)
+    node_ids, edge_ids, truncated = k_hop(graph, entity_id, depth, max_nodes, max_fanout)
+    return FastJSONResponse({
+        "nodes": store.get_entity_rows(owner, sorted(node_ids)),
+        "edges": store.get_relationship_rows(owner, sorted(edge_ids)),
+        "truncated": truncated,
+    })
+
+
+@router.get("/path", response_model=GraphPath)
+def path_between(
+    source: int = Query(..., description="Source entity ID"),
+    target: int = Query(..., description="Target entity ID"),
+    max_depth: int = Query(6, ge=1, le=20, description="Give up beyond this many hops"),
+    current_user: UserPublic = Depends(get_current_user),
+) -> FastJSONResponse:
+    """Return a shortest path between two entities of the same case."""
+
+    owner = current_user.username
+    start = _get_entity_or_404(owner, source)
+    end = _get_entity_or_404(owner, target)
+    if start.case_id != end.case_id:
+        return FastJSONResponse(_NO_PATH)
+
+    graph = store.load_case_graph(owner=owner, case_id=start.case_id)
+    found = shortest_path(graph, source, target, max_depth)
+    if found is None:
+        return FastJSONResponse(_NO_PATH)
+    node_ids, edge_ids = found
+    return FastJSONResponse({
+        "found": True,
+        "length": len(edge_ids),
+        "nodes": store.get_entity_rows(owner, node_ids),
+        "edges": store.get_relationship_rows(owner, edge_ids),
+    })
+
+
+@router.get("/cases/{case_id}/components", response_model=GraphComponents)
+def case_components(
+    case_id: int,
+    min_size: int = Query(1, ge=1, description="Skip components smaller than this"),
+    limit: int = Query(100, ge=1, le=1000, description="Return at most this many components"),
+    current_user: UserPublic = Depends(get_current_user),
+) -> GraphComponents:
+    """Return the connected components of a case, largest first."""
+
+    owner = current_user.username
+    try:
+        store.get_case(owner=owner, case_id=case_id)
+    except KeyError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=exc.args[0] if exc.args else "Case not found",
+        ) from exc
+
+    components = connected_components(store.load_case_graph(owner=owner, case_id=case_id), min_size)
+    return GraphComponents(
+        case_id=case_id,
+        total=len(components),
+        components=[GraphComponent(size=len(c), entity_ids=c) for c in components[:limit]],
+    )
+
+
+@router.get("/cases/{case_id}/analytics", response_model=GraphAnalytics)
+def case_analytics(
+    case_id: int,
+    top: int = Query(20, ge=1, le=500, description="Entities to return per ranking"),
+    samples: int = Query(64, ge=1, le=1024, description="Source nodes sampled for betweenness"),
+    max_communities: int = Query(20, ge=1, le=500, description="Largest communities to return"),
+    current_user: UserPublic = Depends(get_current_user),
+) -> FastJSONResponse:
+    """Rank hub entities by degree, PageRank and betweenness and cluster the case into communities."""
+
+    owner = current_user.username
+    try:
+        store.get_case(owner=owner, case_id=case_id)
+    except KeyError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=exc.args[0] if exc.args else "Case not found",
+        ) from exc
+
+    from app.analytics import analyze  # numpy/scipy load on first use, not at startup
+
+    result = analyze(store.load_case_graph(owner=owner, case_id=case_id), top, samples, max_communities)
+    ranked_ids = {entity_id for key in ("degree", "pagerank", "betweenness") for entity_id, _ in result[key]}
+    entities = {e.id: e for e in store.get_entity_rows(owner, sorted(ranked_ids))}
+
+    def ranking(key: str) -> list:
+        return [
+            {
+                "entity_id": entity_id,
+                "score": score,
+                "name": entities[entity_id].name if entity_id in entities else None,
+                "kind": entities[entity_id].kind if entity_id in entities else None,
+            }
+            for entity_id, score in result[key]
+        ]
+
+    return FastJSONResponse(
+        {**result, "degree": ranking("degree"), "pagerank": ranking("pagerank"), "betweenness": ranking("betweenness")}
+    )
+
+
+@router.get("/cache/stats", response_model=GraphCacheStats)
+def cache_stats(current_user: UserPublic = Depends(get_current_user)) -> GraphCacheStats:
+    """Return size and hit-rate counters for the in-memory case graph cache."""
+
+    return GraphCacheStats(**graph_cache.stats())
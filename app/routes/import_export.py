@@ -7,9 +7,11 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, status
 from fastapi.responses import Response
 
+from app.activity import activity_log
 from app.dependencies import get_current_user
-from app.schemas import Entity, EntityCreate
-from app.storage import store
+from app.responses import dumps
+from app.schemas import Entity, EntityCreate, UserPublic
+from app.storage import astore
 
 router = APIRouter(prefix="/import", tags=["import"])
 export_router = APIRouter(prefix="/export", tags=["export"])
@@ -19,12 +21,12 @@ export_router = APIRouter(prefix="/export", tags=["export"])
 async def bulk_import_entities(
     case_id: int = Form(...),
     file: UploadFile = File(...),
-    user: str = Depends(get_current_user)
+    current_user: UserPublic = Depends(get_current_user)
 ):
     """Import entities from CSV or JSON file."""
     
     try:
-        store.get_case(owner=user, case_id=case_id)
+        await astore.get_case(owner=current_user.username, case_id=case_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="Case not found")
     
@@ -61,6 +63,7 @@ async def bulk_import_entities(
             name = item.get('name', '').strip()
             kind = item.get('kind', item.get('type', '')).strip()
             description = item.get('description', '').strip()
+            attributes = item.get('attributes') if isinstance(item.get('attributes'), dict) else {}
             
             if not name:
                 errors.append(f"Row {i+1}: Missing name")
@@ -73,21 +76,23 @@ async def bulk_import_entities(
                 case_id=case_id,
                 name=name,
                 kind=kind,
-                description=description or None
+                description=description or None,
+                attributes=attributes
             )
-            entity = store.create_entity(owner=user, payload=payload)
+            entity = await astore.create_entity(owner=current_user.username, payload=payload)
             created.append(entity)
             
         except Exception as e:
             errors.append(f"Row {i+1}: {str(e)}")
     
     if created:
-        store.log_activity(
-            owner=user,
+        await activity_log.arecord(
+            owner=current_user.username,
             action="created",
             resource_type="entity",
             resource_name=f"Bulk import ({len(created)} entities)",
-            details=f"Imported from {file.filename}"
+            details=f"Imported from {file.filename}",
+            case_id=case_id
         )
     
     return {
@@ -101,44 +106,41 @@ async def bulk_import_entities(
 async def export_case(
     case_id: int,
     format: str = Query("json", regex="^(json|csv)$"),
-    user: str = Depends(get_current_user)
+    current_user: UserPublic = Depends(get_current_user)
 ):
     """Export a case with all its entities and relationships."""
     
     try:
-        case = store.get_case(owner=user, case_id=case_id)
+        case = await astore.get_case(owner=current_user.username, case_id=case_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="Case not found")
     
-    entities = [e for e in store.list_entities(owner=user) if e.case_id == case_id]
-    relationships = store.list_relationships(owner=user)
-    entity_ids = {e.id for e in entities}
-    case_relationships = [
-        r for r in relationships 
-        if r.source_id in entity_ids or r.target_id in entity_ids
-    ]
+    entities, case_relationships = await astore.gather(
+        astore.list_entity_rows(owner=current_user.username, case_id=case_id),
+        astore.list_relationship_rows(owner=current_user.username, case_id=case_id),
+    )
     
     export_data = {
         "case": {
             "id": case.id,
             "name": case.name,
-            "description": case.description,
-            "created_at": case.created_at.isoformat() if case.created_at else None
+            "description": case.description
         },
         "entities": [
             {
                 "id": e.id,
                 "name": e.name,
                 "kind": e.kind,
-                "description": e.description
+                "description": e.description,
+                "attributes": e.attributes or {}
             }
             for e in entities
         ],
         "relationships": [
             {
                 "id": r.id,
-                "source_id": r.source_id,
-                "target_id": r.target_id,
+                "source_id": r.source_entity_id,
+                "target_id": r.target_entity_id,
                 "relation": r.relation
             }
             for r in case_relationships
@@ -146,7 +148,7 @@ async def export_case(
     }
     
     if format == "json":
-        content = json.dumps(export_data, indent=2)
+        content = dumps(export_data, indent=True)
         media_type = "application/json"
         filename = f"case_{case_id}_export.json"
     else:
@@ -157,17 +159,18 @@ async def export_case(
         for e in entities:
             writer.writerow(["entity", e.id, e.name, e.kind, e.description or "", "", "", ""])
         for r in case_relationships:
-            writer.writerow(["relationship", r.id, "", "", "", r.source_id, r.target_id, r.relation])
+            writer.writerow(["relationship", r.id, "", "", "", r.source_entity_id, r.target_entity_id, r.relation])
         content = output.getvalue()
         media_type = "text/csv"
         filename = f"case_{case_id}_export.csv"
     
-    store.log_activity(
-        owner=user,
+    await activity_log.arecord(
+        owner=current_user.username,
         action="exported",
         resource_type="case",
         resource_name=case.name,
-        details=f"Exported as {format}"
+        details=f"Exported as {format}",
+        case_id=case.id
     )
     
     return Response(
@@ -0,0 +1,30 @@
+"""Indicator pivot endpoints."""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from app.dependencies import get_current_user
+from app.indicators import canonical_kind, detect_kind, normalize_indicator, refang
+from app.schemas import IndicatorPivot, UserPublic
+from app.storage import astore
+
+router = APIRouter(prefix="/indicators", tags=["indicators"])
+
+
+@router.get("/{value:path}/cases", response_model=IndicatorPivot)
+async def indicator_cases(
+    value: str,
+    kind: Optional[str] = Query(None, description="Indicator kind (ip, domain, url, email, hash, phone); guessed if omitted"),
+    current_user: UserPublic = Depends(get_current_user),
+) -> IndicatorPivot:
+    """Return every case of the current user that contains this indicator."""
+
+    resolved = canonical_kind(kind) or detect_kind(value)
+    indicator = normalize_indicator(resolved, value) or refang(value).lower()
+    return IndicatorPivot(
+        value=value,
+        kind=resolved,
+        indicator=indicator,
+        cases=await astore.find_indicator_cases(owner=current_user.username, indicator=indicator),
+    )
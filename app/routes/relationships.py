@@ -4,40 +4,46 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
+from app.activity import activity_log
 from app.dependencies import get_current_user
+from app.responses import FastJSONResponse
 from app.schemas import Relationship, RelationshipCreate, RelationshipUpdate, UserPublic
-from app.storage import store
+from app.storage import astore
 
 router = APIRouter(prefix="/relationships", tags=["relationships"])
 
 
 @router.get("/", response_model=list[Relationship])
-def list_relationships(
+async def list_relationships(
     case_id: Optional[int] = Query(None, description="Filter relationships by case ID"),
     current_user: UserPublic = Depends(get_current_user),
-) -> list[Relationship]:
+) -> FastJSONResponse:
     """Return relationships for the authenticated user."""
 
-    return store.list_relationships(owner=current_user.username, case_id=case_id)
+    rows = await astore.list_relationship_rows(owner=current_user.username, case_id=case_id)
+    return FastJSONResponse(rows)
 
 
 @router.post("/", response_model=Relationship, status_code=status.HTTP_201_CREATED)
-def create_relationship(
+async def create_relationship(
     payload: RelationshipCreate, current_user: UserPublic = Depends(get_current_user)
 ) -> Relationship:
     """Create a relationship between two entities."""
 
     try:
-        rel = store.create_relationship(owner=current_user.username, payload=payload)
-        source = store.get_entity(owner=current_user.username, entity_id=payload.source_entity_id)
-        target = store.get_entity(owner=current_user.username, entity_id=payload.target_entity_id)
-        store.log_activity(
+        rel = await astore.create_relationship(owner=current_user.username, payload=payload)
+        source, target = await astore.gather(
+            astore.get_entity(owner=current_user.username, entity_id=payload.source_entity_id),
+            astore.get_entity(owner=current_user.username, entity_id=payload.target_entity_id),
+        )
+        await activity_log.arecord(
             owner=current_user.username,
             action="created",
             resource_type="relationship",
             resource_id=rel.id,
             resource_name=f"{source.name} -> {target.name}",
-            details=f"Relation: {rel.relation}"
+            details=f"Relation: {rel.relation}",
+            case_id=source.case_id
         )
         return rel
     except KeyError as exc:
@@ -50,13 +56,13 @@ def create_relationship(
 
 
 @router.get("/{relationship_id}", response_model=Relationship)
-def get_relationship(
+async def get_relationship(
     relationship_id: int, current_user: UserPublic = Depends(get_current_user)
 ) -> Relationship:
     """Retrieve a relationship by ID."""
 
     try:
-        return store.get_relationship(owner=current_user.username, relationship_id=relationship_id)
+        return await astore.get_relationship(owner=current_user.username, relationship_id=relationship_id)
     except KeyError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -65,7 +71,7 @@ def get_relationship(
 
 
 @router.patch("/{relationship_id}", response_model=Relationship)
-def update_relationship(
+async def update_relationship(
     relationship_id: int,
     payload: RelationshipUpdate,
     current_user: UserPublic = Depends(get_current_user),
@@ -73,7 +79,7 @@ def update_relationship(
     """Update relationship metadata."""
 
     try:
-        return store.update_relationship(
+        return await astore.update_relationship(
             owner=current_user.username, relationship_id=relationship_id, payload=payload
         )
     except KeyError as exc:
@@ -84,20 +90,21 @@ def update_relationship(
 
 
 @router.delete("/{relationship_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_relationship(
+async def delete_relationship(
     relationship_id: int, current_user: UserPublic = Depends(get_current_user)
 ) -> None:
     """Delete a relationship by ID."""
 
     try:
-        rel = store.get_relationship(owner=current_user.username, relationship_id=relationship_id)
-        store.delete_relationship(owner=current_user.username, relationship_id=relationship_id)
-        store.log_activity(
+        rel = await astore.delete_relationship(owner=current_user.username, relationship_id=relationship_id)
+        source = await astore.get_entity(owner=current_user.username, entity_id=rel.source_entity_id)
+        await activity_log.arecord(
             owner=current_user.username,
             action="deleted",
             resource_type="relationship",
             resource_id=relationship_id,
-            resource_name=rel.relation
+            resource_name=rel.relation,
+            case_id=source.case_id
         )
     except KeyError as exc:
         raise HTTPException(
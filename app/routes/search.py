@@ -0,0 +1,34 @@
+"""Search endpoints."""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from app.dependencies import get_current_user
+from app.schemas import SearchResult, UserPublic
+from app.storage import astore
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("/", response_model=List[SearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text"),
+    case_id: Optional[int] = Query(None, description="Only search within this case"),
+    kind: Optional[List[str]] = Query(None, description="Only match entities of these kinds"),
+    prefix: bool = Query(False, description="Typeahead mode: match the start of entity names only"),
+    include_comments: bool = Query(True, description="Also search comment text"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: UserPublic = Depends(get_current_user),
+) -> List[SearchResult]:
+    """Search entity names, descriptions and comments, best matches first."""
+
+    return await astore.search(
+        owner=current_user.username,
+        query=q,
+        case_id=case_id,
+        kinds=kind,
+        include_comments=include_comments,
+        prefix=prefix,
+        limit=limit,
+    )
@@ -1,18 +1,57 @@
 """Activity timeline endpoints."""
 
-from typing import List
-from fastapi import APIRouter, Depends
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
 
+from app.activity import activity_log
 from app.dependencies import get_current_user
-from app.schemas import ActivityLog
-from app.storage import store
+from app.responses import FastJSONResponse
+from app.rows import ActivityLogRow
+from app.schemas import ActivityLog, UserPublic
+from app.storage import astore
 
 router = APIRouter(prefix="/timeline", tags=["timeline"])
 
 
+def encode_cursor(log: ActivityLogRow) -> str:
+    raw = f"{log.created_at.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, log_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
 @router.get("/", response_model=List[ActivityLog])
-def list_activity(
-    limit: int = 50,
-    user: str = Depends(get_current_user)
+async def list_activity(
+    limit: int = Query(50, ge=1, le=500),
+    case_id: Optional[int] = Query(None, description="Only activity for this case"),
+    resource_type: Optional[str] = Query(None, description="Only activity on this resource type"),
+    action: Optional[str] = Query(None, description="Only this action (created, deleted, ...)"),
+    since: Optional[datetime] = Query(None, description="Only activity at or after this time"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    current_user: UserPublic = Depends(get_current_user)
 ):
-    return store.list_activity_logs(user, limit)
+    """Return activity newest first. Pass the X-Next-Cursor header back as ``cursor`` for the next page."""
+
+    # Let the background writer catch up with what was queued before this read (bounded; never writes here).
+    await run_in_threadpool(activity_log.wait_for_queued)
+    logs = await astore.list_activity_log_rows(
+        current_user.username,
+        limit,
+        case_id=case_id,
+        resource_type=resource_type,
+        action=action,
+        before=decode_cursor(cursor) if cursor else None,
+        since=since,
+    )
+    headers = {"X-Next-Cursor": encode_cursor(logs[-1])} if len(logs) == limit else None
+    return FastJSONResponse(logs, headers=headers)
@@ -1,12 +1,26 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 
+from app.config import get_settings
 from app.dependencies import get_current_user
-from app.schemas import UserPublic
-from app.storage import store
-from app.transforms.dispatcher import run_transforms, get_available_transforms
+from app.schemas import (
+    EnrichmentRun,
+    ProviderStatus,
+    RawResponse,
+    RawResponseDetail,
+    TransformJob,
+    TransformRun,
+    UserPublic,
+)
+from app.storage import astore, store
+from app.transforms.archive import NotArchived, decode
+from app.transforms.dispatcher import find_transform, rematerialize_transforms, run_transforms, get_available_transforms
+from app.transforms.upstream import ProviderUnavailable, provider_stats
 
 router = APIRouter(prefix="/entities", tags=["transforms"])
+jobs_router = APIRouter(prefix="/transforms/jobs", tags=["transforms"])
+providers_router = APIRouter(prefix="/transforms/providers", tags=["transforms"])
+runs_router = APIRouter(prefix="/transforms/runs", tags=["transforms"])
 
 
 @router.get("/{entity_id}/transforms")
@@ -24,6 +38,9 @@ def list_entity_transforms(entity_id: int, current_user: UserPublic = Depends(ge
 def run_entity_transforms(
     entity_id: int,
     transform: Optional[str] = Query(None, description="Name of specific transform to run"),
+    fresh_hours: Optional[float] = Query(
+        None, gt=0, description="Skip the run if the transform succeeded on this entity within this many hours"
+    ),
     current_user: UserPublic = Depends(get_current_user)
 ):
     try:
@@ -31,4 +48,187 @@ def run_entity_transforms(
     except KeyError as exc:
         raise HTTPException(status_code=404, detail="Entity not found") from exc
 
-    return run_transforms(entity=entity, owner=current_user.username, transform_name=transform or "")
+    try:
+        return run_transforms(
+            entity=entity, owner=current_user.username, transform_name=transform or "", fresh_hours=fresh_hours
+        )
+    except ProviderUnavailable as exc:
+        raise HTTPException(
+            status_code=503, detail=str(exc), headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+        ) from exc
+
+
+@router.post("/{entity_id}/transforms/rematerialize")
+def rematerialize_entity_transforms(
+    entity_id: int,
+    transform: Optional[str] = Query(None, description="Name of specific transform to rebuild"),
+    current_user: UserPublic = Depends(get_current_user)
+):
+    """Re-run a transform from the entity's archived provider responses, without calling the provider."""
+    try:
+        entity = store.get_entity(owner=current_user.username, entity_id=entity_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Entity not found") from exc
+
+    try:
+        return rematerialize_transforms(entity=entity, owner=current_user.username, transform_name=transform or "")
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=exc.args[0]) from exc
+    except NotArchived as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@router.get("/{entity_id}/transforms/runs", response_model=list[TransformRun])
+async def list_entity_transform_runs(
+    entity_id: int,
+    transform: Optional[str] = Query(None),
+    run_status: Optional[str] = Query(None, alias="status", regex="^(succeeded|failed|skipped)$"),
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = Query(None, description="Return runs older than this run id"),
+    current_user: UserPublic = Depends(get_current_user)
+) -> list[TransformRun]:
+    """The entity's transform run history, newest first."""
+
+    return await astore.list_transform_runs(
+        current_user.username, entity_id=entity_id, transform=transform, status=run_status, limit=limit,
+        before_id=before_id,
+    )
+
+
+@router.get("/{entity_id}/raw-responses", response_model=list[RawResponse])
+async def list_raw_responses(
+    entity_id: int, current_user: UserPublic = Depends(get_current_user)
+) -> list[RawResponse]:
+    """Provider responses archived for the entity, newest first (payloads omitted)."""
+
+    return await astore.list_raw_responses(current_user.username, entity_id)
+
+
+@router.get("/{entity_id}/raw-responses/{response_id}", response_model=RawResponseDetail)
+async def get_raw_response(
+    entity_id: int, response_id: int, current_user: UserPublic = Depends(get_current_user)
+) -> RawResponseDetail:
+    """One archived provider response with its decompressed payload."""
+
+    try:
+        meta, compressed = await astore.get_raw_response(current_user.username, response_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Raw response not found") from exc
+    if meta.entity_id != entity_id:
+        raise HTTPException(status_code=404, detail="Raw response not found")
+    return RawResponseDetail(**meta.dict(), payload=decode(meta.codec, compressed))
+
+
+@router.post("/{entity_id}/enrich", response_model=EnrichmentRun)
+def enrich_entity(
+    entity_id: int,
+    depth: int = Query(2, ge=1, le=5, description="Levels of transforms to run outward from the entity"),
+    budget: Optional[int] = Query(None, ge=1, le=500, description="Provider runs the enrichment may start"),
+    transform: Optional[List[str]] = Query(None, description="Only run transforms with these names"),
+    fresh_hours: Optional[float] = Query(
+        None, ge=0, description="Skip transforms that succeeded on an entity within this many hours"
+    ),
+    current_user: UserPublic = Depends(get_current_user)
+) -> EnrichmentRun:
+    """Run transforms on the entity and, recursively, on what they find; returns everything added."""
+    from app.transforms.enrich import run_enrichment
+
+    try:
+        entity = store.get_entity(owner=current_user.username, entity_id=entity_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Entity not found") from exc
+
+    settings = get_settings()
+    return run_enrichment(
+        entity,
+        current_user.username,
+        max_depth=depth,
+        budget=budget or settings.enrichment_budget,
+        concurrency=settings.enrichment_concurrency,
+        transforms=transform,
+        fresh_hours=settings.transform_fresh_hours if fresh_hours is None else fresh_hours,
+    )
+
+
+@router.post("/{entity_id}/transforms/jobs", response_model=TransformJob, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_entity_transform(
+    entity_id: int,
+    transform: Optional[str] = Query(None, description="Name of specific transform to run"),
+    current_user: UserPublic = Depends(get_current_user)
+) -> TransformJob:
+    """Queue a transform for a worker process (``python -m app.worker``) instead of running it in the request."""
+
+    try:
+        entity = await astore.get_entity(owner=current_user.username, entity_id=entity_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Entity not found") from exc
+
+    provider = find_transform(entity.kind, transform or "")
+    if provider is None:
+        detail = (f"Transform '{transform}' not found for kind='{entity.kind}'" if transform
+                  else f"No transforms available for kind='{entity.kind}'")
+        raise HTTPException(status_code=404, detail=detail)
+
+    try:
+        return await astore.enqueue_transform_job(
+            current_user.username, entity_id, provider["name"], get_settings().transform_job_max_attempts
+        )
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Entity not found") from exc
+
+
+@jobs_router.get("/", response_model=list[TransformJob])
+async def list_transform_jobs(
+    job_status: Optional[str] = Query(None, alias="status", regex="^(queued|running|succeeded|dead)$"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: UserPublic = Depends(get_current_user)
+) -> list[TransformJob]:
+    """Return the current user's transform jobs, newest first."""
+
+    return await astore.list_transform_jobs(current_user.username, status=job_status, limit=limit)
+
+
+@jobs_router.get("/{job_id}", response_model=TransformJob)
+async def get_transform_job(job_id: int, current_user: UserPublic = Depends(get_current_user)) -> TransformJob:
+    """Return one job, including its result once it has succeeded."""
+
+    try:
+        return await astore.get_transform_job(current_user.username, job_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Transform job not found") from exc
+
+
+@jobs_router.post("/{job_id}/retry", response_model=TransformJob)
+async def retry_transform_job(job_id: int, current_user: UserPublic = Depends(get_current_user)) -> TransformJob:
+    """Send a dead-lettered job back to the queue with a fresh set of attempts."""
+
+    try:
+        return await astore.retry_transform_job(current_user.username, job_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Transform job not found") from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@providers_router.get("/", response_model=list[ProviderStatus])
+def list_provider_status(current_user: UserPublic = Depends(get_current_user)) -> list[ProviderStatus]:
+    """Circuit breaker state of each provider this worker process has called."""
+
+    return [ProviderStatus(**stats) for stats in provider_stats()]
+
+
+@runs_router.get("/", response_model=list[TransformRun])
+async def list_transform_runs(
+    entity_id: Optional[int] = Query(None),
+    transform: Optional[str] = Query(None),
+    run_status: Optional[str] = Query(None, alias="status", regex="^(succeeded|failed|skipped)$"),
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = Query(None, description="Return runs older than this run id"),
+    current_user: UserPublic = Depends(get_current_user)
+) -> list[TransformRun]:
+    """The current user's transform runs with their status, duration and result counts, newest first."""
+
+    return await astore.list_transform_runs(
+        current_user.username, entity_id=entity_id, transform=transform, status=run_status, limit=limit,
+        before_id=before_id,
+    )
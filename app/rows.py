@@ -0,0 +1,100 @@
+"""Lightweight row objects for bulk store reads.
+
+List endpoints can return thousands of rows that are only serialized back to
+JSON. Building and validating a pydantic model per row dominates that cost,
+so bulk reads use tuple cursors and these slotted dataclasses instead. The
+column order of each ``*_COLUMNS`` string matches the dataclass fields, so a
+row is built with ``EntityRow(*record)``.
+
+The pydantic models in ``app.schemas`` stay the public API: ``to_model``
+builds one without re-validating data that came from the database, and
+``to_json`` yields exactly what FastAPI's encoder would produce for it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from app.schemas import ActivityLog, Entity, Relationship
+
+ENTITY_COLUMNS = "id, case_id, name, kind, description, owner, attributes"
+RELATIONSHIP_COLUMNS = "id, source_entity_id, target_entity_id, relation, owner"
+ACTIVITY_LOG_COLUMNS = "id, action, resource_type, resource_id, resource_name, details, case_id, owner, created_at"
+
+
+@dataclass(slots=True)
+class EntityRow:
+    id: int
+    case_id: int
+    name: str
+    kind: Optional[str]
+    description: Optional[str]
+    owner: str
+    attributes: Optional[dict] = None
+
+    def to_model(self) -> Entity:
+        return Entity.construct(
+            id=self.id, case_id=self.case_id, name=self.name, kind=self.kind,
+            description=self.description, attributes=self.attributes or {}, owner=self.owner,
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "case_id": self.case_id, "name": self.name, "kind": self.kind, "description": self.description,
+            "attributes": self.attributes or {}, "id": self.id, "owner": self.owner,
+        }
+
+
+@dataclass(slots=True)
+class RelationshipRow:
+    id: int
+    source_entity_id: int
+    target_entity_id: int
+    relation: Optional[str]
+    owner: str
+
+    def to_model(self) -> Relationship:
+        return Relationship.construct(
+            id=self.id, source_entity_id=self.source_entity_id,
+            target_entity_id=self.target_entity_id, relation=self.relation, owner=self.owner,
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "source_entity_id": self.source_entity_id, "target_entity_id": self.target_entity_id,
+            "relation": self.relation, "id": self.id, "owner": self.owner,
+        }
+
+
+@dataclass(slots=True)
+class ActivityLogRow:
+    id: int
+    action: str
+    resource_type: str
+    resource_id: Optional[int]
+    resource_name: Optional[str]
+    details: Optional[str]
+    case_id: Optional[int]
+    owner: str
+    created_at: datetime
+
+    def to_model(self) -> ActivityLog:
+        return ActivityLog.construct(
+            id=self.id, action=self.action, resource_type=self.resource_type,
+            resource_id=self.resource_id, resource_name=self.resource_name, details=self.details,
+            case_id=self.case_id, owner=self.owner, created_at=self.created_at,
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "id": self.id, "action": self.action, "resource_type": self.resource_type,
+            "resource_id": self.resource_id, "resource_name": self.resource_name,
+            "details": self.details, "case_id": self.case_id, "owner": self.owner,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+def rows_to_json(rows: Iterable) -> List[dict]:
+    return [row.to_json() for row in rows]
@@ -1,7 +1,7 @@
 """Pydantic schemas shared across the application."""
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 from pydantic import BaseModel, Field
 
@@ -101,6 +101,7 @@ class EntityBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=150)
     kind: str = Field(..., min_length=1, max_length=100)
     description: Optional[str] = None
+    attributes: Dict[str, Any] = Field(default_factory=dict)
 
 
 class EntityCreate(EntityBase):
@@ -116,6 +117,8 @@ class EntityUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=150)
     kind: Optional[str] = Field(None, min_length=1, max_length=100)
     description: Optional[str] = None
+    # merged into the stored attributes; a null value removes its key
+    attributes: Optional[Dict[str, Any]] = None
 
 
 # =========================
@@ -141,6 +144,178 @@ class RelationshipUpdate(BaseModel):
     relation: Optional[str] = Field(None, min_length=1, max_length=100)
 
 
+# =========================
+# Graph traversal
+# =========================
+
+class GraphNeighborhood(BaseModel):
+    nodes: List[Entity]
+    edges: List[Relationship]
+    truncated: bool = False
+
+
+class GraphPath(BaseModel):
+    found: bool
+    length: Optional[int] = None
+    nodes: List[Entity] = []
+    edges: List[Relationship] = []
+
+
+class GraphComponent(BaseModel):
+    size: int
+    entity_ids: List[int]
+
+
+class GraphComponents(BaseModel):
+    case_id: int
+    total: int
+    components: List[GraphComponent]
+
+
+class RankedEntity(BaseModel):
+    entity_id: int
+    score: float
+    name: Optional[str] = None
+    kind: Optional[str] = None
+
+
+class GraphCommunity(BaseModel):
+    id: int
+    size: int
+    entity_ids: List[int]
+
+
+class GraphAnalytics(BaseModel):
+    case_id: int
+    node_count: int
+    edge_count: int
+    degree: List[RankedEntity]
+    pagerank: List[RankedEntity]
+    betweenness: List[RankedEntity]
+    betweenness_samples: int
+    community_count: int
+    communities: List[GraphCommunity]
+
+
+class GraphCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_entries: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    invalidations: int
+    shared: bool = False
+    shared_hits: int = 0
+
+
+# =========================
+# Transform jobs
+# =========================
+
+class TransformJob(BaseModel):
+    id: int
+    owner: str
+    entity_id: int
+    transform: str
+    status: str
+    attempts: int
+    max_attempts: int
+    refresh: bool = False  # queued by the refresh scheduler rather than a user
+    run_at: datetime
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    result: Optional[dict] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class TransformRunCreate(BaseModel):
+    entity_id: int
+    transform: str
+    status: str  # succeeded, failed, or skipped when the transform called no provider
+    started_at: datetime
+    duration_ms: float
+    nodes: int = 0
+    edges: int = 0
+    fetched: int = 0
+    message: Optional[str] = None
+    error: Optional[str] = None
+    job_id: Optional[int] = None
+    # attributes the run changed on the entity: {key: {"old": ..., "new": ...}}
+    changes: Optional[Dict[str, Any]] = None
+
+
+class TransformRun(TransformRunCreate):
+    id: int
+    owner: str
+
+
+class RawResponse(BaseModel):
+    """An archived provider response, without its payload."""
+
+    id: int
+    entity_id: int
+    transform: str
+    provider: str
+    content_hash: str
+    codec: str
+    size: int
+    stored_size: int
+    run_id: Optional[int] = None
+    job_id: Optional[int] = None
+    fetched_at: datetime
+
+
+class RawResponseDetail(RawResponse):
+    payload: Any = None
+
+
+class ProviderStatus(BaseModel):
+    provider: str
+    state: str
+    window_calls: int
+    failure_rate: float
+    slow_call_rate: float
+    in_flight: int
+    calls: int
+    rejected: int
+    trips: int
+    retry_after: Optional[float] = None
+
+
+# =========================
+# Enrichment
+# =========================
+
+class EnrichmentStep(BaseModel):
+    entity_id: int
+    transform: str
+    depth: int
+    nodes: int = 0
+    edges: int = 0
+    message: Optional[str] = None
+    error: Optional[str] = None
+
+
+class EnrichmentRun(BaseModel):
+    seed_entity_id: int
+    case_id: int
+    max_depth: int
+    depth_reached: int
+    calls: int
+    budget: int
+    budget_exhausted: bool
+    merged: int
+    nodes: List[Entity]
+    edges: List[Relationship]
+    steps: List[EnrichmentStep]
+
+
 # =========================
 # Activity Logs
 # =========================
@@ -152,10 +327,44 @@ class ActivityLog(BaseModel):
     resource_id: Optional[int] = None
     resource_name: Optional[str] = None
     details: Optional[str] = None
+    case_id: Optional[int] = None
     owner: str
     created_at: datetime
 
 
+# =========================
+# Indicators
+# =========================
+
+class IndicatorCase(BaseModel):
+    case_id: int
+    case_name: str
+    entity_ids: List[int]
+    kinds: List[str]
+
+
+class IndicatorPivot(BaseModel):
+    value: str
+    kind: Optional[str] = None
+    indicator: str
+    cases: List[IndicatorCase]
+
+
+# =========================
+# Search
+# =========================
+
+class SearchResult(BaseModel):
+    type: str
+    id: int
+    entity_id: int
+    case_id: int
+    name: str
+    kind: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+
+
 # =========================
 # Comments
 # =========================
@@ -0,0 +1,107 @@
+"""Content-hashed static assets.
+
+``index.html`` is served with its asset links rewritten to
+``/static/<file>?v=<hash>``. Requests carrying the current hash get a
+year-long immutable cache lifetime; any other static request is
+revalidated. Every static file carries a strong ETag of its content hash, so
+revalidation is a 304 whether or not the file's mtime moved.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from threading import Lock
+from typing import Dict, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+_ASSET_LINK = re.compile(r'((?:src|href)=")/static/([^"?#]+)(")')
+
+
+class AssetHashes:
+    """sha256 prefixes of files under a directory, recomputed when size or mtime change."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = Lock()
+
+    def digest(self, path: str, stat_result: os.stat_result = None) -> str:
+        stat_result = stat_result or os.stat(path)
+        key = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == key:
+            return cached[2]
+        with open(path, "rb") as fh:
+            digest = hashlib.sha256(fh.read()).hexdigest()[:16]
+        with self._lock:
+            self._hashes[path] = (*key, digest)
+        return digest
+
+    def url(self, relative: str) -> str:
+        path = os.path.join(self.directory, relative)
+        if not os.path.isfile(path):
+            return f"/static/{relative}"
+        return f"/static/{relative}?v={self.digest(path)}"
+
+
+class HashedStaticFiles(StaticFiles):
+    def __init__(self, *, directory: str, max_age: int = 31536000, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.max_age = max_age
+        self.hashes = AssetHashes(directory)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        digest = self.hashes.digest(str(full_path), stat_result)
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers["etag"] = f'"{digest}"'
+        versions = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v")
+        if versions == [digest]:
+            response.headers["cache-control"] = f"public, max-age={self.max_age}, immutable"
+        else:
+            response.headers["cache-control"] = "no-cache"
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class IndexPage:
+    """``index.html`` with hashed asset URLs, re-rendered only when a file changes."""
+
+    def __init__(self, path: str, hashes: AssetHashes):
+        self.path = path
+        self.hashes = hashes
+        # (index digest, html, linked assets) and (asset urls, body, etag), each swapped as one tuple
+        self._source: Tuple[str, str, Tuple[str, ...]] = ("", "", ())
+        self._rendered: Tuple[Tuple[str, ...], bytes, str] = ((), b"", "")
+
+    def _render(self) -> Tuple[bytes, str]:
+        index_digest = self.hashes.digest(self.path)
+        if index_digest != self._source[0]:
+            with open(self.path, encoding="utf-8") as fh:
+                html = fh.read()
+            assets = tuple(sorted(set(m.group(2) for m in _ASSET_LINK.finditer(html))))
+            self._source = (index_digest, html, assets)
+            self._rendered = ((), b"", "")
+        _, html, assets = self._source
+        urls = tuple(self.hashes.url(a) for a in assets)
+        if urls != self._rendered[0] or not self._rendered[1]:
+            by_asset = dict(zip(assets, urls))
+            body = _ASSET_LINK.sub(lambda m: f"{m.group(1)}{by_asset[m.group(2)]}{m.group(3)}", html).encode("utf-8")
+            self._rendered = (urls, body, f'"{hashlib.sha256(body).hexdigest()[:16]}"')
+        return self._rendered[1], self._rendered[2]
+
+    def response(self, request: Request) -> Response:
+        body, etag = self._render()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in [tag.strip(" W/") for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="text/html", headers=headers)
@@ -0,0 +1,74 @@
+"""Storage backends for GhostLock.
+
+``store`` is the process-wide backend selected by ``APP_STORAGE_BACKEND``:
+``postgres`` (the default, configured by ``DATABASE_URL``) or ``sqlite`` for
+an embedded single-node database at ``APP_SQLITE_PATH``.
+
+Importing this package does not touch the database. ``store`` is a proxy
+whose backend is created by ``store.open()`` (called from the application
+lifespan) or on first attribute access, so scripts, workers and tests can
+import route and transform modules without a live connection. ``astore`` is
+the awaitable view of the same backend used by ``async def`` routes.
+"""
+
+from threading import Lock
+from typing import Callable, Optional
+
+from app.config import get_settings
+from app.storage.aio import AsyncStore
+from app.storage.base import Store
+
+
+def create_store(backend: str = None, sqlite_path: str = None) -> Store:
+    settings = get_settings()
+    backend = (backend or settings.storage_backend).lower()
+    if backend == "sqlite":
+        from app.storage.sqlite import SQLiteStore
+
+        return SQLiteStore(sqlite_path or settings.sqlite_path)
+    if backend == "postgres":
+        from app.storage.postgres import PostgresStore
+
+        return PostgresStore(settings.db_pool_min_size, settings.db_pool_max_size)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+class LazyStore:
+    """Forwards attribute access to a backend created on first use."""
+
+    def __init__(self, factory: Callable[[], Store] = create_store):
+        self._factory = factory
+        self._backend: Optional[Store] = None
+        self._lock = Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._backend is not None
+
+    def open(self) -> Store:
+        """Create the backend (connect, run schema setup) if it is not open yet."""
+        backend = self._backend
+        if backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._factory()
+                backend = self._backend
+        return backend
+
+    def close(self) -> None:
+        with self._lock:
+            backend, self._backend = self._backend, None
+        if backend is not None:
+            backend.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self.open(), name)
+
+    def __repr__(self) -> str:
+        return f"<LazyStore {self._backend!r}>" if self._backend is not None else "<LazyStore (not open)>"
+
+
+store = LazyStore()
+astore = AsyncStore(store)
+
+__all__ = ["AsyncStore", "LazyStore", "Store", "astore", "create_store", "store"]
@@ -0,0 +1,49 @@
+"""Awaitable storage API for ``async def`` routes.
+
+``astore.<method>(...)`` runs the matching ``store`` method in a worker
+thread and awaits it, so the event loop never blocks on the database. At
+most ``APP_STORE_MAX_CONCURRENCY`` calls run at once; requests beyond that
+wait as suspended coroutines rather than each holding a threadpool slot.
+``gather`` overlaps independent reads on separate pooled connections.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import anyio
+
+from app.config import get_settings
+
+
+class AsyncStore:
+    def __init__(self, store, max_concurrency: Optional[int] = None):
+        self._store = store
+        self._max_concurrency = max_concurrency
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self._methods: Dict[str, Callable[..., Awaitable[Any]]] = {}
+
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        # created on first use so it binds to the running event loop
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self._max_concurrency or get_settings().store_max_concurrency)
+        return self._limiter
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        func = partial(getattr(self._store, method), *args, **kwargs)
+        return await anyio.to_thread.run_sync(func, limiter=self.limiter)
+
+    async def gather(self, *calls: Awaitable[Any]) -> list:
+        """Await several storage calls concurrently; results come back in call order."""
+        return list(await asyncio.gather(*calls))
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = self._methods.get(name)
+        if method is None:
+            method = self._methods[name] = partial(self.call, name)
+        return method
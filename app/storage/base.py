@@ -0,0 +1,384 @@
+"""Storage backend interface.
+
+``Store`` is the persistence API used by routes, transforms and the activity
+writer. Backends implement the abstract methods; the model-returning
+wrappers over bulk row reads and the case graph cache are shared here.
+"""
+
+from __future__ import annotations
+
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from app.attributes import AttributeFilter, AttributeSort
+from app.graph import CaseGraph
+from app.graph_cache import graph_cache
+from app.rows import ActivityLogRow, EntityRow, RelationshipRow
+from app.schemas import (
+    ActivityLog,
+    ApiKey,
+    ApiKeyCreate,
+    ApiKeyUpdate,
+    Case,
+    CaseCreate,
+    CaseUpdate,
+    Comment,
+    CommentCreate,
+    Entity,
+    EntityCreate,
+    EntityUpdate,
+    IndicatorCase,
+    RawResponse,
+    Relationship,
+    RelationshipCreate,
+    RelationshipUpdate,
+    SearchResult,
+    TransformJob,
+    TransformRun,
+    TransformRunCreate,
+    UserCreate,
+    UserPublic,
+)
+
+
+def search_terms(query: str) -> Tuple[str, List[str], str]:
+    """Split a search query into ``(needle, terms, like_prefix)``.
+
+    ``needle`` is the lower-cased query, ``terms`` its words with query
+    operators stripped, and ``like_prefix`` an escaped ``LIKE`` pattern
+    matching names that start with the needle.
+    """
+    needle = query.strip().lower()
+    terms = [t for t in (re.sub(r"[&|!():*<>'\"\\^]", "", word) for word in needle.split()) if t]
+    like = needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return needle, terms, like
+
+
+class Store(ABC):
+    # whether ``search`` can do fuzzy (trigram) name matching
+    has_trigram = False
+
+    def close(self) -> None:
+        """Release connections held by the backend."""
+
+    # Users ----------------------------------------------------------------
+    @abstractmethod
+    def create_user(self, payload: UserCreate) -> UserPublic: ...
+
+    @abstractmethod
+    def authenticate(self, username: str, password: str) -> Optional[UserPublic]: ...
+
+    @abstractmethod
+    def get_user(self, username: str) -> Optional[UserPublic]: ...
+
+    # API keys ---------------------------------------------------------------
+    @abstractmethod
+    def list_api_keys(self, owner: str) -> List[ApiKey]: ...
+
+    @abstractmethod
+    def create_api_key(self, owner: str, payload: ApiKeyCreate) -> ApiKey: ...
+
+    @abstractmethod
+    def get_api_key(self, owner: str, key_id: int) -> ApiKey: ...
+
+    @abstractmethod
+    def update_api_key(self, owner: str, key_id: int, payload: ApiKeyUpdate) -> ApiKey: ...
+
+    @abstractmethod
+    def delete_api_key(self, owner: str, key_id: int) -> None: ...
+
+    # Cases ------------------------------------------------------------------
+    @abstractmethod
+    def list_cases(self, owner: str) -> List[Case]: ...
+
+    @abstractmethod
+    def create_case(self, owner: str, payload: CaseCreate) -> Case: ...
+
+    @abstractmethod
+    def get_case(self, owner: str, case_id: int) -> Case: ...
+
+    @abstractmethod
+    def update_case(self, owner: str, case_id: int, payload: CaseUpdate) -> Case: ...
+
+    @abstractmethod
+    def delete_case(self, owner: str, case_id: int) -> Case:
+        """Delete a case with its entities and relationships; returns the deleted case."""
+
+    # Entities ---------------------------------------------------------------
+    def list_entities(self, owner: str, case_id: Optional[int] = None) -> List[Entity]:
+        return [row.to_model() for row in self.list_entity_rows(owner, case_id)]
+
+    @abstractmethod
+    def list_entity_rows(
+        self,
+        owner: str,
+        case_id: Optional[int] = None,
+        filters: Sequence[AttributeFilter] = (),
+        sort: Optional[AttributeSort] = None,
+        limit: Optional[int] = None,
+    ) -> List[EntityRow]:
+        """Bulk read into slotted rows (no per-row validation).
+
+        ``filters`` and ``sort`` are evaluated in SQL (see ``app.attributes``);
+        without ``sort`` rows are ordered by id.
+        """
+
+    @abstractmethod
+    def create_entity(self, owner: str, payload: EntityCreate) -> Entity: ...
+
+    @abstractmethod
+    def get_entity(self, owner: str, entity_id: int) -> Entity: ...
+
+    @abstractmethod
+    def update_entity(self, owner: str, entity_id: int, payload: EntityUpdate) -> Entity: ...
+
+    @abstractmethod
+    def delete_entity(self, owner: str, entity_id: int) -> Entity:
+        """Delete an entity and its relationships; returns the deleted entity."""
+
+    def get_entities_by_ids(self, owner: str, entity_ids: List[int]) -> List[Entity]:
+        return [row.to_model() for row in self.get_entity_rows(owner, entity_ids)]
+
+    @abstractmethod
+    def get_entity_rows(self, owner: str, entity_ids: List[int]) -> List[EntityRow]:
+        """Entity rows in the order of ``entity_ids``; ids not owned by ``owner`` are skipped."""
+
+    @abstractmethod
+    def find_indicator_cases(self, owner: str, indicator: str) -> List[IndicatorCase]:
+        """Cases containing an entity whose normalized indicator equals ``indicator``."""
+
+    # Relationships ----------------------------------------------------------
+    def list_relationships(self, owner: str, case_id: Optional[int] = None) -> List[Relationship]:
+        return [row.to_model() for row in self.list_relationship_rows(owner, case_id)]
+
+    def list_relationship_rows(self, owner: str, case_id: Optional[int] = None) -> List[RelationshipRow]:
+        return self._owner_relationship_rows(owner, case_id)
+
+    @abstractmethod
+    def _owner_relationship_rows(self, owner: str, case_id: Optional[int] = None) -> List[RelationshipRow]:
+        """``owner``'s relationship rows ordered by id; with ``case_id``, those whose source is in the case."""
+
+    @abstractmethod
+    def create_relationship(self, owner: str, payload: RelationshipCreate) -> Relationship: ...
+
+    @abstractmethod
+    def get_relationship(self, owner: str, relationship_id: int) -> Relationship: ...
+
+    @abstractmethod
+    def update_relationship(self, owner: str, relationship_id: int, payload: RelationshipUpdate) -> Relationship: ...
+
+    @abstractmethod
+    def delete_relationship(self, owner: str, relationship_id: int) -> Relationship:
+        """Delete a relationship; returns the deleted relationship."""
+
+    def get_relationships_by_ids(self, owner: str, relationship_ids: List[int]) -> List[Relationship]:
+        return [row.to_model() for row in self.get_relationship_rows(owner, relationship_ids)]
+
+    @abstractmethod
+    def get_relationship_rows(self, owner: str, relationship_ids: List[int]) -> List[RelationshipRow]:
+        """Relationship rows in the order of ``relationship_ids``; ids not owned by ``owner`` are skipped."""
+
+    # Graph traversal --------------------------------------------------------
+    def load_case_graph(self, owner: str, case_id: int) -> CaseGraph:
+        """Return the case's graph, from the in-memory cache when it is hot."""
+        return graph_cache.get_or_load(owner, case_id, lambda: self._load_case_graph(owner, case_id))
+
+    @abstractmethod
+    def _load_case_graph(self, owner: str, case_id: int) -> CaseGraph:
+        """Load only the ids needed to traverse a case's graph."""
+
+    # Transform jobs ---------------------------------------------------------
+    # A job is queued -> running (leased to one worker) -> succeeded, or back to
+    # queued for a retry, or dead once its attempts are used up. Worker-side
+    # calls only take effect while ``worker_id`` still holds the lease.
+    @abstractmethod
+    def enqueue_transform_job(self, owner: str, entity_id: int, transform: str, max_attempts: int) -> TransformJob:
+        """Queue a transform run for one of ``owner``'s entities (KeyError if it is not theirs)."""
+
+    @abstractmethod
+    def get_transform_job(self, owner: str, job_id: int) -> TransformJob: ...
+
+    @abstractmethod
+    def list_transform_jobs(self, owner: str, status: Optional[str] = None, limit: int = 50) -> List[TransformJob]:
+        """``owner``'s jobs, newest first."""
+
+    @abstractmethod
+    def retry_transform_job(self, owner: str, job_id: int) -> TransformJob:
+        """Re-queue a dead job with fresh attempts (ValueError if it is not dead)."""
+
+    @abstractmethod
+    def claim_transform_jobs(self, worker_id: str, limit: int, lease_seconds: float) -> List[TransformJob]:
+        """Lease up to ``limit`` due jobs to ``worker_id``, counting an attempt for each.
+
+        Jobs whose lease expired are first re-queued, or dead-lettered when
+        they have no attempts left.
+        """
+
+    @abstractmethod
+    def heartbeat_transform_jobs(self, worker_id: str, job_ids: List[int], lease_seconds: float) -> List[int]:
+        """Extend the leases ``worker_id`` still holds; returns their ids."""
+
+    @abstractmethod
+    def complete_transform_job(self, worker_id: str, job_id: int, result: dict) -> bool:
+        """Mark a leased job succeeded; False if the lease was lost meanwhile."""
+
+    @abstractmethod
+    def fail_transform_job(self, worker_id: str, job_id: int, error: str, retry_in: Optional[float]) -> bool:
+        """Record a failed attempt: re-queue after ``retry_in`` seconds, or dead-letter when it is None."""
+
+    @abstractmethod
+    def schedule_refresh_jobs(
+        self,
+        transform: str,
+        kinds: List[str],
+        stale_before: datetime,
+        limit: int,
+        per_hour: int,
+        max_attempts: int,
+        spread_seconds: float,
+    ) -> List[TransformJob]:
+        """Queue refresh jobs for entities whose last run of ``transform`` started before ``stale_before``.
+
+        Only entities of ``kinds`` on which the transform once succeeded and
+        that have no job for it pending are picked, least recently run first.
+        At most ``limit`` jobs are queued, and fewer once ``per_hour`` refresh
+        jobs for the transform were queued in the last hour by any scheduler.
+        Their ``run_at`` is staggered evenly over ``spread_seconds``.
+        """
+
+    # Transform runs -----------------------------------------------------------
+    @abstractmethod
+    def create_transform_run(self, owner: str, payload: TransformRunCreate) -> TransformRun:
+        """Record a finished transform run on one of ``owner``'s entities (KeyError if it is not theirs)."""
+
+    @abstractmethod
+    def list_transform_runs(
+        self,
+        owner: str,
+        entity_id: Optional[int] = None,
+        transform: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 50,
+        before_id: Optional[int] = None,
+    ) -> List[TransformRun]:
+        """``owner``'s runs, newest first; ``before_id`` pages past the last run of the previous page."""
+
+    @abstractmethod
+    def last_transform_run(
+        self, owner: str, entity_id: int, transform: str, status: str = "succeeded"
+    ) -> Optional[TransformRun]:
+        """The most recent run of ``transform`` on the entity with that status."""
+
+    # Raw provider responses -----------------------------------------------------
+    # Payloads are stored once per content hash (compressed, see
+    # app.transforms.archive); each fetch adds a link from the entity and
+    # transform run to the payload it returned.
+    @abstractmethod
+    def archive_raw_response(
+        self,
+        owner: str,
+        entity_id: int,
+        transform: str,
+        provider: str,
+        content_hash: str,
+        codec: str,
+        size: int,
+        payload: bytes,
+        job_id: Optional[int] = None,
+        run_id: Optional[int] = None,
+    ) -> RawResponse:
+        """Link a fetched payload to ``owner``'s entity, storing it unless that content is already archived.
+
+        KeyError if the entity is not ``owner``'s.
+        """
+
+    @abstractmethod
+    def list_raw_responses(self, owner: str, entity_id: int) -> List[RawResponse]:
+        """The archived responses of an entity, newest first."""
+
+    @abstractmethod
+    def get_raw_response(self, owner: str, response_id: int) -> Tuple[RawResponse, bytes]:
+        """One archived response with its stored (compressed) payload."""
+
+    @abstractmethod
+    def latest_raw_responses(self, owner: str, entity_id: int, transform: str) -> List[Tuple[RawResponse, bytes]]:
+        """The newest archived response of each provider ``transform`` called for the entity."""
+
+    @abstractmethod
+    def prune_raw_responses(self) -> int:
+        """Delete payloads no link refers to any more (their entities were deleted); returns how many."""
+
+    # Activity log -----------------------------------------------------------
+    @abstractmethod
+    def log_activity(
+        self,
+        owner: str,
+        action: str,
+        resource_type: str,
+        resource_id: Optional[int] = None,
+        resource_name: Optional[str] = None,
+        details: Optional[str] = None,
+        case_id: Optional[int] = None,
+    ) -> ActivityLog: ...
+
+    @abstractmethod
+    def log_activities(self, events: List[dict]) -> int:
+        """Insert a batch of buffered activity events in a single transaction."""
+
+    def list_activity_logs(
+        self,
+        owner: str,
+        limit: int = 50,
+        case_id: Optional[int] = None,
+        resource_type: Optional[str] = None,
+        action: Optional[str] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        since: Optional[datetime] = None,
+    ) -> List[ActivityLog]:
+        return [
+            row.to_model()
+            for row in self.list_activity_log_rows(owner, limit, case_id, resource_type, action, before, since)
+        ]
+
+    @abstractmethod
+    def list_activity_log_rows(
+        self,
+        owner: str,
+        limit: int = 50,
+        case_id: Optional[int] = None,
+        resource_type: Optional[str] = None,
+        action: Optional[str] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        since: Optional[datetime] = None,
+    ) -> List[ActivityLogRow]:
+        """Return activity newest first, keyset-paged on ``(created_at, id)``."""
+
+    @abstractmethod
+    def maintain_activity_logs(self, retention_days: int = 0, rollup: bool = True) -> List[str]:
+        """Apply activity log retention; returns the names of what was dropped."""
+
+    # Search -----------------------------------------------------------------
+    @abstractmethod
+    def search(
+        self,
+        owner: str,
+        query: str,
+        case_id: Optional[int] = None,
+        kinds: Optional[List[str]] = None,
+        include_comments: bool = True,
+        prefix: bool = False,
+        limit: int = 20,
+    ) -> List[SearchResult]:
+        """Ranked search over entity names/descriptions and comment text."""
+
+    # Comments ---------------------------------------------------------------
+    @abstractmethod
+    def create_comment(self, owner: str, payload: CommentCreate) -> Comment: ...
+
+    @abstractmethod
+    def list_comments(self, owner: str, entity_id: int) -> List[Comment]: ...
+
+    @abstractmethod
+    def delete_comment(self, owner: str, comment_id: int) -> None: ...
@@ -0,0 +1,1649 @@
+"""PostgreSQL-backed storage layer for GhostLock."""
+
+from __future__ import annotations
+
+import json
+import os
+import psycopg2
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from threading import BoundedSemaphore
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from app.attributes import (
+    INDEXED_ATTRIBUTES,
+    RANGE_OPS,
+    AttributeFilter,
+    AttributeSort,
+    clean_attributes,
+    json_type,
+    nest,
+)
+from app.cache import API_KEYS_KEY, cache
+from app.changes import changes
+from app.graph import CaseGraph
+from app.graph_cache import graph_cache
+from app.indicators import (
+    INDICATOR_KINDS,
+    KIND_ALIASES,
+    canonical_kind,
+    normalize_indicator,
+    renamed_indicators,
+)
+from app.rows import (
+    ACTIVITY_LOG_COLUMNS,
+    ENTITY_COLUMNS,
+    RELATIONSHIP_COLUMNS,
+    ActivityLogRow,
+    EntityRow,
+    RelationshipRow,
+)
+from app.schemas import (
+    ActivityLog,
+    ApiKey,
+    ApiKeyCreate,
+    ApiKeyUpdate,
+    Case,
+    CaseCreate,
+    CaseUpdate,
+    Comment,
+    CommentCreate,
+    Entity,
+    EntityCreate,
+    EntityUpdate,
+    IndicatorCase,
+    RawResponse,
+    Relationship,
+    RelationshipCreate,
+    RelationshipUpdate,
+    SearchResult,
+    TransformJob,
+    TransformRun,
+    TransformRunCreate,
+    UserCreate,
+    UserPublic,
+)
+from app.security import hash_password, verify_password
+from app.storage.base import Store, search_terms
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+# Advisory lock held by schema setup and partition maintenance, which run DDL
+# from every worker process
+_SCHEMA_LOCK = "ghostlock:schema"
+# monthly activity log partitions kept ready past the current month
+_MONTHS_AHEAD = 3
+
+# Write paths as single statements, prepared once per pooled connection:
+# name -> (parameter types, body). Ownership and case checks happen in SQL,
+# so each API write is one round trip; an empty result means "not found".
+_PREPARED = {
+    "create_api_key": ("text, text, text", """
+        INSERT INTO api_keys (id, name, description, key, active, owner)
+        SELECT n, $1, $2, 'key-' || lpad(n::text, greatest(6, length(n::text)), '0'), TRUE, $3
+        FROM (SELECT nextval(pg_get_serial_sequence('api_keys', 'id')) AS n) next_key
+        RETURNING id, name, description, key, active, owner"""),
+    "update_api_key": ("int, text, text, text, boolean", """
+        UPDATE api_keys
+        SET name = COALESCE($3, name), description = COALESCE($4, description), active = COALESCE($5, active)
+        WHERE id = $1 AND owner = $2
+        RETURNING id, name, description, key, active, owner"""),
+    "delete_api_key": ("int, text", "DELETE FROM api_keys WHERE id = $1 AND owner = $2 RETURNING id"),
+    "create_case": ("text, text, text", """
+        INSERT INTO cases (name, description, owner) VALUES ($1, $2, $3)
+        RETURNING id, name, description, owner"""),
+    "update_case": ("int, text, text, text", """
+        UPDATE cases SET name = COALESCE($3, name), description = COALESCE($4, description)
+        WHERE id = $1 AND owner = $2
+        RETURNING id, name, description, owner"""),
+    "delete_case": ("int, text", """
+        WITH gone AS (
+            DELETE FROM cases WHERE id = $1 AND owner = $2 RETURNING id, name, description, owner
+        ), gone_entities AS (
+            DELETE FROM entities WHERE owner = $2 AND case_id IN (SELECT id FROM gone) RETURNING id
+        ), gone_relationships AS (
+            DELETE FROM relationships
+            WHERE owner = $2 AND (source_entity_id IN (SELECT id FROM gone_entities)
+                                  OR target_entity_id IN (SELECT id FROM gone_entities))
+        )
+        SELECT * FROM gone"""),
+    "create_entity": ("int, text, text, text, text, text, jsonb", f"""
+        INSERT INTO entities (case_id, name, kind, description, indicator, owner, attributes)
+        SELECT $1, $2, $3, $4, $5, $6, $7 WHERE EXISTS (SELECT 1 FROM cases WHERE id = $1 AND owner = $6)
+        RETURNING {ENTITY_COLUMNS}"""),
+    "lock_entity": ("int, text", "SELECT name, kind FROM entities WHERE id = $1 AND owner = $2 FOR UPDATE"),
+    # $6: set the indicator to $7; $8: when only the name changes, the new name's indicator for every
+    # kind (app.indicators.renamed_indicators), picked by the stored kind
+    "update_entity": ("int, text, text, text, text, boolean, text, jsonb, text[], jsonb", f"""
+        UPDATE entities
+        SET name = COALESCE($3, name), kind = COALESCE($4, kind), description = COALESCE($5, description),
+            indicator = CASE
+                WHEN $8 IS NOT NULL THEN $8 ->> lower(btrim(kind, E' \\t\\n\\r\\f\\v'))
+                WHEN $6 THEN $7
+                ELSE indicator
+            END,
+            attributes = (attributes - $9) || $10
+        WHERE id = $1 AND owner = $2
+        RETURNING {ENTITY_COLUMNS}"""),
+    "delete_entity": ("int, text", f"""
+        WITH gone AS (
+            DELETE FROM entities WHERE id = $1 AND owner = $2 RETURNING {ENTITY_COLUMNS}
+        ), gone_relationships AS (
+            DELETE FROM relationships
+            WHERE owner = $2 AND (source_entity_id = $1 OR target_entity_id = $1) AND EXISTS (SELECT 1 FROM gone)
+        )
+        SELECT * FROM gone"""),
+    "create_relationship": ("int, int, text, text", """
+        WITH ends AS (
+            SELECT s.case_id AS source_case_id, t.case_id AS target_case_id
+            FROM entities s, entities t
+            WHERE s.id = $1 AND s.owner = $4 AND t.id = $2 AND t.owner = $4
+        ), created AS (
+            INSERT INTO relationships (source_entity_id, target_entity_id, relation, owner)
+            SELECT $1, $2, $3, $4 FROM ends WHERE source_case_id = target_case_id
+            RETURNING id
+        )
+        SELECT ends.source_case_id, ends.target_case_id, created.id FROM ends LEFT JOIN created ON TRUE"""),
+    "update_relationship": ("int, text, text", f"""
+        UPDATE relationships SET relation = COALESCE($3, relation) WHERE id = $1 AND owner = $2
+        RETURNING {RELATIONSHIP_COLUMNS}"""),
+    "delete_relationship": ("int, text", f"""
+        WITH gone AS (
+            DELETE FROM relationships WHERE id = $1 AND owner = $2 RETURNING {RELATIONSHIP_COLUMNS}
+        )
+        SELECT gone.*, s.case_id FROM gone LEFT JOIN entities s ON s.id = gone.source_entity_id"""),
+}
+
+
+def _attribute_expr(path: Tuple[str, ...]) -> str:
+    # paths are validated identifiers (app.attributes.parse_path); inlining them lets
+    # the planner match the expression indexes
+    if len(path) == 1:
+        return f"(attributes -> '{path[0]}')"
+    return f"(attributes #> '{{{','.join(path)}}}')"
+
+
+def _attribute_condition(attribute_filter: AttributeFilter) -> Tuple[str, list]:
+    expr, op, value = _attribute_expr(attribute_filter.path), attribute_filter.op, attribute_filter.value
+    if op == "exists":
+        return f"{expr} IS NOT NULL", []
+    if op == "=" and isinstance(value, (list, dict)):
+        # containment would also match supersets; arrays and objects compare whole
+        return f"{expr} = %s", [Json(value)]
+    if op == "=":
+        return "attributes @> %s", [Json(nest(attribute_filter.path, value))]
+    if op == "!=":
+        return f"{expr} <> %s", [Json(value)]
+    if op in RANGE_OPS:
+        # jsonb orders across types; keep comparisons to values of the filter's type
+        return f"{expr} {op} %s AND jsonb_typeof({expr}) = %s", [Json(value), json_type(value)]
+    raise ValueError(f"Unsupported attribute operator '{op}'")
+
+
+_RAW_RESPONSE_COLUMNS = """l.id, l.entity_id, l.transform, l.provider, l.content_hash, r.codec, r.size,
+    octet_length(r.payload) AS stored_size, l.run_id, l.job_id, l.fetched_at"""
+
+
+def _raw_response(row) -> Tuple[RawResponse, bytes]:
+    payload = bytes(row.pop("payload"))
+    return RawResponse(**row), payload
+
+
+# Every committed write to these tables sends a NOTIFY on INVALIDATION_CHANNEL
+# with {"t": table, "o": owner, "c": case id} so the
+# other worker processes can drop what they cached (see app.invalidation).
+# Postgres folds identical payloads within a transaction into one notification,
+# so a bulk import into one case costs one message, not one per row.
+INVALIDATION_CHANNEL = "ghostlock_invalidate"
+_NOTIFY_TABLES = (
+    "users", "api_keys", "cases", "entities", "relationships", "comments", "activity_logs", "transform_runs",
+    "raw_response_links",
+)
+
+# Backend pids of this process's own connections; the listener skips their
+# notifications because the writing process already updated its caches.
+own_backend_pids = set()
+
+
+class _Connection(psycopg2.extensions.connection):
+    """Pooled connection that remembers which ``_PREPARED`` statements it holds."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.backend_pid = self.get_backend_pid()
+        own_backend_pids.add(self.backend_pid)
+
+    def close(self):
+        own_backend_pids.discard(self.backend_pid)
+        super().close()
+
+
+class PostgresStore(Store):
+    connection_class = _Connection
+
+    def __init__(self, min_connections: int = 1, max_connections: int = 20):
+        self._pool = ThreadedConnectionPool(
+            min_connections, max_connections, DATABASE_URL,
+            connection_factory=self.connection_class, cursor_factory=RealDictCursor,
+        )
+        # the pool raises when exhausted; callers wait for a free connection instead
+        self._slots = BoundedSemaphore(max_connections)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[psycopg2.extensions.connection]:
+        """Borrow a pooled connection for one transaction (committed on success, rolled back on error)."""
+        with self._slots:
+            conn = self._pool.getconn()
+            try:
+                with conn:
+                    yield conn
+            finally:
+                self._pool.putconn(conn, close=bool(conn.closed))
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+    @staticmethod
+    def _execute(cur, name: str, *params):
+        """Run a ``_PREPARED`` statement, preparing it on this connection the first time."""
+        prepared = cur.connection.prepared
+        if name not in prepared:
+            types, body = _PREPARED[name]
+            cur.execute(f"PREPARE {name} ({types}) AS {body}")
+            prepared.add(name)
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        return cur.fetchone()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                # every gunicorn and queue worker runs this at startup; one at a time, or the DDL collides
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (_SCHEMA_LOCK,))
+                cur.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    password_hash TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL
+                )
+                """)
+
+                cur.execute("""
+                CREATE TABLE IF NOT EXISTS api_keys (
+                    id SERIAL PRIMARY KEY,
+                    name TEXT,
+                    description TEXT,
+                    key TEXT,
+                    active BOOLEAN DEFAULT TRUE,
+                    owner TEXT NOT NULL
+                )
+                """)
+
+                cur.execute("""
+                CREATE TABLE IF NOT EXISTS cases (
+                    id SERIAL PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    owner TEXT NOT NULL
+                )
+                """)
+
+                cur.execute("""
+                CREATE TABLE IF NOT EXISTS entities (
+                    id SERIAL PRIMARY KEY,
+                    case_id INTEGER NOT NULL REFERENCES cases(id),
+                    name TEXT NOT NULL,
+                    kind TEXT,
+                    description TEXT,
+                    owner TEXT NOT NULL
+                )
+                """)
+
+                cur.execute("""
+                CREATE TABLE IF NOT EXISTS relationships (
+                    id SERIAL PRIMARY KEY,
+                    source_entity_id INTEGER NOT NULL REFERENCES entities(id),
+                    target_entity_id INTEGER NOT NULL REFERENCES entities(id),
+                    relation TEXT,
+                    owner TEXT NOT NULL
+                )
+                """)
+
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_entities_owner_case ON entities (owner, case_id)")
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_relationships_source ON relationships (source_entity_id)")
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_relationships_target ON relationships (target_entity_id)")
+
+                self._init_activity_logs(cur)
+
+                cur.execute("""
+                CREATE TABLE IF NOT EXISTS comments (
+                    id SERIAL PRIMARY KEY,
+                    entity_id INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """)
+
+                self._init_search(cur)
+                self._init_indicators(cur)
+                self._init_attributes(cur)
+                self._init_transform_jobs(cur)
+                self._init_transform_runs(cur)
+                self._init_raw_responses(cur)
+                self._init_notify(cur)
+
+            conn.commit()
+
+    def _init_transform_jobs(self, cur):
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS transform_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            owner TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            transform TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            lease_owner TEXT,
+            lease_expires_at TIMESTAMPTZ,
+            last_error TEXT,
+            result JSONB,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMPTZ
+        )
+        """)
+        cur.execute("ALTER TABLE transform_jobs ADD COLUMN IF NOT EXISTS refresh BOOLEAN NOT NULL DEFAULT false")
+        # the claim and reap queries each scan one small partial index
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transform_jobs_due ON transform_jobs (run_at, id) WHERE status = 'queued'"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transform_jobs_leases ON transform_jobs (lease_expires_at) "
+            "WHERE status = 'running'"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_transform_jobs_owner ON transform_jobs (owner, id DESC)")
+
+    def _init_transform_runs(self, cur):
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS transform_runs (
+            id BIGSERIAL PRIMARY KEY,
+            owner TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            transform TEXT NOT NULL,
+            status TEXT NOT NULL,
+            started_at TIMESTAMPTZ NOT NULL,
+            duration_ms DOUBLE PRECISION NOT NULL,
+            nodes INTEGER NOT NULL DEFAULT 0,
+            edges INTEGER NOT NULL DEFAULT 0,
+            fetched INTEGER NOT NULL DEFAULT 0,
+            message TEXT,
+            error TEXT,
+            job_id BIGINT
+        )
+        """)
+        cur.execute("ALTER TABLE transform_runs ADD COLUMN IF NOT EXISTS changes JSONB")
+        # freshness checks look up the newest run of one transform on one entity
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transform_runs_entity "
+            "ON transform_runs (entity_id, transform, status, started_at DESC)"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_transform_runs_owner ON transform_runs (owner, id DESC)")
+        cur.execute("DROP INDEX IF EXISTS idx_transform_runs_stale")
+
+        # one row per (entity, transform), kept by create_transform_run: the refresh
+        # scheduler reads this instead of grouping the whole run history
+        cur.execute("SELECT to_regclass('transform_last_runs') IS NOT NULL AS present")
+        backfill = not cur.fetchone()["present"]
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS transform_last_runs (
+            entity_id INTEGER NOT NULL REFERENCES entities(id) ON DELETE CASCADE,
+            transform TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            last_run_at TIMESTAMPTZ NOT NULL,
+            succeeded BOOLEAN NOT NULL,
+            PRIMARY KEY (entity_id, transform)
+        )
+        """)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transform_last_runs_stale ON transform_last_runs (transform, last_run_at) "
+            "WHERE succeeded"
+        )
+        if backfill:
+            cur.execute("""
+            INSERT INTO transform_last_runs (entity_id, transform, owner, last_run_at, succeeded)
+            SELECT r.entity_id, r.transform, e.owner, max(r.started_at), bool_or(r.status = 'succeeded')
+            FROM transform_runs r JOIN entities e ON e.id = r.entity_id AND e.owner = r.owner
+            GROUP BY r.entity_id, r.transform, e.owner
+            """)
+
+    def _init_raw_responses(self, cur):
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS raw_responses (
+            content_hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            payload BYTEA NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """)
+        # payloads arrive compressed; keep TOAST from compressing them a second time
+        cur.execute("ALTER TABLE raw_responses ALTER COLUMN payload SET STORAGE EXTERNAL")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS raw_response_links (
+            id BIGSERIAL PRIMARY KEY,
+            owner TEXT NOT NULL,
+            entity_id INTEGER NOT NULL REFERENCES entities(id) ON DELETE CASCADE,
+            transform TEXT NOT NULL,
+            provider TEXT NOT NULL,
+            content_hash TEXT NOT NULL REFERENCES raw_responses(content_hash),
+            job_id BIGINT,
+            fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_raw_response_links_entity "
+            "ON raw_response_links (entity_id, transform, provider, id DESC)"
+        )
+        cur.execute("ALTER TABLE raw_response_links ADD COLUMN IF NOT EXISTS run_id BIGINT")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_raw_response_links_hash ON raw_response_links (content_hash)")
+
+    def _init_notify(self, cur):
+        """Install the row triggers that announce writes on ``INVALIDATION_CHANNEL``."""
+        cur.execute(f"""
+        CREATE OR REPLACE FUNCTION ghostlock_notify() RETURNS trigger AS $$
+        DECLARE
+            r jsonb;
+            payload jsonb;
+            source_case int;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN r := to_jsonb(OLD); ELSE r := to_jsonb(NEW); END IF;
+            payload := jsonb_build_object('t', TG_TABLE_NAME, 'o', COALESCE(r->>'owner', r->>'username'));
+            IF TG_TABLE_NAME = 'cases' THEN
+                payload := payload || jsonb_build_object('c', r->'id');
+            ELSIF TG_TABLE_NAME = 'entities' THEN
+                payload := payload || jsonb_build_object('c', r->'case_id');
+            ELSIF TG_TABLE_NAME = 'relationships' THEN
+                -- no source entity: it was deleted along with the relationship, and its own
+                -- notification already names the case
+                SELECT e.case_id INTO source_case FROM entities e WHERE e.id = (r->>'source_entity_id')::int;
+                IF source_case IS NOT NULL THEN
+                    payload := payload || jsonb_build_object('c', source_case);
+                END IF;
+            END IF;
+            PERFORM pg_notify('{INVALIDATION_CHANNEL}', payload::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+        cur.execute(
+            "SELECT c.relname FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid "
+            "WHERE t.tgname = 'ghostlock_notify' AND NOT t.tgisinternal"
+        )
+        installed = {row["relname"] for row in cur.fetchall()}
+        for table in _NOTIFY_TABLES:
+            if table not in installed:
+                cur.execute(
+                    f"CREATE TRIGGER ghostlock_notify AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                    "FOR EACH ROW EXECUTE FUNCTION ghostlock_notify()"
+                )
+
+    def _init_search(self, cur):
+        """Full-text vectors plus trigram/prefix indexes backing ``search``."""
+        cur.execute("SAVEPOINT enable_trgm")
+        try:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cur.execute("RELEASE SAVEPOINT enable_trgm")
+            self.has_trigram = True
+        except psycopg2.Error:
+            # Not allowed to install extensions: fall back to full-text + prefix search.
+            cur.execute("ROLLBACK TO SAVEPOINT enable_trgm")
+            self.has_trigram = False
+
+        cur.execute("""
+        ALTER TABLE entities ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED
+        """)
+        cur.execute("""
+        ALTER TABLE comments ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', text)) STORED
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_entities_search ON entities USING GIN (search_vector)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_comments_search ON comments USING GIN (search_vector)")
+        # byte order ("C") both serves LIKE 'prefix%' and yields the typeahead's order, so no sort is needed
+        cur.execute("DROP INDEX IF EXISTS idx_entities_owner_name_prefix")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entities_owner_name_c ON entities (owner, (lower(name) COLLATE \"C\"))"
+        )
+        if self.has_trigram:
+            # only the name is matched fuzzily (lower(name) % needle); descriptions and comments go through tsvector
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entities_name_trgm ON entities USING GIN (lower(name) gin_trgm_ops)"
+            )
+        cur.execute("DROP INDEX IF EXISTS idx_entities_description_trgm")
+        cur.execute("DROP INDEX IF EXISTS idx_comments_text_trgm")
+
+    def _init_activity_logs(self, cur):
+        """Create the month-partitioned activity log table, migrating a legacy plain table."""
+        cur.execute(
+            "SELECT relkind FROM pg_class WHERE relname = 'activity_logs' AND pg_table_is_visible(oid)"
+        )
+        row = cur.fetchone()
+        legacy = row is not None and row["relkind"] == "r"
+        if legacy:
+            cur.execute("ALTER TABLE activity_logs RENAME TO activity_logs_legacy")
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS activity_logs (
+            id BIGSERIAL,
+            action TEXT NOT NULL,
+            resource_type TEXT NOT NULL,
+            resource_id INTEGER,
+            resource_name TEXT,
+            details TEXT,
+            case_id INTEGER,
+            owner TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (created_at, id)
+        ) PARTITION BY RANGE (created_at)
+        """)
+        cur.execute("CREATE TABLE IF NOT EXISTS activity_logs_default PARTITION OF activity_logs DEFAULT")
+        for columns in ("owner", "owner, case_id", "owner, resource_type", "owner, action"):
+            suffix = columns.replace(", ", "_")
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_activity_logs_{suffix}_created "
+                f"ON activity_logs ({columns}, created_at DESC, id DESC)"
+            )
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS activity_log_rollups (
+            day DATE NOT NULL,
+            owner TEXT NOT NULL,
+            case_id INTEGER NOT NULL DEFAULT 0,
+            resource_type TEXT NOT NULL,
+            action TEXT NOT NULL,
+            events INTEGER NOT NULL,
+            PRIMARY KEY (owner, day, case_id, resource_type, action)
+        )
+        """)
+
+        start = None
+        if legacy:
+            cur.execute("SELECT MIN(created_at) AS first FROM activity_logs_legacy")
+            start = cur.fetchone()["first"]
+        self._ensure_activity_partitions(cur, start=start)
+
+        if legacy:
+            cur.execute("""
+            INSERT INTO activity_logs
+                (id, action, resource_type, resource_id, resource_name, details, owner, created_at)
+            SELECT id, action, resource_type, resource_id, resource_name, details, owner, created_at
+            FROM activity_logs_legacy
+            """)
+            cur.execute(
+                "SELECT setval(pg_get_serial_sequence('activity_logs', 'id'), "
+                "COALESCE((SELECT MAX(id) FROM activity_logs), 0) + 1, false)"
+            )
+            cur.execute("DROP TABLE activity_logs_legacy")
+
+    @staticmethod
+    def _month_start(moment: datetime) -> datetime:
+        return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+    @staticmethod
+    def _add_months(moment: datetime, months: int) -> datetime:
+        index = moment.year * 12 + moment.month - 1 + months
+        return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+    def _ensure_activity_partitions(self, cur, start: Optional[datetime] = None) -> None:
+        """Create monthly partitions from ``start`` (default: this month) through ``_MONTHS_AHEAD`` months ahead.
+
+        Rows already in the default partition for a month being created are
+        moved into it. Callers hold ``_SCHEMA_LOCK``.
+        """
+        now = datetime.now(timezone.utc)
+        month = self._month_start(min(start, now) if start else now)
+        last = self._add_months(self._month_start(now), _MONTHS_AHEAD)
+        while month <= last:
+            upper = self._add_months(month, 1)
+            name = f"activity_logs_y{month:%Y}m{month:%m}"
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL AS present", (name,))
+            if not cur.fetchone()["present"]:
+                self._create_activity_partition(cur, name, month, upper)
+            month = upper
+
+    def _create_activity_partition(self, cur, name: str, lower: datetime, upper: datetime) -> None:
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM activity_logs_default WHERE created_at >= %s AND created_at < %s) AS stray",
+            (lower, upper),
+        )
+        if not cur.fetchone()["stray"]:
+            cur.execute(f"CREATE TABLE {name} PARTITION OF activity_logs FOR VALUES FROM (%s) TO (%s)", (lower, upper))
+            return
+        # the month cannot be attached while the default partition holds rows in its range:
+        # detach the default, create the month, move the rows over, then re-attach the default
+        cur.execute("ALTER TABLE activity_logs DETACH PARTITION activity_logs_default")
+        cur.execute(f"CREATE TABLE {name} PARTITION OF activity_logs FOR VALUES FROM (%s) TO (%s)", (lower, upper))
+        cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM activity_logs_default WHERE created_at >= %s AND created_at < %s
+            RETURNING {ACTIVITY_LOG_COLUMNS}
+        )
+        INSERT INTO activity_logs ({ACTIVITY_LOG_COLUMNS}) SELECT {ACTIVITY_LOG_COLUMNS} FROM moved
+        """, (lower, upper))
+        cur.execute("ALTER TABLE activity_logs ATTACH PARTITION activity_logs_default DEFAULT")
+
+    def maintain_activity_logs(self, retention_days: int = 0, rollup: bool = True) -> List[str]:
+        """Pre-create upcoming partitions and drop those older than the retention window.
+
+        With ``rollup`` enabled, daily event counts are folded into
+        ``activity_log_rollups`` before a partition is dropped. Returns the
+        names of the dropped partitions.
+        """
+        dropped = []
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (_SCHEMA_LOCK,))
+                self._ensure_activity_partitions(cur)
+                if retention_days > 0:
+                    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+                    cur.execute("""
+                    SELECT c.relname FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    JOIN pg_class p ON p.oid = i.inhparent
+                    WHERE p.relname = 'activity_logs' AND c.relname ~ '^activity_logs_y[0-9]{4}m[0-9]{2}$'
+                    """)
+                    for row in cur.fetchall():
+                        name = row["relname"]
+                        month = datetime(int(name[-7:-3]), int(name[-2:]), 1, tzinfo=timezone.utc)
+                        if self._add_months(month, 1) > cutoff:
+                            continue
+                        if rollup:
+                            cur.execute(f"""
+                            INSERT INTO activity_log_rollups (day, owner, case_id, resource_type, action, events)
+                            SELECT created_at::date, owner, COALESCE(case_id, 0), resource_type, action, COUNT(*)
+                            FROM {name}
+                            GROUP BY 1, 2, 3, 4, 5
+                            ON CONFLICT (owner, day, case_id, resource_type, action)
+                            DO UPDATE SET events = activity_log_rollups.events + EXCLUDED.events
+                            """)
+                        cur.execute(f"DROP TABLE {name}")
+                        dropped.append(name)
+                if dropped:
+                    cur.execute("SELECT pg_notify(%s, %s)", (INVALIDATION_CHANNEL, '{"t": "*"}'))
+            conn.commit()
+        if dropped:
+            changes.bump_all()
+        return dropped
+
+    def _init_indicators(self, cur):
+        """Add the normalized ``indicator`` column and backfill rows written before it existed."""
+        cur.execute("ALTER TABLE entities ADD COLUMN IF NOT EXISTS indicator TEXT")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entities_owner_indicator ON entities (owner, indicator) "
+            "WHERE indicator IS NOT NULL"
+        )
+        kinds = list(INDICATOR_KINDS) + list(KIND_ALIASES)
+        while True:
+            cur.execute(
+                "SELECT id, kind, name FROM entities WHERE indicator IS NULL AND lower(kind) = ANY(%s) LIMIT 5000",
+                (kinds,)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            execute_values(
+                cur,
+                "UPDATE entities SET indicator = v.indicator FROM (VALUES %s) AS v(id, indicator) WHERE entities.id = v.id",
+                [(r["id"], normalize_indicator(r["kind"], r["name"]) or "") for r in rows],
+            )
+
+    def _init_attributes(self, cur):
+        """Add the JSONB ``attributes`` column with its GIN and per-attribute expression indexes."""
+        cur.execute("ALTER TABLE entities ADD COLUMN IF NOT EXISTS attributes JSONB NOT NULL DEFAULT '{}'")
+        # jsonb_path_ops: smaller and faster than the default opclass; serves the @> equality filters
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entities_attributes ON entities USING GIN (attributes jsonb_path_ops)"
+        )
+        for key in INDEXED_ATTRIBUTES:
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_entities_attr_{key} ON entities (owner, (attributes -> '{key}'))"
+            )
+
+    # User management -----------------------------------------------------
+    def create_user(self, payload: UserCreate) -> UserPublic:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                created_at = datetime.now(timezone.utc)
+                cur.execute(
+                    """INSERT INTO users (username, password_hash, created_at) VALUES (%s, %s, %s)
+                    ON CONFLICT (username) DO NOTHING RETURNING username""",
+                    (payload.username, hash_password(payload.password), created_at)
+                )
+                if not cur.fetchone():
+                    raise ValueError("Username already exists")
+            conn.commit()
+            return UserPublic(username=payload.username, created_at=created_at)
+
+    def authenticate(self, username: str, password: str) -> Optional[UserPublic]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM users WHERE username = %s", (username,))
+                record = cur.fetchone()
+                if not record:
+                    return None
+                if not verify_password(password, record["password_hash"]):
+                    return None
+                return UserPublic(
+                    username=record["username"],
+                    created_at=record["created_at"]
+                )
+
+    def get_user(self, username: str) -> Optional[UserPublic]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM users WHERE username = %s", (username,))
+                record = cur.fetchone()
+                if not record:
+                    return None
+                return UserPublic(
+                    username=record["username"],
+                    created_at=record["created_at"]
+                )
+
+    # API key management --------------------------------------------------
+    def list_api_keys(self, owner: str) -> List[ApiKey]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM api_keys WHERE owner = %s", (owner,))
+                rows = cur.fetchall()
+                return [ApiKey(id=r["id"], name=r["name"], description=r["description"],
+                              key=r["key"], active=r["active"], owner=r["owner"]) for r in rows]
+
+    def create_api_key(self, owner: str, payload: ApiKeyCreate) -> ApiKey:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "create_api_key", payload.name, payload.description, owner)
+            conn.commit()
+            cache.delete(API_KEYS_KEY.format(owner))
+            changes.bump(owner)
+            return ApiKey(**row)
+
+    def get_api_key(self, owner: str, key_id: int) -> ApiKey:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM api_keys WHERE id = %s AND owner = %s", (key_id, owner))
+                row = cur.fetchone()
+                if not row:
+                    raise KeyError("API key not found")
+                return ApiKey(id=row["id"], name=row["name"], description=row["description"],
+                             key=row["key"], active=row["active"], owner=row["owner"])
+
+    def update_api_key(self, owner: str, key_id: int, payload: ApiKeyUpdate) -> ApiKey:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "update_api_key", key_id, owner, payload.name, payload.description, payload.active)
+            conn.commit()
+        if not row:
+            raise KeyError("API key not found")
+        if payload.dict(exclude_none=True):
+            cache.delete(API_KEYS_KEY.format(owner))
+            changes.bump(owner)
+        return ApiKey(**row)
+
+    def delete_api_key(self, owner: str, key_id: int) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "delete_api_key", key_id, owner)
+            conn.commit()
+        if not row:
+            raise KeyError("API key not found")
+        cache.delete(API_KEYS_KEY.format(owner))
+        changes.bump(owner)
+
+    # Case management ----------------------------------------------------
+    def list_cases(self, owner: str) -> List[Case]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM cases WHERE owner = %s", (owner,))
+                rows = cur.fetchall()
+                return [Case(id=r["id"], name=r["name"], description=r["description"], owner=r["owner"]) for r in rows]
+
+    def create_case(self, owner: str, payload: CaseCreate) -> Case:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "create_case", payload.name, payload.description, owner)
+            conn.commit()
+            changes.bump(owner)
+            return Case(**row)
+
+    def get_case(self, owner: str, case_id: int) -> Case:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM cases WHERE id = %s AND owner = %s", (case_id, owner))
+                row = cur.fetchone()
+                if not row:
+                    raise KeyError("Case not found")
+                return Case(id=row["id"], name=row["name"], description=row["description"], owner=row["owner"])
+
+    def update_case(self, owner: str, case_id: int, payload: CaseUpdate) -> Case:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "update_case", case_id, owner, payload.name, payload.description)
+            conn.commit()
+        if not row:
+            raise KeyError("Case not found")
+        if payload.dict(exclude_none=True):
+            changes.bump(owner)
+        return Case(**row)
+
+    def delete_case(self, owner: str, case_id: int) -> Case:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "delete_case", case_id, owner)
+            conn.commit()
+        if not row:
+            raise KeyError("Case not found")
+        changes.bump(owner)
+        graph_cache.invalidate(owner, case_id)
+        return Case(**row)
+
+    # Entity management --------------------------------------------------
+    def list_entity_rows(
+        self,
+        owner: str,
+        case_id: Optional[int] = None,
+        filters: Sequence[AttributeFilter] = (),
+        sort: Optional[AttributeSort] = None,
+        limit: Optional[int] = None,
+    ) -> List[EntityRow]:
+        where, params = ["owner = %s"], [owner]
+        if case_id is not None:
+            where.append("case_id = %s")
+            params.append(case_id)
+        for attribute_filter in filters:
+            condition, values = _attribute_condition(attribute_filter)
+            where.append(condition)
+            params.extend(values)
+        order = "id"
+        if sort is not None:
+            order = f"{_attribute_expr(sort.path)} {'DESC' if sort.descending else 'ASC'} NULLS LAST, id"
+        query = f"SELECT {ENTITY_COLUMNS} FROM entities WHERE {' AND '.join(where)} ORDER BY {order}"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        with self._connect() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                cur.execute(query, params)
+                return [EntityRow(*r) for r in cur.fetchall()]
+
+    def create_entity(self, owner: str, payload: EntityCreate) -> Entity:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(
+                    cur, "create_entity", payload.case_id, payload.name, payload.kind, payload.description,
+                    normalize_indicator(payload.kind, payload.name), owner, Json(clean_attributes(payload.attributes)),
+                )
+            conn.commit()
+        if not row:
+            raise KeyError("Case not found")
+        changes.bump(owner)
+        graph_cache.add_node(owner, payload.case_id, row["id"])
+        return Entity(**row)
+
+    def get_entity(self, owner: str, entity_id: int) -> Entity:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM entities WHERE id = %s AND owner = %s", (entity_id, owner))
+                row = cur.fetchone()
+                if not row:
+                    raise KeyError("Entity not found")
+                return Entity(id=row["id"], case_id=row["case_id"], name=row["name"], kind=row["kind"],
+                              description=row["description"], attributes=row["attributes"], owner=row["owner"])
+
+    def update_entity(self, owner: str, entity_id: int, payload: EntityUpdate) -> Entity:
+        name, kind = payload.name, payload.kind
+        by_kind = None
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                if name is not None and kind is None:
+                    # the stored kind picks the new name's indicator inside the UPDATE
+                    by_kind = Json(renamed_indicators(name))
+                elif kind is not None and name is None and canonical_kind(kind) is not None:
+                    # normalizing needs the stored name; read it under the row lock
+                    current = self._execute(cur, "lock_entity", entity_id, owner)
+                    if not current:
+                        raise KeyError("Entity not found")
+                    name = current["name"]
+                reindex = kind is not None
+                patch = payload.attributes or {}
+                row = self._execute(
+                    cur, "update_entity", entity_id, owner, payload.name, payload.kind, payload.description,
+                    reindex, normalize_indicator(kind, name) if reindex else None, by_kind,
+                    [key for key, value in patch.items() if value is None], Json(clean_attributes(patch)),
+                )
+            conn.commit()
+        if not row:
+            raise KeyError("Entity not found")
+        if payload.dict(exclude_none=True):
+            changes.bump(owner)
+        return Entity(**row)
+
+    def delete_entity(self, owner: str, entity_id: int) -> Entity:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "delete_entity", entity_id, owner)
+            conn.commit()
+        if not row:
+            raise KeyError("Entity not found")
+        changes.bump(owner)
+        graph_cache.invalidate(owner, row["case_id"])
+        return Entity(**row)
+
+    def find_indicator_cases(self, owner: str, indicator: str) -> List[IndicatorCase]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """SELECT c.id AS case_id, c.name AS case_name,
+                              array_agg(e.id ORDER BY e.id) AS entity_ids,
+                              array_agg(DISTINCT e.kind) AS kinds
+                    FROM entities e JOIN cases c ON c.id = e.case_id
+                    WHERE e.owner = %s AND e.indicator = %s
+                    GROUP BY c.id, c.name
+                    ORDER BY c.id""",
+                    (owner, indicator)
+                )
+                return [IndicatorCase(**r) for r in cur.fetchall()]
+
+    # Relationship management -------------------------------------------
+    def _owner_relationship_rows(self, owner: str, case_id: Optional[int] = None) -> List[RelationshipRow]:
+        with self._connect() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                if case_id is None:
+                    cur.execute(
+                        f"SELECT {RELATIONSHIP_COLUMNS} FROM relationships WHERE owner = %s ORDER BY id", (owner,)
+                    )
+                else:
+                    cur.execute(
+                        f"""SELECT {RELATIONSHIP_COLUMNS} FROM relationships
+                        WHERE owner = %s
+                          AND source_entity_id IN (SELECT id FROM entities WHERE owner = %s AND case_id = %s)
+                        ORDER BY id""",
+                        (owner, owner, case_id)
+                    )
+                return [RelationshipRow(*r) for r in cur.fetchall()]
+
+    def create_relationship(self, owner: str, payload: RelationshipCreate) -> Relationship:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(
+                    cur, "create_relationship", payload.source_entity_id, payload.target_entity_id,
+                    payload.relation, owner,
+                )
+            conn.commit()
+        if not row:
+            raise KeyError("Entity not found")
+        if row["id"] is None:
+            raise ValueError("Entities must belong to the same case")
+        new_id = row["id"]
+        changes.bump(owner)
+        graph_cache.add_edge(owner, row["source_case_id"], new_id, payload.source_entity_id, payload.target_entity_id)
+        return Relationship(
+            id=new_id,
+            source_entity_id=payload.source_entity_id,
+            target_entity_id=payload.target_entity_id,
+            relation=payload.relation,
+            owner=owner
+        )
+
+    def get_relationship(self, owner: str, relationship_id: int) -> Relationship:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM relationships WHERE id = %s AND owner = %s", (relationship_id, owner))
+                row = cur.fetchone()
+                if not row:
+                    raise KeyError("Relationship not found")
+                return Relationship(
+                    id=row["id"],
+                    source_entity_id=row["source_entity_id"],
+                    target_entity_id=row["target_entity_id"],
+                    relation=row["relation"],
+                    owner=row["owner"]
+                )
+
+    def update_relationship(self, owner: str, relationship_id: int, payload: RelationshipUpdate) -> Relationship:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "update_relationship", relationship_id, owner, payload.relation)
+            conn.commit()
+        if not row:
+            raise KeyError("Relationship not found")
+        if payload.dict(exclude_none=True):
+            changes.bump(owner)
+        return Relationship(**row)
+
+    def delete_relationship(self, owner: str, relationship_id: int) -> Relationship:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                row = self._execute(cur, "delete_relationship", relationship_id, owner)
+            conn.commit()
+        if not row:
+            raise KeyError("Relationship not found")
+        changes.bump(owner)
+        case_id = row.pop("case_id")
+        if case_id is not None:
+            # an edge is cached in its source's case; without a source no cached graph holds it
+            graph_cache.invalidate(owner, case_id)
+        return Relationship(**row)
+
+    # Graph traversal ----------------------------------------------------
+    def _load_case_graph(self, owner: str, case_id: int) -> CaseGraph:
+        with self._connect() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                cur.execute("SELECT id FROM entities WHERE owner = %s AND case_id = %s", (owner, case_id))
+                node_ids = [r[0] for r in cur.fetchall()]
+                cur.execute(
+                    """SELECT r.id, r.source_entity_id, r.target_entity_id
+                    FROM relationships r JOIN entities s ON s.id = r.source_entity_id
+                    WHERE r.owner = %s AND s.case_id = %s""",
+                    (owner, case_id)
+                )
+                return CaseGraph(case_id, node_ids, cur.fetchall())
+
+    def get_entity_rows(self, owner: str, entity_ids: List[int]) -> List[EntityRow]:
+        if not entity_ids:
+            return []
+        with self._connect() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                cur.execute(
+                    f"SELECT {ENTITY_COLUMNS} FROM entities WHERE owner = %s AND id = ANY(%s)",
+                    (owner, list(entity_ids))
+                )
+                by_id = {r[0]: EntityRow(*r) for r in cur.fetchall()}
+                return [by_id[i] for i in entity_ids if i in by_id]
+
+    def get_relationship_rows(self, owner: str, relationship_ids: List[int]) -> List[RelationshipRow]:
+        if not relationship_ids:
+            return []
+        with self._connect() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                cur.execute(
+                    f"SELECT {RELATIONSHIP_COLUMNS} FROM relationships WHERE owner = %s AND id = ANY(%s)",
+                    (owner, list(relationship_ids))
+                )
+                by_id = {r[0]: RelationshipRow(*r) for r in cur.fetchall()}
+                return [by_id[i] for i in relationship_ids if i in by_id]
+
+    # Transform jobs -----------------------------------------------------
+    def enqueue_transform_job(self, owner: str, entity_id: int, transform: str, max_attempts: int) -> TransformJob:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """INSERT INTO transform_jobs (owner, entity_id, transform, max_attempts)
+                    SELECT owner, id, %s, %s FROM entities WHERE id = %s AND owner = %s
+                    RETURNING *""",
+                    (transform, max_attempts, entity_id, owner)
+                )
+                row = cur.fetchone()
+        if not row:
+            raise KeyError("Entity not found")
+        return TransformJob(**row)
+
+    def get_transform_job(self, owner: str, job_id: int) -> TransformJob:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM transform_jobs WHERE id = %s AND owner = %s", (job_id, owner))
+                row = cur.fetchone()
+        if not row:
+            raise KeyError("Transform job not found")
+        return TransformJob(**row)
+
+    def list_transform_jobs(self, owner: str, status: Optional[str] = None, limit: int = 50) -> List[TransformJob]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """SELECT * FROM transform_jobs
+                    WHERE owner = %s AND (%s::text IS NULL OR status = %s)
+                    ORDER BY id DESC LIMIT %s""",
+                    (owner, status, status, limit)
+                )
+                return [TransformJob(**r) for r in cur.fetchall()]
+
+    def retry_transform_job(self, owner: str, job_id: int) -> TransformJob:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """UPDATE transform_jobs
+                    SET status = 'queued', attempts = 0, run_at = NOW(), finished_at = NULL, updated_at = NOW()
+                    WHERE id = %s AND owner = %s AND status = 'dead'
+                    RETURNING *""",
+                    (job_id, owner)
+                )
+                row = cur.fetchone()
+        if not row:
+            self.get_transform_job(owner, job_id)
+            raise ValueError("Only dead jobs can be retried")
+        return TransformJob(**row)
+
+    def claim_transform_jobs(self, worker_id: str, limit: int, lease_seconds: float) -> List[TransformJob]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                # workers that died mid-job: hand the job to someone else, or give up on it
+                cur.execute("""
+                UPDATE transform_jobs
+                SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                    finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+                    last_error = 'Lease expired (worker ' || lease_owner || ' stopped responding)',
+                    lease_owner = NULL, lease_expires_at = NULL, run_at = NOW(), updated_at = NOW()
+                WHERE status = 'running' AND lease_expires_at < NOW()
+                """)
+                # SKIP LOCKED: concurrent workers each take different rows without waiting on each other
+                cur.execute(
+                    """UPDATE transform_jobs j
+                    SET status = 'running', attempts = j.attempts + 1, lease_owner = %s,
+                        lease_expires_at = NOW() + %s * INTERVAL '1 second', updated_at = NOW()
+                    FROM (
+                        SELECT id FROM transform_jobs
+                        WHERE status = 'queued' AND run_at <= NOW()
+                        ORDER BY run_at, id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    ) due
+                    WHERE j.id = due.id
+                    RETURNING j.*""",
+                    (worker_id, lease_seconds, limit)
+                )
+                rows = cur.fetchall()
+        return sorted((TransformJob(**r) for r in rows), key=lambda job: (job.run_at, job.id))
+
+    def heartbeat_transform_jobs(self, worker_id: str, job_ids: List[int], lease_seconds: float) -> List[int]:
+        if not job_ids:
+            return []
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """UPDATE transform_jobs
+                    SET lease_expires_at = NOW() + %s * INTERVAL '1 second', updated_at = NOW()
+                    WHERE id = ANY(%s) AND lease_owner = %s AND status = 'running'
+                    RETURNING id""",
+                    (lease_seconds, list(job_ids), worker_id)
+                )
+                return [r["id"] for r in cur.fetchall()]
+
+    def complete_transform_job(self, worker_id: str, job_id: int, result: dict) -> bool:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """UPDATE transform_jobs
+                    SET status = 'succeeded', result = %s, last_error = NULL, lease_owner = NULL,
+                        lease_expires_at = NULL, finished_at = NOW(), updated_at = NOW()
+                    WHERE id = %s AND lease_owner = %s AND status = 'running'""",
+                    (Json(result, dumps=lambda value: json.dumps(value, default=str)), job_id, worker_id)
+                )
+                return cur.rowcount == 1
+
+    def fail_transform_job(self, worker_id: str, job_id: int, error: str, retry_in: Optional[float]) -> bool:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """UPDATE transform_jobs
+                    SET status = CASE WHEN %(retry_in)s::float8 IS NULL THEN 'dead' ELSE 'queued' END,
+                        run_at = NOW() + COALESCE(%(retry_in)s::float8, 0) * INTERVAL '1 second',
+                        finished_at = CASE WHEN %(retry_in)s::float8 IS NULL THEN NOW() END,
+                        last_error = %(error)s, lease_owner = NULL, lease_expires_at = NULL, updated_at = NOW()
+                    WHERE id = %(job_id)s AND lease_owner = %(worker_id)s AND status = 'running'""",
+                    {"retry_in": retry_in, "error": error, "job_id": job_id, "worker_id": worker_id}
+                )
+                return cur.rowcount == 1
+
+    def schedule_refresh_jobs(
+        self,
+        transform: str,
+        kinds: List[str],
+        stale_before: datetime,
+        limit: int,
+        per_hour: int,
+        max_attempts: int,
+        spread_seconds: float,
+    ) -> List[TransformJob]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                # one scheduler per transform at a time, so the hourly count and the pending check cannot race
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"refresh:{transform}",))
+                cur.execute(
+                    """SELECT count(*) AS queued FROM transform_jobs
+                    WHERE refresh AND transform = %s AND created_at > NOW() - INTERVAL '1 hour'""",
+                    (transform,)
+                )
+                limit = min(limit, per_hour - cur.fetchone()["queued"])
+                if limit <= 0:
+                    return []
+                cur.execute(
+                    """WITH stale AS (
+                        SELECT l.owner, l.entity_id, l.last_run_at AS last_run
+                        FROM transform_last_runs l
+                        JOIN entities e ON e.id = l.entity_id AND e.owner = l.owner
+                        WHERE l.transform = %(transform)s AND l.succeeded AND l.last_run_at < %(stale_before)s
+                          AND lower(e.kind) = ANY(%(kinds)s)
+                          AND NOT EXISTS (
+                            SELECT 1 FROM transform_jobs j
+                            WHERE j.entity_id = l.entity_id AND j.transform = l.transform
+                              AND j.status IN ('queued', 'running')
+                          )
+                        ORDER BY l.last_run_at
+                        LIMIT %(limit)s
+                    ), numbered AS (
+                        SELECT owner, entity_id, row_number() OVER (ORDER BY last_run) - 1 AS i, count(*) OVER () AS n
+                        FROM stale
+                    )
+                    INSERT INTO transform_jobs (owner, entity_id, transform, max_attempts, refresh, run_at)
+                    SELECT owner, entity_id, %(transform)s, %(max_attempts)s, true,
+                           NOW() + %(spread)s * i / n * INTERVAL '1 second'
+                    FROM numbered
+                    RETURNING *""",
+                    {
+                        "transform": transform, "kinds": list(kinds), "stale_before": stale_before, "limit": limit,
+                        "max_attempts": max_attempts, "spread": spread_seconds,
+                    }
+                )
+                rows = cur.fetchall()
+        return sorted((TransformJob(**r) for r in rows), key=lambda job: (job.run_at, job.id))
+
+    # Transform runs -------------------------------------------------------------
+    def create_transform_run(self, owner: str, payload: TransformRunCreate) -> TransformRun:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """WITH run AS (
+                        INSERT INTO transform_runs
+                        (owner, entity_id, transform, status, started_at, duration_ms, nodes, edges, fetched,
+                         message, error, job_id, changes)
+                        SELECT owner, id, %(transform)s, %(status)s, %(started_at)s, %(duration_ms)s, %(nodes)s,
+                               %(edges)s, %(fetched)s, %(message)s, %(error)s, %(job_id)s, %(changes)s
+                        FROM entities WHERE id = %(entity_id)s AND owner = %(owner)s
+                        RETURNING *
+                    ), last_run AS (
+                        INSERT INTO transform_last_runs (entity_id, transform, owner, last_run_at, succeeded)
+                        SELECT entity_id, transform, owner, started_at, status = 'succeeded' FROM run
+                        ON CONFLICT (entity_id, transform) DO UPDATE
+                        SET last_run_at = GREATEST(transform_last_runs.last_run_at, EXCLUDED.last_run_at),
+                            succeeded = transform_last_runs.succeeded OR EXCLUDED.succeeded
+                    )
+                    SELECT * FROM run""",
+                    {
+                        **payload.dict(),
+                        "changes": (Json(payload.changes, dumps=lambda value: json.dumps(value, default=str))
+                                    if payload.changes is not None else None),
+                        "owner": owner,
+                    }
+                )
+                row = cur.fetchone()
+        if not row:
+            raise KeyError("Entity not found")
+        changes.bump(owner)
+        return TransformRun(**row)
+
+    def list_transform_runs(
+        self,
+        owner: str,
+        entity_id: Optional[int] = None,
+        transform: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 50,
+        before_id: Optional[int] = None,
+    ) -> List[TransformRun]:
+        where, params = ["owner = %s"], [owner]
+        for column, value in (("entity_id", entity_id), ("transform", transform), ("status", status)):
+            if value is not None:
+                where.append(f"{column} = %s")
+                params.append(value)
+        if before_id is not None:
+            where.append("id < %s")
+            params.append(before_id)
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT * FROM transform_runs WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT %s",
+                    params + [limit]
+                )
+                return [TransformRun(**r) for r in cur.fetchall()]
+
+    def last_transform_run(
+        self, owner: str, entity_id: int, transform: str, status: str = "succeeded"
+    ) -> Optional[TransformRun]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """SELECT * FROM transform_runs
+                    WHERE entity_id = %s AND transform = %s AND status = %s AND owner = %s
+                    ORDER BY started_at DESC LIMIT 1""",
+                    (entity_id, transform, status, owner)
+                )
+                row = cur.fetchone()
+        return TransformRun(**row) if row else None
+
+    # Raw provider responses ---------------------------------------------------
+    def archive_raw_response(
+        self,
+        owner: str,
+        entity_id: int,
+        transform: str,
+        provider: str,
+        content_hash: str,
+        codec: str,
+        size: int,
+        payload: bytes,
+        job_id: Optional[int] = None,
+        run_id: Optional[int] = None,
+    ) -> RawResponse:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """INSERT INTO raw_responses (content_hash, codec, size, payload) VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (content_hash) DO NOTHING""",
+                    (content_hash, codec, size, psycopg2.Binary(payload))
+                )
+                cur.execute(
+                    """INSERT INTO raw_response_links
+                    (owner, entity_id, transform, provider, content_hash, run_id, job_id)
+                    SELECT owner, id, %s, %s, %s, %s, %s FROM entities WHERE id = %s AND owner = %s
+                    RETURNING id""",
+                    (transform, provider, content_hash, run_id, job_id, entity_id, owner)
+                )
+                row = cur.fetchone()
+                if not row:
+                    raise KeyError("Entity not found")
+                cur.execute(
+                    f"""SELECT {_RAW_RESPONSE_COLUMNS}
+                    FROM raw_response_links l JOIN raw_responses r ON r.content_hash = l.content_hash
+                    WHERE l.id = %s""",
+                    (row["id"],)
+                )
+                row = cur.fetchone()
+        changes.bump(owner)
+        return RawResponse(**row)
+
+    def list_raw_responses(self, owner: str, entity_id: int) -> List[RawResponse]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""SELECT {_RAW_RESPONSE_COLUMNS}
+                    FROM raw_response_links l JOIN raw_responses r ON r.content_hash = l.content_hash
+                    WHERE l.entity_id = %s AND l.owner = %s ORDER BY l.id DESC""",
+                    (entity_id, owner)
+                )
+                return [RawResponse(**r) for r in cur.fetchall()]
+
+    def get_raw_response(self, owner: str, response_id: int) -> Tuple[RawResponse, bytes]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""SELECT {_RAW_RESPONSE_COLUMNS}, r.payload
+                    FROM raw_response_links l JOIN raw_responses r ON r.content_hash = l.content_hash
+                    WHERE l.id = %s AND l.owner = %s""",
+                    (response_id, owner)
+                )
+                row = cur.fetchone()
+        if not row:
+            raise KeyError("Raw response not found")
+        return _raw_response(row)
+
+    def latest_raw_responses(self, owner: str, entity_id: int, transform: str) -> List[Tuple[RawResponse, bytes]]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""SELECT DISTINCT ON (l.provider) {_RAW_RESPONSE_COLUMNS}, r.payload
+                    FROM raw_response_links l JOIN raw_responses r ON r.content_hash = l.content_hash
+                    WHERE l.entity_id = %s AND l.owner = %s AND l.transform = %s
+                    ORDER BY l.provider, l.id DESC""",
+                    (entity_id, owner, transform)
+                )
+                rows = cur.fetchall()
+        return [_raw_response(r) for r in rows]
+
+    def prune_raw_responses(self) -> int:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """DELETE FROM raw_responses r
+                    WHERE NOT EXISTS (SELECT 1 FROM raw_response_links l WHERE l.content_hash = r.content_hash)"""
+                )
+                return cur.rowcount
+
+    # Activity log management ------------------------------------------------
+    def log_activity(
+        self,
+        owner: str,
+        action: str,
+        resource_type: str,
+        resource_id: Optional[int] = None,
+        resource_name: Optional[str] = None,
+        details: Optional[str] = None,
+        case_id: Optional[int] = None,
+    ) -> ActivityLog:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """INSERT INTO activity_logs 
+                    (action, resource_type, resource_id, resource_name, details, case_id, owner) 
+                    VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id, created_at""",
+                    (action, resource_type, resource_id, resource_name, details, case_id, owner)
+                )
+                row = cur.fetchone()
+            conn.commit()
+            changes.bump(owner)
+            return ActivityLog(
+                id=row["id"],
+                action=action,
+                resource_type=resource_type,
+                resource_id=resource_id,
+                resource_name=resource_name,
+                details=details,
+                case_id=case_id,
+                owner=owner,
+                created_at=row["created_at"]
+            )
+
+    def log_activities(self, events: List[dict]) -> int:
+        if not events:
+            return 0
+        rows = [
+            (
+                e["action"],
+                e["resource_type"],
+                e.get("resource_id"),
+                e.get("resource_name"),
+                e.get("details"),
+                e.get("case_id"),
+                e["owner"],
+                e.get("created_at") or datetime.now(timezone.utc),
+            )
+            for e in events
+        ]
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """INSERT INTO activity_logs
+                    (action, resource_type, resource_id, resource_name, details, case_id, owner, created_at)
+                    VALUES %s""",
+                    rows,
+                    page_size=len(rows),
+                )
+            conn.commit()
+        for owner in {e["owner"] for e in events}:
+            changes.bump(owner)
+        return len(rows)
+
+    def list_activity_log_rows(
+        self,
+        owner: str,
+        limit: int = 50,
+        case_id: Optional[int] = None,
+        resource_type: Optional[str] = None,
+        action: Optional[str] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        since: Optional[datetime] = None,
+    ) -> List[ActivityLogRow]:
+        """Return activity newest first, keyset-paged on ``(created_at, id)``.
+
+        ``before`` is the ``(created_at, id)`` of the last row of the previous
+        page; ``since`` bounds the scan so older partitions are pruned.
+        """
+        clauses = ["owner = %s"]
+        params: list = [owner]
+        if case_id is not None:
+            clauses.append("case_id = %s")
+            params.append(case_id)
+        if resource_type:
+            clauses.append("resource_type = %s")
+            params.append(resource_type)
+        if action:
+            clauses.append("action = %s")
+            params.append(action)
+        if before is not None:
+            clauses.append("(created_at, id) < (%s, %s)")
+            params.extend(before)
+        if since is not None:
+            clauses.append("created_at >= %s")
+            params.append(since)
+        params.append(limit)
+
+        with self._connect() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                cur.execute(
+                    f"SELECT {ACTIVITY_LOG_COLUMNS} FROM activity_logs WHERE {' AND '.join(clauses)} "
+                    "ORDER BY created_at DESC, id DESC LIMIT %s",
+                    params
+                )
+                return [ActivityLogRow(*r) for r in cur.fetchall()]
+
+    # Search -------------------------------------------------------------
+    def search(
+        self,
+        owner: str,
+        query: str,
+        case_id: Optional[int] = None,
+        kinds: Optional[List[str]] = None,
+        include_comments: bool = True,
+        prefix: bool = False,
+        limit: int = 20,
+    ) -> List[SearchResult]:
+        """Ranked search over entity names/descriptions and comment text.
+
+        ``prefix`` mode only matches the start of entity names and is meant
+        for typeahead; it is served, already in order, from the ``COLLATE "C"`` name index.
+        """
+        needle, terms, like = search_terms(query)
+        if not needle:
+            return []
+        params = {
+            "owner": owner,
+            "needle": needle,
+            "like": like,
+            "tsquery": " & ".join(f"{t}:*" for t in terms) or None,
+            "case_id": case_id,
+            "kinds": [k.lower() for k in kinds] if kinds else None,
+            "limit": limit,
+        }
+        scope = ""
+        if case_id is not None:
+            scope += " AND e.case_id = %(case_id)s"
+        if kinds:
+            scope += " AND lower(e.kind) = ANY(%(kinds)s)"
+
+        if prefix:
+            sql = f"""
+            SELECT 'entity' AS type, e.id, e.id AS entity_id, e.case_id, e.name, e.kind,
+                   left(e.description, 200) AS snippet, 1.0 / (1 + length(e.name)) AS score
+            FROM entities e
+            WHERE e.owner = %(owner)s AND lower(e.name) COLLATE "C" LIKE %(like)s{scope}
+            ORDER BY lower(e.name) COLLATE "C"
+            LIMIT %(limit)s
+            """
+        else:
+            fuzzy = " OR lower(e.name) %% %(needle)s" if self.has_trigram else ""
+            similarity = "similarity(lower(e.name), %(needle)s)" if self.has_trigram else "0"
+            sql = f"""
+            SELECT 'entity' AS type, e.id, e.id AS entity_id, e.case_id, e.name, e.kind,
+                   left(e.description, 200) AS snippet,
+                   COALESCE(ts_rank_cd(e.search_vector, to_tsquery('simple', %(tsquery)s)), 0)
+                   + {similarity}
+                   + CASE WHEN lower(e.name) = %(needle)s THEN 2 WHEN lower(e.name) LIKE %(like)s THEN 1 ELSE 0 END
+                   AS score
+            FROM entities e
+            WHERE e.owner = %(owner)s{scope}
+              AND (e.search_vector @@ to_tsquery('simple', %(tsquery)s) OR lower(e.name) LIKE %(like)s{fuzzy})
+            """
+            if include_comments and params["tsquery"]:
+                sql += f"""
+            UNION ALL
+            SELECT 'comment' AS type, c.id, c.entity_id, e.case_id, e.name, e.kind,
+                   left(c.text, 200) AS snippet,
+                   ts_rank_cd(c.search_vector, to_tsquery('simple', %(tsquery)s)) AS score
+            FROM comments c JOIN entities e ON e.id = c.entity_id AND e.owner = %(owner)s
+            WHERE c.owner = %(owner)s{scope} AND c.search_vector @@ to_tsquery('simple', %(tsquery)s)
+            """
+            sql = f"SELECT * FROM ({sql}) hits ORDER BY score DESC, id LIMIT %(limit)s"
+
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return [SearchResult(**r) for r in cur.fetchall()]
+
+    # Comments management ------------------------------------------------
+    def create_comment(self, owner: str, payload: CommentCreate) -> Comment:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """INSERT INTO comments (entity_id, text, owner)
+                    SELECT id, %s, owner FROM entities WHERE id = %s AND owner = %s
+                    RETURNING id, created_at""",
+                    (payload.text, payload.entity_id, owner)
+                )
+                row = cur.fetchone()
+            conn.commit()
+            if not row:
+                raise KeyError("Entity not found")
+            changes.bump(owner)
+            return Comment(
+                id=row["id"],
+                entity_id=payload.entity_id,
+                text=payload.text,
+                owner=owner,
+                created_at=row["created_at"]
+            )
+
+    def list_comments(self, owner: str, entity_id: int) -> List[Comment]:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT * FROM comments WHERE owner = %s AND entity_id = %s ORDER BY created_at DESC",
+                    (owner, entity_id)
+                )
+                rows = cur.fetchall()
+                return [
+                    Comment(
+                        id=r["id"],
+                        entity_id=r["entity_id"],
+                        text=r["text"],
+                        owner=r["owner"],
+                        created_at=r["created_at"]
+                    ) for r in rows
+                ]
+
+    def delete_comment(self, owner: str, comment_id: int) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM comments WHERE id = %s AND owner = %s", (comment_id, owner))
+            conn.commit()
+            changes.bump(owner)
+
@@ -0,0 +1,1402 @@
+"""Embedded SQLite storage backend for single-node deployments.
+
+Tuned for one web process with many reader threads and one writer at a time:
+
+* WAL journal with ``synchronous=NORMAL``: readers never block the writer and
+  commits do not fsync the main database file;
+* one connection per thread with a large statement cache, so each of the
+  constant statements below is prepared once per connection and reused
+  (id lists are passed as one JSON parameter to keep the SQL constant);
+* writes run in ``BEGIN IMMEDIATE`` transactions under a per-store lock, and
+  bulk writes (activity batches, case deletes, indicator backfill) are
+  batched into a single transaction;
+* FTS5 tables kept current by triggers back ``search``.
+
+Timestamps are stored as UTC ISO-8601 text, which sorts chronologically.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from app.attributes import (
+    INDEXED_ATTRIBUTES,
+    RANGE_OPS,
+    AttributeFilter,
+    AttributeSort,
+    clean_attributes,
+    merge_attributes,
+)
+from app.cache import API_KEYS_KEY, cache
+from app.changes import changes
+from app.graph import CaseGraph
+from app.graph_cache import graph_cache
+from app.indicators import INDICATOR_KINDS, KIND_ALIASES, normalize_indicator
+from app.rows import (
+    ACTIVITY_LOG_COLUMNS,
+    ENTITY_COLUMNS,
+    RELATIONSHIP_COLUMNS,
+    ActivityLogRow,
+    EntityRow,
+    RelationshipRow,
+)
+from app.schemas import (
+    ActivityLog,
+    ApiKey,
+    ApiKeyCreate,
+    ApiKeyUpdate,
+    Case,
+    CaseCreate,
+    CaseUpdate,
+    Comment,
+    CommentCreate,
+    Entity,
+    EntityCreate,
+    EntityUpdate,
+    IndicatorCase,
+    RawResponse,
+    Relationship,
+    RelationshipCreate,
+    RelationshipUpdate,
+    SearchResult,
+    TransformJob,
+    TransformRun,
+    TransformRunCreate,
+    UserCreate,
+    UserPublic,
+)
+from app.security import hash_password, verify_password
+from app.storage.base import Store, search_terms
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+)
+# upper bound for a prefix range scan: sorts after every string starting with the prefix
+_PREFIX_END = "\U0010ffff"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS api_keys (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    description TEXT,
+    key TEXT,
+    active INTEGER DEFAULT 1,
+    owner TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    owner TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id INTEGER NOT NULL REFERENCES cases(id),
+    name TEXT NOT NULL,
+    kind TEXT,
+    description TEXT,
+    owner TEXT NOT NULL,
+    attributes TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS relationships (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_entity_id INTEGER NOT NULL REFERENCES entities(id),
+    target_entity_id INTEGER NOT NULL REFERENCES entities(id),
+    relation TEXT,
+    owner TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS activity_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    action TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id INTEGER,
+    resource_name TEXT,
+    details TEXT,
+    case_id INTEGER,
+    owner TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transform_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    entity_id INTEGER NOT NULL,
+    transform TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    refresh INTEGER NOT NULL DEFAULT 0,
+    run_at TEXT NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at TEXT,
+    last_error TEXT,
+    result TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS transform_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    entity_id INTEGER NOT NULL,
+    transform TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    duration_ms REAL NOT NULL,
+    nodes INTEGER NOT NULL DEFAULT 0,
+    edges INTEGER NOT NULL DEFAULT 0,
+    fetched INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    error TEXT,
+    job_id INTEGER,
+    changes TEXT
+);
+CREATE TABLE IF NOT EXISTS raw_responses (
+    content_hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS raw_response_links (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    entity_id INTEGER NOT NULL REFERENCES entities(id) ON DELETE CASCADE,
+    transform TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    content_hash TEXT NOT NULL REFERENCES raw_responses(content_hash),
+    run_id INTEGER,
+    job_id INTEGER,
+    fetched_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS activity_log_rollups (
+    day TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    case_id INTEGER NOT NULL DEFAULT 0,
+    resource_type TEXT NOT NULL,
+    action TEXT NOT NULL,
+    events INTEGER NOT NULL,
+    PRIMARY KEY (owner, day, case_id, resource_type, action)
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_entities_owner_case ON entities (owner, case_id);
+CREATE INDEX IF NOT EXISTS idx_entities_owner_name_prefix ON entities (owner, lower(name));
+CREATE INDEX IF NOT EXISTS idx_entities_owner_indicator ON entities (owner, indicator) WHERE indicator IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_relationships_owner ON relationships (owner);
+CREATE INDEX IF NOT EXISTS idx_relationships_source ON relationships (source_entity_id);
+CREATE INDEX IF NOT EXISTS idx_relationships_target ON relationships (target_entity_id);
+CREATE INDEX IF NOT EXISTS idx_comments_owner_entity ON comments (owner, entity_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_transform_jobs_due ON transform_jobs (run_at, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_transform_jobs_leases ON transform_jobs (lease_expires_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_transform_jobs_owner ON transform_jobs (owner, id DESC);
+CREATE INDEX IF NOT EXISTS idx_transform_runs_entity ON transform_runs (entity_id, transform, status, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_transform_runs_owner ON transform_runs (owner, id DESC);
+DROP INDEX IF EXISTS idx_transform_runs_stale;
+CREATE INDEX IF NOT EXISTS idx_raw_response_links_entity ON raw_response_links (entity_id, transform, provider, id DESC);
+CREATE INDEX IF NOT EXISTS idx_raw_response_links_hash ON raw_response_links (content_hash);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_owner_created ON activity_logs (owner, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_owner_case_id_created
+    ON activity_logs (owner, case_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_owner_resource_type_created
+    ON activity_logs (owner, resource_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_owner_action_created
+    ON activity_logs (owner, action, created_at DESC, id DESC);
+"""
+
+# one row per (entity, transform), kept by create_transform_run: the refresh
+# scheduler reads this instead of grouping the whole run history
+_LAST_RUNS = """
+CREATE TABLE transform_last_runs (
+    entity_id INTEGER NOT NULL REFERENCES entities(id) ON DELETE CASCADE,
+    transform TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    last_run_at TEXT NOT NULL,
+    succeeded INTEGER NOT NULL,
+    PRIMARY KEY (entity_id, transform)
+);
+CREATE INDEX idx_transform_last_runs_stale ON transform_last_runs (transform, last_run_at) WHERE succeeded = 1;
+INSERT INTO transform_last_runs (entity_id, transform, owner, last_run_at, succeeded)
+SELECT r.entity_id, r.transform, e.owner, max(r.started_at), max(r.status = 'succeeded')
+FROM transform_runs r JOIN entities e ON e.id = r.entity_id AND e.owner = r.owner
+GROUP BY r.entity_id, r.transform, e.owner;
+"""
+
+# Every write to these tables stamps a (table, owner, case) row of change_log
+# with the next sequence number, so other processes on the same file (the
+# web process and ``app.worker``) can drop what they cached; see
+# ``poll_changes`` and ``app.invalidation``. Value: SQL for the row's owner
+# and case (0 when there is none), with {row} standing for new/old.
+_CHANGE_TABLES = {
+    "users": ("{row}.username", "0"),
+    "api_keys": ("{row}.owner", "0"),
+    "cases": ("{row}.owner", "{row}.id"),
+    "entities": ("{row}.owner", "{row}.case_id"),
+    "relationships": ("{row}.owner", "COALESCE((SELECT case_id FROM entities WHERE id = {row}.source_entity_id), 0)"),
+    "comments": ("{row}.owner", "0"),
+    "transform_runs": ("{row}.owner", "0"),
+    "raw_response_links": ("{row}.owner", "0"),
+}
+# activity_logs is written in batches: log_activities stamps it once per owner
+# (and retention once as table '*') rather than a trigger doing it per row
+_CHANGE_LOG_INSERT = """INSERT INTO change_log (tbl, owner, case_id, seq)
+    VALUES ({table}, {owner}, {case}, (SELECT COALESCE(MAX(seq), 0) + 1 FROM change_log))
+    ON CONFLICT (tbl, owner, case_id) DO UPDATE SET seq = excluded.seq"""
+# unapplied changes kept for the listener; past this many, it resets its caches instead
+_MAX_PENDING_CHANGES = 10000
+
+
+def _change_log_script() -> str:
+    statements = ["""
+CREATE TABLE IF NOT EXISTS change_log (
+    tbl TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    case_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (tbl, owner, case_id)
+);
+CREATE INDEX IF NOT EXISTS idx_change_log_seq ON change_log (seq);
+"""]
+    for table, (owner, case) in _CHANGE_TABLES.items():
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            row = "old" if event == "DELETE" else "new"
+            insert = _CHANGE_LOG_INSERT.format(
+                table=f"'{table}'", owner=owner.format(row=row), case=case.format(row=row)
+            )
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_change_{event.lower()} AFTER {event} ON {table} "
+                f"BEGIN {insert}; END;"
+            )
+    return "\n".join(statements)
+
+
+_FTS = {
+    "entities_fts": """
+CREATE VIRTUAL TABLE entities_fts USING fts5(name, description, content='entities', content_rowid='id');
+CREATE TRIGGER entities_fts_ai AFTER INSERT ON entities BEGIN
+    INSERT INTO entities_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+END;
+CREATE TRIGGER entities_fts_ad AFTER DELETE ON entities BEGIN
+    INSERT INTO entities_fts (entities_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+END;
+CREATE TRIGGER entities_fts_au AFTER UPDATE OF name, description ON entities BEGIN
+    INSERT INTO entities_fts (entities_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+    INSERT INTO entities_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+END;
+INSERT INTO entities_fts (entities_fts) VALUES ('rebuild');
+""",
+    "comments_fts": """
+CREATE VIRTUAL TABLE comments_fts USING fts5(text, content='comments', content_rowid='id');
+CREATE TRIGGER comments_fts_ai AFTER INSERT ON comments BEGIN
+    INSERT INTO comments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER comments_fts_ad AFTER DELETE ON comments BEGIN
+    INSERT INTO comments_fts (comments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+INSERT INTO comments_fts (comments_fts) VALUES ('rebuild');
+""",
+}
+
+
+def _entity_row(record) -> EntityRow:
+    *columns, attributes = record
+    return EntityRow(*columns, json.loads(attributes) if attributes != "{}" else {})
+
+
+def _attribute_expr(path: Tuple[str, ...]) -> str:
+    # paths are validated identifiers (app.attributes.parse_path); a literal path is
+    # what lets SQLite match the expression indexes
+    return f"'$.{'.'.join(path)}'"
+
+
+def _attribute_condition(attribute_filter: AttributeFilter) -> Tuple[str, list]:
+    path, op, value = _attribute_expr(attribute_filter.path), attribute_filter.op, attribute_filter.value
+    extract, kind = f"json_extract(attributes, {path})", f"json_type(attributes, {path})"
+    if op == "exists":
+        return f"{kind} IS NOT NULL", []
+    if isinstance(value, bool):
+        matches, params = f"{kind} = '{'true' if value else 'false'}'", []
+    elif value is None:
+        matches, params = f"{kind} = 'null'", []
+    elif isinstance(value, (int, float)):
+        matches, params = f"{extract} = ? AND {kind} IN ('integer', 'real')", [value]
+    elif isinstance(value, str):
+        matches, params = f"{extract} = ? AND {kind} = 'text'", [value]
+    else:
+        matches, params = f"{extract} = json(?)", [json.dumps(value)]
+    if op == "=":
+        return matches, params
+    if op == "!=":
+        return f"{kind} IS NOT NULL AND NOT ({matches})", params
+    if op in RANGE_OPS:
+        types = "('integer', 'real')" if isinstance(value, (int, float)) else "('text')"
+        return f"{extract} {op} ? AND {kind} IN {types}", [value]
+    raise ValueError(f"Unsupported attribute operator '{op}'")
+
+
+_RAW_RESPONSE_COLUMNS = """l.id, l.entity_id, l.transform, l.provider, l.content_hash, r.codec, r.size,
+    length(r.payload) AS stored_size, l.run_id, l.job_id, l.fetched_at"""
+
+
+def _raw_response(row: sqlite3.Row) -> RawResponse:
+    response = {key: row[key] for key in row.keys() if key != "payload"}
+    response["fetched_at"] = _dt(response["fetched_at"])
+    return RawResponse(**response)
+
+
+def _ts(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _dt(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+class SQLiteStore(Store):
+    def __init__(self, path: str = "ghostlock.db"):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # change_log position this process has seen; changes past it made by other processes
+        # wait in _pending_changes (or set _changes_lost) until poll_changes hands them out
+        self._changes_seen = 0
+        self._pending_changes: List[dict] = []
+        self._changes_lost = False
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection, opened and tuned on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=512)
+            conn.row_factory = sqlite3.Row
+            for pragma in _PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection; other threads' close when they exit."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def _tuples(self) -> sqlite3.Cursor:
+        """A cursor yielding plain tuples, for bulk reads into slotted rows."""
+        cur = self._connect().cursor()
+        cur.row_factory = None
+        return cur
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # no other process can commit until we do: whatever is past our position is theirs,
+                # and whatever is past it when we are done is ours
+                self._collect_changes(conn)
+                yield conn
+                seen = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            self._changes_seen = seen
+
+    def _collect_changes(self, conn: sqlite3.Connection) -> None:
+        # caller holds the write lock
+        rows = conn.execute(
+            "SELECT tbl, owner, case_id, seq FROM change_log WHERE seq > ? ORDER BY seq", (self._changes_seen,)
+        ).fetchall()
+        if not rows:
+            return
+        self._changes_seen = rows[-1]["seq"]
+        if self._changes_lost:
+            return
+        self._pending_changes.extend(
+            {"t": r["tbl"], "o": r["owner"] or None, "c": r["case_id"] or None} for r in rows
+        )
+        if len(self._pending_changes) > _MAX_PENDING_CHANGES:
+            self._pending_changes, self._changes_lost = [], True
+
+    @staticmethod
+    def _log_change(conn: sqlite3.Connection, table: str, owner: str = "") -> None:
+        conn.execute(_CHANGE_LOG_INSERT.format(table="?", owner="?", case="0"), (table, owner))
+
+    def poll_changes(self) -> Optional[List[dict]]:
+        """Writes committed by other processes since the last call, as ``app.invalidation`` payloads.
+
+        Returns None when more changes piled up than are kept, so the caller
+        should drop everything it cached.
+        """
+        with self._write_lock:
+            self._collect_changes(self._connect())
+            pending, lost = self._pending_changes, self._changes_lost
+            self._pending_changes, self._changes_lost = [], False
+        return None if lost else pending
+
+    @contextmanager
+    def _snapshot(self) -> Iterator[sqlite3.Connection]:
+        """Run several reads against one consistent snapshot."""
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    def _init_db(self):
+        with self._write_lock:
+            conn = self._connect()
+            conn.executescript(_SCHEMA)
+            for table, column, decl in (
+                ("entities", "indicator", "TEXT"),
+                ("entities", "attributes", "TEXT NOT NULL DEFAULT '{}'"),
+                ("activity_logs", "case_id", "INTEGER"),
+                ("raw_response_links", "run_id", "INTEGER"),
+                ("transform_jobs", "refresh", "INTEGER NOT NULL DEFAULT 0"),
+                ("transform_runs", "changes", "TEXT"),
+            ):
+                existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+            conn.executescript(_INDEXES)
+            for key in INDEXED_ATTRIBUTES:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_entities_attr_{key} "
+                    f"ON entities (owner, json_extract(attributes, '$.{key}'))"
+                )
+            conn.executescript(_change_log_script())
+            self._changes_seen = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            present = {r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table, script in {"transform_last_runs": _LAST_RUNS, **_FTS}.items():
+                if table not in present:
+                    conn.executescript(f"BEGIN; {script} COMMIT;")
+        self._backfill_indicators()
+
+    def _backfill_indicators(self) -> None:
+        kinds = json.dumps(list(INDICATOR_KINDS) + list(KIND_ALIASES))
+        while True:
+            rows = self._connect().execute(
+                "SELECT id, kind, name FROM entities WHERE indicator IS NULL "
+                "AND lower(kind) IN (SELECT value FROM json_each(?)) LIMIT 5000",
+                (kinds,)
+            ).fetchall()
+            if not rows:
+                break
+            with self._write() as conn:
+                conn.executemany(
+                    "UPDATE entities SET indicator = ? WHERE id = ?",
+                    [(normalize_indicator(r["kind"], r["name"]) or "", r["id"]) for r in rows],
+                )
+
+    # User management -----------------------------------------------------
+    def create_user(self, payload: UserCreate) -> UserPublic:
+        created_at = datetime.now(timezone.utc)
+        with self._write() as conn:
+            if conn.execute("SELECT 1 FROM users WHERE username = ?", (payload.username,)).fetchone():
+                raise ValueError("Username already exists")
+            conn.execute(
+                "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                (payload.username, hash_password(payload.password), _ts(created_at))
+            )
+        return UserPublic(username=payload.username, created_at=created_at)
+
+    def authenticate(self, username: str, password: str) -> Optional[UserPublic]:
+        record = self._connect().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        if not record or not verify_password(password, record["password_hash"]):
+            return None
+        return UserPublic(username=record["username"], created_at=_dt(record["created_at"]))
+
+    def get_user(self, username: str) -> Optional[UserPublic]:
+        record = self._connect().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        if not record:
+            return None
+        return UserPublic(username=record["username"], created_at=_dt(record["created_at"]))
+
+    # API key management --------------------------------------------------
+    @staticmethod
+    def _api_key(row: sqlite3.Row) -> ApiKey:
+        return ApiKey(id=row["id"], name=row["name"], description=row["description"],
+                      key=row["key"], active=bool(row["active"]), owner=row["owner"])
+
+    def list_api_keys(self, owner: str) -> List[ApiKey]:
+        rows = self._connect().execute("SELECT * FROM api_keys WHERE owner = ?", (owner,)).fetchall()
+        return [self._api_key(r) for r in rows]
+
+    def create_api_key(self, owner: str, payload: ApiKeyCreate) -> ApiKey:
+        with self._write() as conn:
+            next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM api_keys").fetchone()[0]
+            key_value = f"key-{next_id:06d}"
+            new_id = conn.execute(
+                "INSERT INTO api_keys (name, description, key, active, owner) VALUES (?, ?, ?, 1, ?)",
+                (payload.name, payload.description, key_value, owner)
+            ).lastrowid
+        cache.delete(API_KEYS_KEY.format(owner))
+        changes.bump(owner)
+        return ApiKey(id=new_id, name=payload.name, description=payload.description,
+                      key=key_value, active=True, owner=owner)
+
+    def get_api_key(self, owner: str, key_id: int) -> ApiKey:
+        row = self._connect().execute(
+            "SELECT * FROM api_keys WHERE id = ? AND owner = ?", (key_id, owner)
+        ).fetchone()
+        if not row:
+            raise KeyError("API key not found")
+        return self._api_key(row)
+
+    def update_api_key(self, owner: str, key_id: int, payload: ApiKeyUpdate) -> ApiKey:
+        self.get_api_key(owner, key_id)
+        updates = payload.dict(exclude_none=True)
+        if updates:
+            fields = ", ".join(f"{k}=?" for k in updates)
+            with self._write() as conn:
+                conn.execute(f"UPDATE api_keys SET {fields} WHERE id=? AND owner=?", [*updates.values(), key_id, owner])
+            cache.delete(API_KEYS_KEY.format(owner))
+            changes.bump(owner)
+        return self.get_api_key(owner, key_id)
+
+    def delete_api_key(self, owner: str, key_id: int) -> None:
+        self.get_api_key(owner, key_id)
+        with self._write() as conn:
+            conn.execute("DELETE FROM api_keys WHERE id = ? AND owner = ?", (key_id, owner))
+        cache.delete(API_KEYS_KEY.format(owner))
+        changes.bump(owner)
+
+    # Case management ----------------------------------------------------
+    def list_cases(self, owner: str) -> List[Case]:
+        rows = self._connect().execute("SELECT * FROM cases WHERE owner = ?", (owner,)).fetchall()
+        return [Case(id=r["id"], name=r["name"], description=r["description"], owner=r["owner"]) for r in rows]
+
+    def create_case(self, owner: str, payload: CaseCreate) -> Case:
+        with self._write() as conn:
+            new_id = conn.execute(
+                "INSERT INTO cases (name, description, owner) VALUES (?, ?, ?)",
+                (payload.name, payload.description, owner)
+            ).lastrowid
+        changes.bump(owner)
+        return Case(id=new_id, name=payload.name, description=payload.description, owner=owner)
+
+    def get_case(self, owner: str, case_id: int) -> Case:
+        row = self._connect().execute("SELECT * FROM cases WHERE id = ? AND owner = ?", (case_id, owner)).fetchone()
+        if not row:
+            raise KeyError("Case not found")
+        return Case(id=row["id"], name=row["name"], description=row["description"], owner=row["owner"])
+
+    def update_case(self, owner: str, case_id: int, payload: CaseUpdate) -> Case:
+        self.get_case(owner, case_id)
+        updates = payload.dict(exclude_none=True)
+        if updates:
+            fields = ", ".join(f"{k}=?" for k in updates)
+            with self._write() as conn:
+                conn.execute(f"UPDATE cases SET {fields} WHERE id=? AND owner=?", [*updates.values(), case_id, owner])
+            changes.bump(owner)
+        return self.get_case(owner, case_id)
+
+    def delete_case(self, owner: str, case_id: int) -> Case:
+        case = self.get_case(owner, case_id)
+        with self._write() as conn:
+            conn.execute(
+                """DELETE FROM relationships WHERE owner = ? AND (
+                    source_entity_id IN (SELECT id FROM entities WHERE owner = ? AND case_id = ?)
+                    OR target_entity_id IN (SELECT id FROM entities WHERE owner = ? AND case_id = ?))""",
+                (owner, owner, case_id, owner, case_id)
+            )
+            conn.execute("DELETE FROM entities WHERE owner = ? AND case_id = ?", (owner, case_id))
+            conn.execute("DELETE FROM cases WHERE id = ? AND owner = ?", (case_id, owner))
+        changes.bump(owner)
+        graph_cache.invalidate(owner, case_id)
+        return case
+
+    # Entity management --------------------------------------------------
+    def list_entity_rows(
+        self,
+        owner: str,
+        case_id: Optional[int] = None,
+        filters: Sequence[AttributeFilter] = (),
+        sort: Optional[AttributeSort] = None,
+        limit: Optional[int] = None,
+    ) -> List[EntityRow]:
+        where, params = ["owner = ?"], [owner]
+        if case_id is not None:
+            where.append("case_id = ?")
+            params.append(case_id)
+        for attribute_filter in filters:
+            condition, values = _attribute_condition(attribute_filter)
+            where.append(condition)
+            params.extend(values)
+        order = "id"
+        if sort is not None:
+            extract = f"json_extract(attributes, {_attribute_expr(sort.path)})"
+            order = f"{extract} IS NULL, {extract} {'DESC' if sort.descending else 'ASC'}, id"
+        query = f"SELECT {ENTITY_COLUMNS} FROM entities WHERE {' AND '.join(where)} ORDER BY {order}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        cur = self._tuples()
+        cur.execute(query, params)
+        return [_entity_row(r) for r in cur.fetchall()]
+
+    def create_entity(self, owner: str, payload: EntityCreate) -> Entity:
+        self.get_case(owner, payload.case_id)
+        with self._write() as conn:
+            attributes = clean_attributes(payload.attributes)
+            new_id = conn.execute(
+                "INSERT INTO entities (case_id, name, kind, description, indicator, owner, attributes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (payload.case_id, payload.name, payload.kind, payload.description,
+                 normalize_indicator(payload.kind, payload.name), owner, json.dumps(attributes))
+            ).lastrowid
+        changes.bump(owner)
+        graph_cache.add_node(owner, payload.case_id, new_id)
+        return Entity(id=new_id, case_id=payload.case_id, name=payload.name, kind=payload.kind,
+                      description=payload.description, attributes=attributes, owner=owner)
+
+    def get_entity(self, owner: str, entity_id: int) -> Entity:
+        row = self._connect().execute(
+            "SELECT * FROM entities WHERE id = ? AND owner = ?", (entity_id, owner)
+        ).fetchone()
+        if not row:
+            raise KeyError("Entity not found")
+        return Entity(id=row["id"], case_id=row["case_id"], name=row["name"], kind=row["kind"],
+                      description=row["description"], attributes=json.loads(row["attributes"]), owner=row["owner"])
+
+    def update_entity(self, owner: str, entity_id: int, payload: EntityUpdate) -> Entity:
+        current = self.get_entity(owner, entity_id)
+        updates = payload.dict(exclude_none=True, exclude={"attributes"})
+        if "name" in updates or "kind" in updates:
+            updates["indicator"] = normalize_indicator(
+                updates.get("kind", current.kind), updates.get("name", current.name)
+            )
+        if updates or payload.attributes:
+            with self._write() as conn:
+                if payload.attributes:
+                    # merged inside the write transaction so concurrent patches keep each other's keys
+                    stored = conn.execute("SELECT attributes FROM entities WHERE id = ?", (entity_id,)).fetchone()
+                    merged = merge_attributes(json.loads(stored["attributes"]) if stored else {}, payload.attributes)
+                    updates["attributes"] = json.dumps(merged)
+                fields = ", ".join(f"{k}=?" for k in updates)
+                conn.execute(f"UPDATE entities SET {fields} WHERE id=? AND owner=?", [*updates.values(), entity_id, owner])
+            changes.bump(owner)
+        return self.get_entity(owner, entity_id)
+
+    def delete_entity(self, owner: str, entity_id: int) -> Entity:
+        entity = self.get_entity(owner, entity_id)
+        with self._write() as conn:
+            conn.execute(
+                "DELETE FROM relationships WHERE owner = ? AND (source_entity_id = ? OR target_entity_id = ?)",
+                (owner, entity.id, entity.id)
+            )
+            conn.execute("DELETE FROM entities WHERE id = ? AND owner = ?", (entity_id, owner))
+        changes.bump(owner)
+        graph_cache.invalidate(owner, entity.case_id)
+        return entity
+
+    def get_entity_rows(self, owner: str, entity_ids: List[int]) -> List[EntityRow]:
+        if not entity_ids:
+            return []
+        cur = self._tuples()
+        cur.execute(
+            f"SELECT {ENTITY_COLUMNS} FROM entities WHERE owner = ? AND id IN (SELECT value FROM json_each(?))",
+            (owner, json.dumps(list(entity_ids)))
+        )
+        by_id = {r[0]: _entity_row(r) for r in cur.fetchall()}
+        return [by_id[i] for i in entity_ids if i in by_id]
+
+    def find_indicator_cases(self, owner: str, indicator: str) -> List[IndicatorCase]:
+        rows = self._connect().execute(
+            """SELECT c.id AS case_id, c.name AS case_name,
+                      group_concat(e.id) AS entity_ids, group_concat(DISTINCT e.kind) AS kinds
+            FROM entities e JOIN cases c ON c.id = e.case_id
+            WHERE e.owner = ? AND e.indicator = ?
+            GROUP BY c.id, c.name
+            ORDER BY c.id""",
+            (owner, indicator)
+        ).fetchall()
+        return [
+            IndicatorCase(
+                case_id=r["case_id"],
+                case_name=r["case_name"],
+                entity_ids=sorted(int(i) for i in r["entity_ids"].split(",")),
+                kinds=sorted(r["kinds"].split(",")) if r["kinds"] else [],
+            )
+            for r in rows
+        ]
+
+    # Relationship management -------------------------------------------
+    def _owner_relationship_rows(self, owner: str, case_id: Optional[int] = None) -> List[RelationshipRow]:
+        cur = self._tuples()
+        if case_id is None:
+            cur.execute(f"SELECT {RELATIONSHIP_COLUMNS} FROM relationships WHERE owner = ? ORDER BY id", (owner,))
+        else:
+            cur.execute(
+                f"""SELECT {RELATIONSHIP_COLUMNS} FROM relationships
+                WHERE owner = ? AND source_entity_id IN (SELECT id FROM entities WHERE owner = ? AND case_id = ?)
+                ORDER BY id""",
+                (owner, owner, case_id)
+            )
+        return [RelationshipRow(*r) for r in cur.fetchall()]
+
+    def create_relationship(self, owner: str, payload: RelationshipCreate) -> Relationship:
+        source = self.get_entity(owner, payload.source_entity_id)
+        target = self.get_entity(owner, payload.target_entity_id)
+        if source.case_id != target.case_id:
+            raise ValueError("Entities must belong to the same case")
+
+        with self._write() as conn:
+            new_id = conn.execute(
+                "INSERT INTO relationships (source_entity_id, target_entity_id, relation, owner) VALUES (?, ?, ?, ?)",
+                (payload.source_entity_id, payload.target_entity_id, payload.relation, owner)
+            ).lastrowid
+        changes.bump(owner)
+        graph_cache.add_edge(owner, source.case_id, new_id, payload.source_entity_id, payload.target_entity_id)
+        return Relationship(id=new_id, source_entity_id=payload.source_entity_id,
+                            target_entity_id=payload.target_entity_id, relation=payload.relation, owner=owner)
+
+    def get_relationship(self, owner: str, relationship_id: int) -> Relationship:
+        row = self._connect().execute(
+            "SELECT * FROM relationships WHERE id = ? AND owner = ?", (relationship_id, owner)
+        ).fetchone()
+        if not row:
+            raise KeyError("Relationship not found")
+        return Relationship(id=row["id"], source_entity_id=row["source_entity_id"],
+                            target_entity_id=row["target_entity_id"], relation=row["relation"], owner=row["owner"])
+
+    def update_relationship(self, owner: str, relationship_id: int, payload: RelationshipUpdate) -> Relationship:
+        self.get_relationship(owner, relationship_id)
+        updates = payload.dict(exclude_none=True)
+        if updates:
+            fields = ", ".join(f"{k}=?" for k in updates)
+            with self._write() as conn:
+                conn.execute(
+                    f"UPDATE relationships SET {fields} WHERE id=? AND owner=?",
+                    [*updates.values(), relationship_id, owner]
+                )
+            changes.bump(owner)
+        return self.get_relationship(owner, relationship_id)
+
+    def delete_relationship(self, owner: str, relationship_id: int) -> Relationship:
+        relationship = self.get_relationship(owner, relationship_id)
+        with self._write() as conn:
+            source = conn.execute(
+                "SELECT case_id FROM entities WHERE id = ?", (relationship.source_entity_id,)
+            ).fetchone()
+            conn.execute("DELETE FROM relationships WHERE id = ? AND owner = ?", (relationship_id, owner))
+        changes.bump(owner)
+        if source is not None:
+            # an edge is cached in its source's case; without a source no cached graph holds it
+            graph_cache.invalidate(owner, source["case_id"])
+        return relationship
+
+    def get_relationship_rows(self, owner: str, relationship_ids: List[int]) -> List[RelationshipRow]:
+        if not relationship_ids:
+            return []
+        cur = self._tuples()
+        cur.execute(
+            f"SELECT {RELATIONSHIP_COLUMNS} FROM relationships "
+            "WHERE owner = ? AND id IN (SELECT value FROM json_each(?))",
+            (owner, json.dumps(list(relationship_ids)))
+        )
+        by_id = {r[0]: RelationshipRow(*r) for r in cur.fetchall()}
+        return [by_id[i] for i in relationship_ids if i in by_id]
+
+    # Graph traversal ----------------------------------------------------
+    def _load_case_graph(self, owner: str, case_id: int) -> CaseGraph:
+        with self._snapshot():
+            cur = self._tuples()
+            cur.execute("SELECT id FROM entities WHERE owner = ? AND case_id = ?", (owner, case_id))
+            node_ids = [r[0] for r in cur.fetchall()]
+            cur.execute(
+                """SELECT r.id, r.source_entity_id, r.target_entity_id
+                FROM relationships r JOIN entities s ON s.id = r.source_entity_id
+                WHERE r.owner = ? AND s.case_id = ?""",
+                (owner, case_id)
+            )
+            return CaseGraph(case_id, node_ids, cur.fetchall())
+
+    # Transform jobs -----------------------------------------------------
+    @staticmethod
+    def _job(row: sqlite3.Row) -> TransformJob:
+        job = dict(row)
+        for field in ("run_at", "lease_expires_at", "created_at", "updated_at", "finished_at"):
+            if job[field] is not None:
+                job[field] = _dt(job[field])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["refresh"] = bool(job["refresh"])
+        return TransformJob(**job)
+
+    def enqueue_transform_job(self, owner: str, entity_id: int, transform: str, max_attempts: int) -> TransformJob:
+        now = _ts(datetime.now(timezone.utc))
+        with self._write() as conn:
+            cur = conn.execute(
+                """INSERT INTO transform_jobs
+                (owner, entity_id, transform, max_attempts, run_at, created_at, updated_at)
+                SELECT owner, id, ?, ?, ?, ?, ? FROM entities WHERE id = ? AND owner = ?""",
+                (transform, max_attempts, now, now, now, entity_id, owner)
+            )
+        if cur.rowcount != 1:
+            raise KeyError("Entity not found")
+        return self.get_transform_job(owner, cur.lastrowid)
+
+    def get_transform_job(self, owner: str, job_id: int) -> TransformJob:
+        row = self._connect().execute(
+            "SELECT * FROM transform_jobs WHERE id = ? AND owner = ?", (job_id, owner)
+        ).fetchone()
+        if not row:
+            raise KeyError("Transform job not found")
+        return self._job(row)
+
+    def list_transform_jobs(self, owner: str, status: Optional[str] = None, limit: int = 50) -> List[TransformJob]:
+        rows = self._connect().execute(
+            """SELECT * FROM transform_jobs WHERE owner = ? AND (? IS NULL OR status = ?)
+            ORDER BY id DESC LIMIT ?""",
+            (owner, status, status, limit)
+        ).fetchall()
+        return [self._job(r) for r in rows]
+
+    def retry_transform_job(self, owner: str, job_id: int) -> TransformJob:
+        job = self.get_transform_job(owner, job_id)
+        if job.status != "dead":
+            raise ValueError("Only dead jobs can be retried")
+        now = _ts(datetime.now(timezone.utc))
+        with self._write() as conn:
+            conn.execute(
+                """UPDATE transform_jobs
+                SET status = 'queued', attempts = 0, run_at = ?, finished_at = NULL, updated_at = ?
+                WHERE id = ? AND owner = ? AND status = 'dead'""",
+                (now, now, job_id, owner)
+            )
+        return self.get_transform_job(owner, job_id)
+
+    def claim_transform_jobs(self, worker_id: str, limit: int, lease_seconds: float) -> List[TransformJob]:
+        moment = datetime.now(timezone.utc)
+        now, expires = _ts(moment), _ts(moment + timedelta(seconds=lease_seconds))
+        # the write lock serializes claims, so a plain select-then-update cannot hand a job out twice
+        with self._write() as conn:
+            conn.execute(
+                """UPDATE transform_jobs
+                SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                    finished_at = CASE WHEN attempts >= max_attempts THEN ? END,
+                    last_error = 'Lease expired (worker ' || lease_owner || ' stopped responding)',
+                    lease_owner = NULL, lease_expires_at = NULL, run_at = ?, updated_at = ?
+                WHERE status = 'running' AND lease_expires_at < ?""",
+                (now, now, now, now)
+            )
+            ids = [r["id"] for r in conn.execute(
+                "SELECT id FROM transform_jobs WHERE status = 'queued' AND run_at <= ? ORDER BY run_at, id LIMIT ?",
+                (now, limit)
+            )]
+            conn.execute(
+                """UPDATE transform_jobs
+                SET status = 'running', attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?, updated_at = ?
+                WHERE id IN (SELECT value FROM json_each(?))""",
+                (worker_id, expires, now, json.dumps(ids))
+            )
+            rows = conn.execute(
+                "SELECT * FROM transform_jobs WHERE id IN (SELECT value FROM json_each(?)) ORDER BY run_at, id",
+                (json.dumps(ids),)
+            ).fetchall()
+        return [self._job(r) for r in rows]
+
+    def heartbeat_transform_jobs(self, worker_id: str, job_ids: List[int], lease_seconds: float) -> List[int]:
+        if not job_ids:
+            return []
+        moment = datetime.now(timezone.utc)
+        with self._write() as conn:
+            conn.execute(
+                """UPDATE transform_jobs SET lease_expires_at = ?, updated_at = ?
+                WHERE id IN (SELECT value FROM json_each(?)) AND lease_owner = ? AND status = 'running'""",
+                (_ts(moment + timedelta(seconds=lease_seconds)), _ts(moment), json.dumps(list(job_ids)), worker_id)
+            )
+            return [r["id"] for r in conn.execute(
+                """SELECT id FROM transform_jobs
+                WHERE id IN (SELECT value FROM json_each(?)) AND lease_owner = ? AND status = 'running'""",
+                (json.dumps(list(job_ids)), worker_id)
+            )]
+
+    def complete_transform_job(self, worker_id: str, job_id: int, result: dict) -> bool:
+        now = _ts(datetime.now(timezone.utc))
+        with self._write() as conn:
+            return conn.execute(
+                """UPDATE transform_jobs
+                SET status = 'succeeded', result = ?, last_error = NULL, lease_owner = NULL,
+                    lease_expires_at = NULL, finished_at = ?, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'running'""",
+                (json.dumps(result, default=str), now, now, job_id, worker_id)
+            ).rowcount == 1
+
+    def fail_transform_job(self, worker_id: str, job_id: int, error: str, retry_in: Optional[float]) -> bool:
+        moment = datetime.now(timezone.utc)
+        now = _ts(moment)
+        if retry_in is None:
+            status, run_at, finished_at = "dead", now, now
+        else:
+            status, run_at, finished_at = "queued", _ts(moment + timedelta(seconds=retry_in)), None
+        with self._write() as conn:
+            return conn.execute(
+                """UPDATE transform_jobs
+                SET status = ?, run_at = ?, finished_at = ?, last_error = ?, lease_owner = NULL,
+                    lease_expires_at = NULL, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'running'""",
+                (status, run_at, finished_at, error, now, job_id, worker_id)
+            ).rowcount == 1
+
+    def schedule_refresh_jobs(
+        self,
+        transform: str,
+        kinds: List[str],
+        stale_before: datetime,
+        limit: int,
+        per_hour: int,
+        max_attempts: int,
+        spread_seconds: float,
+    ) -> List[TransformJob]:
+        moment = datetime.now(timezone.utc)
+        now = _ts(moment)
+        # the write lock serializes schedulers, so the hourly count and the pending check cannot race
+        with self._write() as conn:
+            queued = conn.execute(
+                "SELECT count(*) FROM transform_jobs WHERE refresh = 1 AND transform = ? AND created_at > ?",
+                (transform, _ts(moment - timedelta(hours=1)))
+            ).fetchone()[0]
+            limit = min(limit, per_hour - queued)
+            if limit <= 0:
+                return []
+            targets = conn.execute(
+                """SELECT l.owner, l.entity_id FROM transform_last_runs l
+                JOIN entities e ON e.id = l.entity_id AND e.owner = l.owner
+                WHERE l.transform = ? AND l.succeeded = 1 AND l.last_run_at < ?
+                  AND lower(e.kind) IN (SELECT value FROM json_each(?))
+                  AND NOT EXISTS (
+                    SELECT 1 FROM transform_jobs j
+                    WHERE j.entity_id = l.entity_id AND j.transform = l.transform
+                      AND j.status IN ('queued', 'running')
+                  )
+                ORDER BY l.last_run_at LIMIT ?""",
+                (transform, _ts(stale_before), json.dumps(kinds), limit)
+            ).fetchall()
+            ids = []
+            for i, (owner, entity_id) in enumerate(targets):
+                run_at = _ts(moment + timedelta(seconds=spread_seconds * i / len(targets)))
+                ids.append(conn.execute(
+                    """INSERT INTO transform_jobs
+                    (owner, entity_id, transform, max_attempts, refresh, run_at, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, 1, ?, ?, ?)""",
+                    (owner, entity_id, transform, max_attempts, run_at, now, now)
+                ).lastrowid)
+            rows = conn.execute(
+                "SELECT * FROM transform_jobs WHERE id IN (SELECT value FROM json_each(?)) ORDER BY run_at, id",
+                (json.dumps(ids),)
+            ).fetchall()
+        return [self._job(r) for r in rows]
+
+    # Transform runs -------------------------------------------------------------
+    @staticmethod
+    def _run(row: sqlite3.Row) -> TransformRun:
+        run = dict(row)
+        run["started_at"] = _dt(run["started_at"])
+        run["changes"] = json.loads(run["changes"]) if run["changes"] is not None else None
+        return TransformRun(**run)
+
+    def create_transform_run(self, owner: str, payload: TransformRunCreate) -> TransformRun:
+        with self._write() as conn:
+            cur = conn.execute(
+                """INSERT INTO transform_runs
+                (owner, entity_id, transform, status, started_at, duration_ms, nodes, edges, fetched,
+                 message, error, job_id, changes)
+                SELECT owner, id, :transform, :status, :started_at, :duration_ms, :nodes, :edges, :fetched,
+                       :message, :error, :job_id, :changes
+                FROM entities WHERE id = :entity_id AND owner = :owner""",
+                {
+                    **payload.dict(),
+                    "started_at": _ts(payload.started_at),
+                    "changes": json.dumps(payload.changes, default=str) if payload.changes is not None else None,
+                    "owner": owner,
+                }
+            )
+            if cur.rowcount != 1:
+                raise KeyError("Entity not found")
+            row = conn.execute("SELECT * FROM transform_runs WHERE id = ?", (cur.lastrowid,)).fetchone()
+            conn.execute(
+                """INSERT INTO transform_last_runs (entity_id, transform, owner, last_run_at, succeeded)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (entity_id, transform) DO UPDATE
+                SET last_run_at = max(last_run_at, excluded.last_run_at), succeeded = max(succeeded, excluded.succeeded)""",
+                (row["entity_id"], row["transform"], row["owner"], row["started_at"], int(row["status"] == "succeeded"))
+            )
+        changes.bump(owner)
+        return self._run(row)
+
+    def list_transform_runs(
+        self,
+        owner: str,
+        entity_id: Optional[int] = None,
+        transform: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 50,
+        before_id: Optional[int] = None,
+    ) -> List[TransformRun]:
+        rows = self._connect().execute(
+            """SELECT * FROM transform_runs
+            WHERE owner = ? AND (? IS NULL OR entity_id = ?) AND (? IS NULL OR transform = ?)
+              AND (? IS NULL OR status = ?) AND (? IS NULL OR id < ?)
+            ORDER BY id DESC LIMIT ?""",
+            (owner, entity_id, entity_id, transform, transform, status, status, before_id, before_id, limit)
+        ).fetchall()
+        return [self._run(r) for r in rows]
+
+    def last_transform_run(
+        self, owner: str, entity_id: int, transform: str, status: str = "succeeded"
+    ) -> Optional[TransformRun]:
+        row = self._connect().execute(
+            """SELECT * FROM transform_runs
+            WHERE entity_id = ? AND transform = ? AND status = ? AND owner = ?
+            ORDER BY started_at DESC LIMIT 1""",
+            (entity_id, transform, status, owner)
+        ).fetchone()
+        return self._run(row) if row else None
+
+    # Raw provider responses ---------------------------------------------------
+    def archive_raw_response(
+        self,
+        owner: str,
+        entity_id: int,
+        transform: str,
+        provider: str,
+        content_hash: str,
+        codec: str,
+        size: int,
+        payload: bytes,
+        job_id: Optional[int] = None,
+        run_id: Optional[int] = None,
+    ) -> RawResponse:
+        now = _ts(datetime.now(timezone.utc))
+        with self._write() as conn:
+            conn.execute(
+                """INSERT INTO raw_responses (content_hash, codec, size, payload, created_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (content_hash) DO NOTHING""",
+                (content_hash, codec, size, payload, now)
+            )
+            cur = conn.execute(
+                """INSERT INTO raw_response_links
+                (owner, entity_id, transform, provider, content_hash, run_id, job_id, fetched_at)
+                SELECT owner, id, ?, ?, ?, ?, ?, ? FROM entities WHERE id = ? AND owner = ?""",
+                (transform, provider, content_hash, run_id, job_id, now, entity_id, owner)
+            )
+            if cur.rowcount != 1:
+                raise KeyError("Entity not found")
+            row = conn.execute(
+                f"""SELECT {_RAW_RESPONSE_COLUMNS}
+                FROM raw_response_links l JOIN raw_responses r ON r.content_hash = l.content_hash
+                WHERE l.id = ?""",
+                (cur.lastrowid,)
+            ).fetchone()
+        changes.bump(owner)
+        return _raw_response(row)
+
+    def list_raw_responses(self, owner: str, entity_id: int) -> List[RawResponse]:
+        rows = self._connect().execute(
+            f"""SELECT {_RAW_RESPONSE_COLUMNS}
+            FROM raw_response_links l JOIN raw_responses r ON r.content_hash = l.content_hash
+            WHERE l.entity_id = ? AND l.owner = ? ORDER BY l.id DESC""",
+            (entity_id, owner)
+        ).fetchall()
+        return [_raw_response(r) for r in rows]
+
+    def get_raw_response(self, owner: str, response_id: int) -> Tuple[RawResponse, bytes]:
+        row = self._connect().execute(
+            f"""SELECT {_RAW_RESPONSE_COLUMNS}, r.payload
+            FROM raw_response_links l JOIN raw_responses r ON r.content_hash = l.content_hash
+            WHERE l.id = ? AND l.owner = ?""",
+            (response_id, owner)
+        ).fetchone()
+        if not row:
+            raise KeyError("Raw response not found")
+        return _raw_response(row), bytes(row["payload"])
+
+    def latest_raw_responses(self, owner: str, entity_id: int, transform: str) -> List[Tuple[RawResponse, bytes]]:
+        rows = self._connect().execute(
+            f"""SELECT {_RAW_RESPONSE_COLUMNS}, r.payload
+            FROM raw_response_links l JOIN raw_responses r ON r.content_hash = l.content_hash
+            WHERE l.id IN (
+                SELECT max(id) FROM raw_response_links
+                WHERE entity_id = ? AND owner = ? AND transform = ?
+                GROUP BY provider
+            )
+            ORDER BY l.provider""",
+            (entity_id, owner, transform)
+        ).fetchall()
+        return [(_raw_response(r), bytes(r["payload"])) for r in rows]
+
+    def prune_raw_responses(self) -> int:
+        with self._write() as conn:
+            cur = conn.execute(
+                """DELETE FROM raw_responses
+                WHERE NOT EXISTS (SELECT 1 FROM raw_response_links l WHERE l.content_hash = raw_responses.content_hash)"""
+            )
+        return cur.rowcount
+
+    # Activity log management ------------------------------------------------
+    def log_activity(
+        self,
+        owner: str,
+        action: str,
+        resource_type: str,
+        resource_id: Optional[int] = None,
+        resource_name: Optional[str] = None,
+        details: Optional[str] = None,
+        case_id: Optional[int] = None,
+    ) -> ActivityLog:
+        created_at = datetime.now(timezone.utc)
+        with self._write() as conn:
+            new_id = conn.execute(
+                """INSERT INTO activity_logs
+                (action, resource_type, resource_id, resource_name, details, case_id, owner, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (action, resource_type, resource_id, resource_name, details, case_id, owner, _ts(created_at))
+            ).lastrowid
+            self._log_change(conn, "activity_logs", owner)
+        changes.bump(owner)
+        return ActivityLog(id=new_id, action=action, resource_type=resource_type, resource_id=resource_id,
+                           resource_name=resource_name, details=details, case_id=case_id, owner=owner,
+                           created_at=created_at)
+
+    def log_activities(self, events: List[dict]) -> int:
+        if not events:
+            return 0
+        now = datetime.now(timezone.utc)
+        rows = [
+            (
+                e["action"],
+                e["resource_type"],
+                e.get("resource_id"),
+                e.get("resource_name"),
+                e.get("details"),
+                e.get("case_id"),
+                e["owner"],
+                _ts(e.get("created_at") or now),
+            )
+            for e in events
+        ]
+        with self._write() as conn:
+            conn.executemany(
+                """INSERT INTO activity_logs
+                (action, resource_type, resource_id, resource_name, details, case_id, owner, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            owners = {e["owner"] for e in events}
+            for owner in owners:
+                self._log_change(conn, "activity_logs", owner)
+        for owner in owners:
+            changes.bump(owner)
+        return len(rows)
+
+    def list_activity_log_rows(
+        self,
+        owner: str,
+        limit: int = 50,
+        case_id: Optional[int] = None,
+        resource_type: Optional[str] = None,
+        action: Optional[str] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        since: Optional[datetime] = None,
+    ) -> List[ActivityLogRow]:
+        clauses = ["owner = ?"]
+        params: list = [owner]
+        if case_id is not None:
+            clauses.append("case_id = ?")
+            params.append(case_id)
+        if resource_type:
+            clauses.append("resource_type = ?")
+            params.append(resource_type)
+        if action:
+            clauses.append("action = ?")
+            params.append(action)
+        if before is not None:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend((_ts(before[0]), before[1]))
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(_ts(since))
+        params.append(limit)
+
+        cur = self._tuples()
+        cur.execute(
+            f"SELECT {ACTIVITY_LOG_COLUMNS} FROM activity_logs WHERE {' AND '.join(clauses)} "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            params
+        )
+        return [ActivityLogRow(*r[:-1], _dt(r[-1])) for r in cur.fetchall()]
+
+    def maintain_activity_logs(self, retention_days: int = 0, rollup: bool = True) -> List[str]:
+        """Delete activity older than the retention window, rolling up daily counts first.
+
+        There are no partitions here; returns the ``YYYY-MM`` months that had rows deleted.
+        """
+        if retention_days <= 0:
+            return []
+        cutoff = _ts(datetime.now(timezone.utc) - timedelta(days=retention_days))
+        with self._write() as conn:
+            months = [
+                r[0] for r in conn.execute(
+                    "SELECT DISTINCT substr(created_at, 1, 7) FROM activity_logs WHERE created_at < ? ORDER BY 1",
+                    (cutoff,)
+                )
+            ]
+            if rollup:
+                conn.execute(
+                    """INSERT INTO activity_log_rollups (day, owner, case_id, resource_type, action, events)
+                    SELECT substr(created_at, 1, 10), owner, COALESCE(case_id, 0), resource_type, action, COUNT(*)
+                    FROM activity_logs WHERE created_at < ?
+                    GROUP BY 1, 2, 3, 4, 5
+                    ON CONFLICT (owner, day, case_id, resource_type, action)
+                    DO UPDATE SET events = activity_log_rollups.events + excluded.events""",
+                    (cutoff,)
+                )
+            conn.execute("DELETE FROM activity_logs WHERE created_at < ?", (cutoff,))
+            if months:
+                self._log_change(conn, "*")
+        if months:
+            changes.bump_all()
+        return months
+
+    # Search -------------------------------------------------------------
+    def search(
+        self,
+        owner: str,
+        query: str,
+        case_id: Optional[int] = None,
+        kinds: Optional[List[str]] = None,
+        include_comments: bool = True,
+        prefix: bool = False,
+        limit: int = 20,
+    ) -> List[SearchResult]:
+        """Ranked search backed by FTS5 (bm25) and a prefix range scan on ``lower(name)``.
+
+        ``prefix`` mode only matches the start of entity names and is meant
+        for typeahead.
+        """
+        needle, terms, _ = search_terms(query)
+        if not needle:
+            return []
+        params = {
+            "owner": owner,
+            "needle": needle,
+            "upper": needle + _PREFIX_END,
+            "match": " AND ".join(f'"{t}"*' for t in terms) or None,
+            "case_id": case_id,
+            "kinds": json.dumps([k.lower() for k in kinds]) if kinds else None,
+            "limit": limit,
+        }
+        scope = ""
+        if case_id is not None:
+            scope += " AND e.case_id = :case_id"
+        if kinds:
+            scope += " AND lower(e.kind) IN (SELECT value FROM json_each(:kinds))"
+        name_prefix = "lower(e.name) >= :needle AND lower(e.name) < :upper"
+
+        if prefix:
+            sql = f"""
+            SELECT 'entity' AS type, e.id, e.id AS entity_id, e.case_id, e.name, e.kind,
+                   substr(e.description, 1, 200) AS snippet, 1.0 / (1 + length(e.name)) AS score
+            FROM entities e
+            WHERE e.owner = :owner AND {name_prefix}{scope}
+            ORDER BY lower(e.name)
+            LIMIT :limit
+            """
+        else:
+            # bm25 is negative, lower is better; -r / (1 - r) maps it onto [0, 1)
+            fts = (
+                "SELECT rowid, bm25(entities_fts, 2.0, 1.0) AS rank FROM entities_fts WHERE entities_fts MATCH :match"
+                if params["match"] else "SELECT NULL AS rowid, NULL AS rank WHERE 0"
+            )
+            sql = f"""
+            SELECT 'entity' AS type, e.id, e.id AS entity_id, e.case_id, e.name, e.kind,
+                   substr(e.description, 1, 200) AS snippet,
+                   COALESCE(-fts.rank / (1 - fts.rank), 0)
+                   + CASE WHEN lower(e.name) = :needle THEN 2 WHEN {name_prefix} THEN 1 ELSE 0 END
+                   AS score
+            FROM hits JOIN entities e ON e.id = hits.id LEFT JOIN fts ON fts.rowid = e.id
+            WHERE e.owner = :owner{scope}
+            """
+            if include_comments and params["match"]:
+                sql += f"""
+            UNION ALL
+            SELECT 'comment' AS type, c.id, c.entity_id, e.case_id, e.name, e.kind,
+                   substr(c.text, 1, 200) AS snippet, -f.rank / (1 - f.rank) AS score
+            FROM comments_fts f JOIN comments c ON c.id = f.rowid
+            JOIN entities e ON e.id = c.entity_id AND e.owner = :owner
+            WHERE comments_fts MATCH :match AND c.owner = :owner{scope}
+            """
+            sql = f"""
+            WITH fts AS ({fts}),
+            hits AS (
+                SELECT rowid AS id FROM fts
+                UNION
+                SELECT e.id FROM entities e WHERE e.owner = :owner AND {name_prefix}
+            )
+            SELECT * FROM ({sql}) ORDER BY score DESC, id LIMIT :limit"""
+
+        rows = self._connect().execute(sql, params).fetchall()
+        return [SearchResult(**dict(r)) for r in rows]
+
+    # Comments management ------------------------------------------------
+    def create_comment(self, owner: str, payload: CommentCreate) -> Comment:
+        created_at = datetime.now(timezone.utc)
+        with self._write() as conn:
+            cursor = conn.execute(
+                """INSERT INTO comments (entity_id, text, owner, created_at)
+                SELECT id, ?, owner, ? FROM entities WHERE id = ? AND owner = ?""",
+                (payload.text, _ts(created_at), payload.entity_id, owner)
+            )
+            if not cursor.rowcount:
+                raise KeyError("Entity not found")
+            new_id = cursor.lastrowid
+        changes.bump(owner)
+        return Comment(id=new_id, entity_id=payload.entity_id, text=payload.text, owner=owner, created_at=created_at)
+
+    def list_comments(self, owner: str, entity_id: int) -> List[Comment]:
+        rows = self._connect().execute(
+            "SELECT * FROM comments WHERE owner = ? AND entity_id = ? ORDER BY created_at DESC",
+            (owner, entity_id)
+        ).fetchall()
+        return [
+            Comment(id=r["id"], entity_id=r["entity_id"], text=r["text"], owner=r["owner"],
+                    created_at=_dt(r["created_at"]))
+            for r in rows
+        ]
+
+    def delete_comment(self, owner: str, comment_id: int) -> None:
+        with self._write() as conn:
+            conn.execute("DELETE FROM comments WHERE id = ? AND owner = ?", (comment_id, owner))
+        changes.bump(owner)
@@ -0,0 +1,179 @@
+"""Archive of raw provider responses, and re-materializing entities from it.
+
+A transform keeps a few summary entities of what a provider returned and
+drops the rest. Every response that passes through ``upstream.fetch`` inside
+a ``capture()`` block (the dispatcher opens one per run) is therefore
+archived by ``archive_responses``: serialized as canonical JSON, hashed
+(SHA-256 of that JSON) and compressed with zstd when the optional
+``zstandard`` package is installed, zlib otherwise. A payload
+is stored once per content hash however many entities, runs or owners
+fetched it; each fetch adds a link row naming the entity, the transform,
+the provider, the transform run and the transform job, if any.
+
+``rematerialize`` runs a transform again with ``fetch`` answering from the
+entity's newest archived responses instead of calling the provider, so
+entities can be rebuilt (say, after the transform learns to extract more)
+without an API call, a vault key or an open circuit.
+
+Links go away with their entity. Worker processes (``python -m app.worker``)
+run an ``ArchivePruner`` that drops payloads no link refers to any more
+every ``APP_RAW_RESPONSE_PRUNE_INTERVAL`` seconds.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.config import get_settings
+from app.storage import store
+
+try:
+    import zstandard
+except ImportError:  # optional: without it payloads are zlib-compressed
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# (provider, payload) pairs fetched inside the innermost capture() block on this thread
+_captured: ContextVar[Optional[List[Tuple[str, Any]]]] = ContextVar("raw_response_capture", default=None)
+# provider -> archived payload while re-materializing
+_replay: ContextVar[Optional[Dict[str, Any]]] = ContextVar("raw_response_replay", default=None)
+
+
+class NotArchived(LookupError):
+    """A re-materialized transform asked for a provider response the archive does not have."""
+
+
+def encode(payload: Any) -> Tuple[str, str, int, bytes]:
+    """``(content_hash, codec, size, compressed)`` for a JSON-serializable payload."""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    level = get_settings().raw_response_compression_level
+    if zstandard is not None:
+        compressed, codec = zstandard.ZstdCompressor(level=level).compress(raw), "zstd"
+    else:
+        compressed, codec = zlib.compress(raw, min(level, 9)), "zlib"
+    return hashlib.sha256(raw).hexdigest(), codec, len(raw), compressed
+
+
+def decode(codec: str, compressed: bytes) -> Any:
+    if codec == "zlib":
+        return json.loads(zlib.decompress(compressed))
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This response was archived with zstd; install the zstandard package to read it")
+        return json.loads(zstandard.ZstdDecompressor().decompress(compressed))
+    raise ValueError(f"Unknown codec '{codec}'")
+
+
+def replaying() -> bool:
+    """Whether the current thread is re-materializing (and must not reach any provider)."""
+    return _replay.get() is not None
+
+
+def replayed(provider: str) -> Any:
+    """The archived response standing in for a call to ``provider`` during ``rematerialize``."""
+    responses = _replay.get()
+    if provider not in responses:
+        raise NotArchived(f"No archived {provider} response for this entity")
+    return responses[provider]
+
+
+def record(provider: str, payload: Any) -> None:
+    """Remember a fetched response, if a ``capture()`` block is open on this thread."""
+    captured = _captured.get()
+    if captured is not None:
+        captured.append((provider, payload))
+
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, Any]]]:
+    """Collect the ``(provider, response)`` pairs fetched on this thread until the block exits."""
+    captured: List[Tuple[str, Any]] = []
+    token = _captured.set(captured)
+    try:
+        yield captured
+    finally:
+        _captured.reset(token)
+
+
+def archive_responses(
+    owner: str,
+    entity_id: int,
+    transform: str,
+    responses: List[Tuple[str, Any]],
+    job_id: Optional[int] = None,
+    run_id: Optional[int] = None,
+) -> None:
+    """Archive captured responses; errors are logged rather than failing the run."""
+    if not get_settings().raw_response_archive:
+        return
+    for provider, payload in responses:
+        try:
+            content_hash, codec, size, compressed = encode(payload)
+            store.archive_raw_response(
+                owner, entity_id, transform, provider, content_hash, codec, size, compressed,
+                job_id=job_id, run_id=run_id,
+            )
+        except Exception:
+            logger.exception("Could not archive the %s response for entity %s", provider, entity_id)
+
+
+def rematerialize(func: Callable, entity, owner: str, transform: str) -> dict:
+    """Run a transform against the entity's newest archived responses; no provider is called.
+
+    KeyError if nothing was archived for this entity and transform.
+    """
+    archived = store.latest_raw_responses(owner, entity.id, transform)
+    if not archived:
+        raise KeyError(f"No archived responses for transform '{transform}' on this entity")
+    token = _replay.set({meta.provider: decode(meta.codec, compressed) for meta, compressed in archived})
+    try:
+        return func(entity, owner)
+    finally:
+        _replay.reset(token)
+
+
+class ArchivePruner:
+    """Background thread that drops archived payloads no link refers to, every ``interval`` seconds."""
+
+    def __init__(self, store, interval: float = 3600.0):
+        self._store = store
+        self.interval = interval
+        self.pruned = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="archive-pruner", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def prune(self) -> int:
+        try:
+            pruned = self._store.prune_raw_responses()
+        except Exception:
+            logger.exception("Raw response pruning failed")
+            return 0
+        if pruned:
+            logger.info("Pruned %d unreferenced raw provider responses", pruned)
+        self.pruned += pruned
+        return pruned
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.prune()
@@ -1,55 +1,291 @@
-from app.transforms.ip import run_ip_transforms
-from app.transforms.domain import run_domain_transforms
-from app.transforms.url import run_url_transforms
-from app.transforms.email import run_email_transforms
-from app.transforms.hash import run_hash_transforms
-from app.transforms.phone import run_phone_transforms
-from app.transforms.whois import run_whois_transforms
-from app.transforms.shodan import run_shodan_transforms
+"""Transform registry.
 
+Providers are listed as ``"module:function"`` targets and imported on first
+run, so listing transforms (and importing the app) does not load every
+provider module and its HTTP client. ``provider`` names the upstream
+service the transform fetches from, which is what its circuit breaker is
+keyed by. Transforms that answer from local data have no ``key``. A
+``fallback`` names the ``key`` and ``provider`` of a service the transform
+passes what it cannot answer on to; that key is reported as required and
+that breaker applies to the transform too. An entry ``covered_by`` another
+already runs as that one's fallback, so enrichment doesn't run it
+separately.
+
+Every run goes through ``run_provider``, which records it in the
+``transform_runs`` history (status, duration, result counts) and archives
+the raw provider responses it fetched (see ``app.transforms.archive``). A
+run that calls no provider, because its API key is missing, is recorded
+as ``skipped``; so is one whose result says ``skipped``, such as a fallback
+that was needed but had no key. With ``fresh_hours``, a transform that succeeded on the
+entity that recently is not run again.
+
+Each recorded run carries ``changes``, the entity attributes it changed
+(old and new values). Refresh runs, queued by ``app.refresh`` for
+stale entities, also delete the entities they re-created: a child with the
+same kind and name as one already linked to the entity. What is left of a
+refresh is then only what changed.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from importlib import import_module
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from app.attributes import attribute_changes
+from app.schemas import TransformRun, TransformRunCreate
+from app.storage import store
+from app.transforms.archive import archive_responses, capture, rematerialize
+
+logger = logging.getLogger(__name__)
 
 TRANSFORM_MAP = {
     "ip": [
-        {"name": "AbuseIPDB", "func": run_ip_transforms, "key": "ABUSEIPDB_API_KEY"},
-        {"name": "Shodan", "func": run_shodan_transforms, "key": "SHODAN_API_KEY"},
+        {
+            "name": "AbuseIPDB",
+            "func": "app.transforms.ip:run_ip_transforms",
+            "key": "ABUSEIPDB_API_KEY",
+            "provider": "abuseipdb",
+        },
+        {
+            "name": "Shodan",
+            "func": "app.transforms.shodan:run_shodan_transforms",
+            "key": "SHODAN_API_KEY",
+            "provider": "shodan",
+        },
+        {
+            "name": "IP Intel (offline)",
+            "func": "app.transforms.ipintel:run_ipintel_transforms",
+            "key": None,  # local datasets, see APP_IP_INTEL_DIR
+            "provider": "ipintel",
+        },
     ],
     "domain": [
-        {"name": "URLScan", "func": run_domain_transforms, "key": "URLSCAN_API_KEY"},
-        {"name": "WHOIS", "func": run_whois_transforms, "key": "WHOISXML_API_KEY"},
+        {
+            "name": "URLScan",
+            "func": "app.transforms.domain:run_domain_transforms",
+            "key": "URLSCAN_API_KEY",
+            "provider": "urlscan",
+        },
+        {
+            "name": "WHOIS",
+            "func": "app.transforms.whois:run_whois_transforms",
+            "key": "WHOISXML_API_KEY",
+            "provider": "whoisxml",
+        },
     ],
     "url": [
-        {"name": "URLScan", "func": run_url_transforms, "key": "URLSCAN_API_KEY"},
+        {
+            "name": "URLScan",
+            "func": "app.transforms.url:run_url_transforms",
+            "key": "URLSCAN_API_KEY",
+            "provider": "urlscan",
+        },
     ],
     "email": [
-        {"name": "Hunter.io", "func": run_email_transforms, "key": "HUNTER_API_KEY"},
+        {
+            "name": "Hunter.io",
+            "func": "app.transforms.email:run_email_transforms",
+            "key": "HUNTER_API_KEY",
+            "provider": "hunter",
+        },
     ],
     "hash": [
-        {"name": "VirusTotal", "func": run_hash_transforms, "key": "VIRUSTOTAL_API_KEY"},
+        {
+            # answers from local lists and passes only unknown hashes on to VirusTotal
+            "name": "Hash Reputation (local)",
+            "func": "app.transforms.hashrep:run_hash_reputation_transforms",
+            "key": None,  # local lists, see APP_HASH_REPUTATION_DIR
+            "provider": "hashrep",
+            "fallback": {"key": "VIRUSTOTAL_API_KEY", "provider": "virustotal"},
+        },
+        {
+            "name": "VirusTotal",
+            "func": "app.transforms.hash:run_hash_transforms",
+            "key": "VIRUSTOTAL_API_KEY",
+            "provider": "virustotal",
+            "covered_by": "Hash Reputation (local)",
+        },
     ],
     "phone": [
-        {"name": "NumVerify", "func": run_phone_transforms, "key": "NUMVERIFY_API_KEY"},
+        {
+            "name": "NumVerify",
+            "func": "app.transforms.phone:run_phone_transforms",
+            "key": "NUMVERIFY_API_KEY",
+            "provider": "numverify",
+        },
     ],
 }
 
+_loaded: Dict[str, Callable] = {}
+
+
+def load_transform(target) -> Callable:
+    """Resolve a ``"module:function"`` target, importing the module once."""
+    if callable(target):
+        return target
+    func = _loaded.get(target)
+    if func is None:
+        module_name, _, attr = target.partition(":")
+        func = _loaded[target] = getattr(import_module(module_name), attr)
+    return func
+
+
+def transform_key(transform: dict) -> Optional[str]:
+    """The vault key ``transform`` needs to reach a remote provider: its own, else its fallback's."""
+    return transform["key"] or (transform.get("fallback") or {}).get("key")
+
+
+def transform_providers(transform: dict) -> Set[str]:
+    """Every upstream provider ``transform`` may call, its fallback's included."""
+    fallback = transform.get("fallback")
+    return {transform["provider"], fallback["provider"]} if fallback else {transform["provider"]}
+
 
 def get_available_transforms(kind: str) -> list:
     kind = (kind or "").lower().strip()
     transforms = TRANSFORM_MAP.get(kind, [])
-    return [{"name": t["name"], "key_required": t["key"]} for t in transforms]
+    return [
+        {"name": t["name"], "key_required": transform_key(t), "local_first": bool(t.get("fallback"))}
+        for t in transforms
+    ]
+
+
+def find_transform(kind: str, transform_name: str = "") -> Optional[dict]:
+    """The ``TRANSFORM_MAP`` entry that ``run_transforms`` would pick, or None."""
+    available = TRANSFORM_MAP.get((kind or "").lower().strip(), [])
+    if not transform_name:
+        return available[0] if available else None
+    for t in available:
+        if t["name"].lower() == transform_name.lower():
+            return t
+    return None
+
 
+def fresh_run(owner: str, entity_id: int, transform: str, fresh_hours: Optional[float]) -> Optional[TransformRun]:
+    """The successful run of ``transform`` on the entity within the last ``fresh_hours``, if any."""
+    if not fresh_hours:
+        return None
+    last = store.last_transform_run(owner, entity_id, transform)
+    if last is not None and last.started_at >= datetime.now(timezone.utc) - timedelta(hours=fresh_hours):
+        return last
+    return None
 
-def run_transforms(entity, owner: str, transform_name: str = "") -> dict:
+
+def _linked(owner: str, entity) -> Set[Tuple[Optional[str], str]]:
+    """``(kind, name)`` of every entity linked to ``entity``."""
+    neighbours = [node for node, _ in store.load_case_graph(owner, entity.case_id).neighbors(entity.id)]
+    return {(row.kind, row.name) for row in store.get_entity_rows(owner, neighbours)}
+
+
+def _drop_repeats(owner: str, result: dict, linked: Set[Tuple[Optional[str], str]]) -> dict:
+    """Delete the entities a refresh created again, keeping only new ones in ``result``."""
+    nodes, dropped = [], set()
+    for node in result.get("nodes", []):
+        if (node.get("kind"), node.get("name")) in linked:
+            store.delete_entity(owner, node["id"])
+            dropped.add(node["id"])
+        else:
+            nodes.append(node)
+    if not dropped:
+        return result
+    edges = [
+        edge for edge in result.get("edges", [])
+        if edge.get("source_entity_id") not in dropped and edge.get("target_entity_id") not in dropped
+    ]
+    return {**result, "nodes": nodes, "edges": edges, "unchanged_nodes": len(dropped)}
+
+
+def run_provider(
+    provider: dict,
+    entity,
+    owner: str,
+    job_id: Optional[int] = None,
+    fresh_hours: Optional[float] = None,
+    refresh: bool = False,
+) -> dict:
+    """Run one ``TRANSFORM_MAP`` entry on ``entity``, recording the run and archiving what it fetched."""
+    name = provider["name"]
+    fresh = fresh_run(owner, entity.id, name, fresh_hours)
+    if fresh is not None:
+        return {
+            "nodes": [],
+            "edges": [],
+            "message": f"Skipped: {name} already ran on this entity at {fresh.started_at:%Y-%m-%d %H:%M} UTC",
+            "fresh_run_id": fresh.id,
+        }
+
+    linked = _linked(owner, entity) if refresh else set()
+    started_at, start = datetime.now(timezone.utc), time.perf_counter()
+    result, error, changes = None, None, None
+    with capture() as fetched:
+        try:
+            result = load_transform(provider["func"])(entity, owner)
+            if refresh:
+                result = _drop_repeats(owner, result, linked)
+            if fetched:
+                changes = attribute_changes(entity.attributes, store.get_entity(owner, entity.id).attributes)
+                result = {**result, "changes": changes}
+            return result
+        except BaseException as exc:
+            error = f"{type(exc).__name__}: {exc}"[:2000]
+            raise
+        finally:
+            run = TransformRunCreate(
+                entity_id=entity.id,
+                transform=name,
+                status="failed" if error else (
+                    "succeeded" if fetched and not (result or {}).get("skipped") else "skipped"
+                ),
+                started_at=started_at,
+                duration_ms=(time.perf_counter() - start) * 1000,
+                nodes=len((result or {}).get("nodes", [])),
+                edges=len((result or {}).get("edges", [])),
+                fetched=len(fetched),
+                message=(result or {}).get("message"),
+                error=error,
+                job_id=job_id,
+                changes=changes or None,
+            )
+            run_id = None
+            try:
+                run_id = store.create_transform_run(owner, run).id
+            except Exception:
+                logger.exception("Could not record the %s run on entity %s", name, entity.id)
+            archive_responses(owner, entity.id, name, fetched, job_id=job_id, run_id=run_id)
+
+
+def run_transforms(
+    entity,
+    owner: str,
+    transform_name: str = "",
+    job_id: Optional[int] = None,
+    fresh_hours: Optional[float] = None,
+    refresh: bool = False,
+) -> dict:
     kind = (entity.kind or "").lower().strip()
-    
+
     available = TRANSFORM_MAP.get(kind, [])
-    
+
     if not available:
         return {"nodes": [], "edges": [], "message": f"No transforms available for kind='{entity.kind}'"}
-    
+
     if transform_name:
         for t in available:
             if t["name"].lower() == transform_name.lower():
-                return t["func"](entity, owner)
+                return run_provider(t, entity, owner, job_id, fresh_hours, refresh)
         return {"nodes": [], "edges": [], "message": f"Transform '{transform_name}' not found for kind='{entity.kind}'"}
-    
-    return available[0]["func"](entity, owner)
+
+    return run_provider(available[0], entity, owner, job_id, fresh_hours, refresh)
+
+
+def rematerialize_transforms(entity, owner: str, transform_name: str = "") -> dict:
+    """Like ``run_transforms``, but from the entity's archived responses instead of the provider.
+
+    KeyError if the transform does not exist for the entity's kind or has nothing archived.
+    """
+    provider = find_transform(entity.kind, transform_name)
+    if provider is None:
+        raise KeyError(f"Transform '{transform_name}' not found for kind='{entity.kind}'" if transform_name
+                       else f"No transforms available for kind='{entity.kind}'")
+    return rematerialize(load_transform(provider["func"]), entity, owner, provider["name"])
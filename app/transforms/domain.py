@@ -1,9 +1,7 @@
-import time
-import requests
-
-from app.schemas import EntityCreate, RelationshipCreate
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
 from app.storage import store
 from app.transforms.keys import get_api_key
+from app.transforms.url import scan_url
 
 
 def run_domain_transforms(entity, owner: str) -> dict:
@@ -18,21 +16,8 @@ def run_domain_transforms(entity, owner: str) -> dict:
             "message": "Missing URLSCAN_API_KEY in API vault",
         }
 
-    submit = requests.post(
-        "https://urlscan.io/api/v1/scan/",
-        headers={
-            "API-Key": api_key,
-            "Content-Type": "application/json",
-        },
-        json={
-            "url": f"http://{entity.name}",
-            "visibility": "private",
-        },
-        timeout=20,
-    )
-    submit.raise_for_status()
-    submit_data = submit.json()
-    uuid = submit_data.get("uuid")
+    scan = scan_url(f"http://{entity.name}", api_key)
+    uuid = scan["uuid"]
 
     if not uuid:
         return {
@@ -41,19 +26,8 @@ def run_domain_transforms(entity, owner: str) -> dict:
             "message": "urlscan submission failed",
         }
 
-    data = None
-    for attempt in range(6):
-        time.sleep(10)
-        result = requests.get(
-            f"https://urlscan.io/api/v1/result/{uuid}/",
-            timeout=20,
-        )
-        if result.status_code == 200:
-            data = result.json()
-            break
-        if result.status_code != 404:
-            result.raise_for_status()
-    
+    data = scan["result"]
+
     if not data:
         return {
             "nodes": [],
@@ -66,6 +40,8 @@ def run_domain_transforms(entity, owner: str) -> dict:
     ips = set()
     for entry in data.get("lists", {}).get("ips", []):
         ips.add(entry)
+    if ips:
+        store.update_entity(owner, entity.id, EntityUpdate(attributes={"resolved_ips": sorted(ips)}))
 
     if screenshot_url:
         screenshot_ent = store.create_entity(
@@ -75,6 +51,7 @@ def run_domain_transforms(entity, owner: str) -> dict:
                 name="Website Screenshot",
                 kind="screenshot",
                 description=screenshot_url,
+                attributes={"source": "urlscan", "screenshot_url": screenshot_url, "scan_id": uuid},
             ),
         )
         nodes.append(screenshot_ent)
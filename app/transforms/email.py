@@ -1,8 +1,20 @@
 import requests
 
-from app.schemas import EntityCreate, RelationshipCreate
+from app.attributes import clean_attributes
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
 from app.storage import store
 from app.transforms.keys import get_api_key
+from app.transforms.upstream import fetch
+
+
+def fetch_email_verification(email: str, api_key: str) -> dict:
+    r = requests.get(
+        "https://api.hunter.io/v2/email-verifier",
+        params={"email": email, "api_key": api_key},
+        timeout=20,
+    )
+    r.raise_for_status()
+    return r.json().get("data", {})
 
 
 def run_email_transforms(entity, owner: str) -> dict:
@@ -17,13 +29,9 @@ def run_email_transforms(entity, owner: str) -> dict:
             "message": "Missing HUNTER_API_KEY in API vault. Get one at https://hunter.io/api",
         }
 
-    r = requests.get(
-        "https://api.hunter.io/v2/email-verifier",
-        params={"email": entity.name, "api_key": api_key},
-        timeout=20,
+    data = fetch(
+        "hunter", "email", entity.name, lambda: fetch_email_verification(entity.name, api_key), api_key=api_key
     )
-    r.raise_for_status()
-    data = r.json().get("data", {})
 
     status = data.get("status", "unknown")
     score = data.get("score", 0)
@@ -32,6 +40,14 @@ def run_email_transforms(entity, owner: str) -> dict:
     mx_records = data.get("mx_records", False)
     smtp_server = data.get("smtp_server", {})
     sources = data.get("sources", [])
+    attributes = {
+        "status": status,
+        "verification_score": score,
+        "disposable": disposable,
+        "webmail": webmail,
+        "mx_records": mx_records,
+        "sources": len(sources),
+    }
 
     info_parts = [
         f"Status: {status}",
@@ -48,8 +64,10 @@ def run_email_transforms(entity, owner: str) -> dict:
             name=f"Email Verification: {status}",
             kind="verification",
             description=", ".join(info_parts),
+            attributes={"source": "hunter", **attributes},
         ),
     )
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=clean_attributes(attributes)))
     nodes.append(verification_ent)
     edges.append(
         store.create_relationship(
@@ -0,0 +1,192 @@
+"""Recursive enrichment: run transforms outward from a seed entity.
+
+Starting from the seed, each level runs every ``TRANSFORM_MAP`` provider for
+the kind of each entity found so far, breadth-first, up to ``max_depth``
+levels. Entities the transforms emit become the next level; kinds are
+resolved through ``canonical_kind``, so ``nameserver`` and ``hostname``
+entities are enriched as domains.
+
+A run is bounded three ways: ``max_depth``; ``budget``, the number of
+provider runs it may start that can reach a remote provider (providers
+whose API key is missing from the vault, or that succeeded on the entity
+within ``fresh_hours``, are skipped without spending it, and runs that can
+only answer from local data, such as hash lists whose VirusTotal fallback
+has no key, run without spending it); and ``concurrency``, how many run at
+once within a level. Each indicator is enriched at most once per run. A provider that is
+another's fallback (``covered_by``) only runs through that one, when both
+are selected.
+
+Transforms always create new entities, so after each one the run folds any
+emitted entity whose normalized indicator is already in the case into the
+existing entity: its relationships are re-pointed and the duplicate is
+deleted. The run returns everything it added as one merged delta.
+"""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.indicators import canonical_kind, normalize_indicator
+from app.schemas import Entity, EnrichmentRun, EnrichmentStep, Relationship, RelationshipCreate
+from app.storage import store
+from app.transforms.dispatcher import TRANSFORM_MAP, fresh_run, run_provider, transform_key
+from app.transforms.keys import get_api_key
+
+logger = logging.getLogger(__name__)
+
+
+def _indicator_key(kind: Optional[str], name: str) -> Optional[Tuple[str, str]]:
+    kind = canonical_kind(kind)
+    indicator = normalize_indicator(kind, name) if kind else None
+    return (kind, indicator) if indicator else None
+
+
+class _CaseIndex:
+    """Indicators and edges of one case, kept current as the run writes to it."""
+
+    def __init__(self, owner: str, case_id: int):
+        self.owner = owner
+        self.by_indicator: Dict[Tuple[str, str], int] = {}
+        for row in store.list_entity_rows(owner, case_id):
+            key = _indicator_key(row.kind, row.name)
+            if key is not None:
+                self.by_indicator.setdefault(key, row.id)
+        self.edges: Set[Tuple[int, int, str]] = {
+            (row.source_entity_id, row.target_entity_id, row.relation or "")
+            for row in store.list_relationship_rows(owner, case_id)
+        }
+        self.added_nodes: Dict[int, Entity] = {}
+        self.added_edges: Dict[int, Relationship] = {}
+        self.merged = 0
+
+    def absorb(self, result: dict) -> List[Entity]:
+        """Record a transform's output, folding duplicates; returns the entities it reached."""
+        nodes = [Entity(**node) for node in result.get("nodes", [])]
+        edges = [Relationship(**edge) for edge in result.get("edges", [])]
+        replace: Dict[int, int] = {}
+        reached: Dict[int, Entity] = {}
+        for node in nodes:
+            key = _indicator_key(node.kind, node.name)
+            existing = self.by_indicator.get(key) if key is not None else None
+            if existing is not None and existing != node.id:
+                replace[node.id] = existing
+                continue
+            if key is not None:
+                self.by_indicator[key] = node.id
+            self.added_nodes[node.id] = reached[node.id] = node
+
+        for edge in edges:
+            source = replace.get(edge.source_entity_id, edge.source_entity_id)
+            target = replace.get(edge.target_entity_id, edge.target_entity_id)
+            triple = (source, target, edge.relation)
+            if source == edge.source_entity_id and target == edge.target_entity_id:
+                self.edges.add(triple)
+                self.added_edges[edge.id] = edge
+            elif source != target and triple not in self.edges:
+                rel = store.create_relationship(
+                    self.owner, RelationshipCreate(source_entity_id=source, target_entity_id=target,
+                                                   relation=edge.relation)
+                )
+                self.edges.add(triple)
+                self.added_edges[rel.id] = rel
+
+        for duplicate, existing in replace.items():
+            # deleting the duplicate also drops the relationships that pointed at it
+            store.delete_entity(self.owner, duplicate)
+            self.merged += 1
+            if existing not in reached and existing not in self.added_nodes:
+                try:
+                    reached[existing] = store.get_entity(self.owner, existing)
+                except KeyError:
+                    pass
+        return list(reached.values())
+
+
+def run_enrichment(
+    seed: Entity,
+    owner: str,
+    max_depth: int = 2,
+    budget: int = 25,
+    concurrency: int = 4,
+    transforms: Optional[List[str]] = None,
+    fresh_hours: Optional[float] = None,
+) -> EnrichmentRun:
+    """Enrich ``seed`` and what its transforms find, breadth-first, within the given limits.
+
+    ``transforms`` restricts the run to providers with those names (case-insensitive).
+    """
+    wanted = {name.lower() for name in transforms} if transforms else None
+    index = _CaseIndex(owner, seed.case_id)
+    visited = {_indicator_key(seed.kind, seed.name) or ("#", str(seed.id))}
+    steps: List[EnrichmentStep] = []
+    calls = 0
+    exhausted = False
+    depth_reached = 0
+    frontier = [seed]
+
+    with ThreadPoolExecutor(max(1, concurrency), thread_name_prefix="enrich") as pool:
+        for depth in range(1, max_depth + 1):
+            scheduled = []
+            for entity in frontier:
+                for provider in TRANSFORM_MAP.get(canonical_kind(entity.kind) or "", []):
+                    if wanted is not None and provider["name"].lower() not in wanted:
+                        continue
+                    covered_by = provider.get("covered_by")
+                    if covered_by and (wanted is None or covered_by.lower() in wanted):
+                        continue  # runs as that transform's fallback
+                    step = EnrichmentStep(entity_id=entity.id, transform=provider["name"], depth=depth)
+                    steps.append(step)
+                    key = transform_key(provider)
+                    remote = bool(key) and bool(get_api_key(owner, key))
+                    if provider["key"] and not remote:
+                        step.message = f"Skipped: missing {provider['key']} in API vault"
+                        continue
+                    fresh = fresh_run(owner, entity.id, provider["name"], fresh_hours)
+                    if fresh is not None:
+                        step.message = f"Skipped: already ran at {fresh.started_at:%Y-%m-%d %H:%M} UTC"
+                        continue
+                    if remote:
+                        if calls >= budget:
+                            exhausted = True
+                            step.message = "Skipped: call budget exhausted"
+                            continue
+                        calls += 1
+                    scheduled.append((step, pool.submit(run_provider, provider, entity, owner)))
+            if not scheduled:
+                break
+            depth_reached = depth
+
+            next_frontier = []
+            # folding duplicates happens here, on one thread, in submission order
+            for step, future in scheduled:
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    logger.warning("Enrichment step %s on entity %s failed: %s", step.transform, step.entity_id, exc)
+                    step.error = f"{type(exc).__name__}: {exc}"[:500]
+                    continue
+                step.nodes, step.edges = len(result.get("nodes", [])), len(result.get("edges", []))
+                step.message = result.get("message")
+                for entity in index.absorb(result):
+                    key = _indicator_key(entity.kind, entity.name)
+                    if key is None or key in visited or canonical_kind(entity.kind) not in TRANSFORM_MAP:
+                        continue
+                    visited.add(key)
+                    next_frontier.append(entity)
+            frontier = next_frontier
+
+    return EnrichmentRun(
+        seed_entity_id=seed.id,
+        case_id=seed.case_id,
+        max_depth=max_depth,
+        depth_reached=depth_reached,
+        calls=calls,
+        budget=budget,
+        budget_exhausted=exhausted,
+        merged=index.merged,
+        nodes=list(index.added_nodes.values()),
+        edges=list(index.added_edges.values()),
+        steps=steps,
+    )
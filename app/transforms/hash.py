@@ -1,8 +1,23 @@
 import requests
 
-from app.schemas import EntityCreate, RelationshipCreate
+from app.attributes import clean_attributes
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
 from app.storage import store
 from app.transforms.keys import get_api_key
+from app.transforms.upstream import fetch
+
+
+def fetch_virustotal_file(file_hash: str, api_key: str):
+    """VirusTotal's file object for ``file_hash``, or None when the hash is unknown to it."""
+    r = requests.get(
+        f"https://www.virustotal.com/api/v3/files/{file_hash}",
+        headers={"x-apikey": api_key},
+        timeout=30,
+    )
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return r.json().get("data", {})
 
 
 def run_hash_transforms(entity, owner: str) -> dict:
@@ -15,17 +30,15 @@ def run_hash_transforms(entity, owner: str) -> dict:
             "nodes": [],
             "edges": [],
             "message": "Missing VIRUSTOTAL_API_KEY in API vault. Get one at https://www.virustotal.com/gui/my-apikey",
+            # also when reached as Hash Reputation's fallback, whose local lookup alone would count as an answer
+            "skipped": True,
         }
 
     file_hash = entity.name.strip()
 
-    r = requests.get(
-        f"https://www.virustotal.com/api/v3/files/{file_hash}",
-        headers={"x-apikey": api_key},
-        timeout=30,
-    )
+    data = fetch("virustotal", "hash", file_hash, lambda: fetch_virustotal_file(file_hash, api_key), api_key=api_key)
 
-    if r.status_code == 404:
+    if data is None:
         unknown_ent = store.create_entity(
             owner=owner,
             payload=EntityCreate(
@@ -33,6 +46,7 @@ def run_hash_transforms(entity, owner: str) -> dict:
                 name="Hash Not Found",
                 kind="analysis",
                 description=f"Hash {file_hash} not found in VirusTotal database",
+                attributes={"source": "virustotal", "found": False},
             ),
         )
         nodes.append(unknown_ent)
@@ -48,8 +62,6 @@ def run_hash_transforms(entity, owner: str) -> dict:
         )
         return {"nodes": [n.dict() for n in nodes], "edges": [e.dict() for e in edges]}
 
-    r.raise_for_status()
-    data = r.json().get("data", {})
     attributes = data.get("attributes", {})
 
     stats = attributes.get("last_analysis_stats", {})
@@ -67,6 +79,16 @@ def run_hash_transforms(entity, owner: str) -> dict:
         threat_label = "malicious"
     elif suspicious > 0:
         threat_label = "suspicious"
+    findings = {
+        "verdict": threat_label,
+        "malicious": malicious,
+        "suspicious": suspicious,
+        "harmless": harmless,
+        "undetected": undetected,
+        "file_type": attributes.get("type_description"),
+        "size": attributes.get("size"),
+        "names": file_names or None,
+    }
 
     analysis_ent = store.create_entity(
         owner=owner,
@@ -75,8 +97,10 @@ def run_hash_transforms(entity, owner: str) -> dict:
             name=f"VirusTotal: {threat_label}",
             kind="threat" if malicious > 0 else "analysis",
             description=f"Malicious: {malicious}, Suspicious: {suspicious}, Harmless: {harmless}, Undetected: {undetected}",
+            attributes={"source": "virustotal", "found": True, **clean_attributes(findings)},
         ),
     )
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=clean_attributes(findings)))
     nodes.append(analysis_ent)
     edges.append(
         store.create_relationship(
@@ -97,6 +121,7 @@ def run_hash_transforms(entity, owner: str) -> dict:
                 name=f"File Type: {file_type}",
                 kind="metadata",
                 description=f"Size: {file_size} bytes",
+                attributes={"file_type": file_type, "size": file_size},
             ),
         )
         nodes.append(type_ent)
@@ -0,0 +1,171 @@
+"""Local hash reputation: known-good and known-bad hash lists checked before VirusTotal.
+
+Lists live in ``APP_HASH_REPUTATION_DIR``:
+
+- ``known_bad/*``: malware feeds, IR findings
+- ``known_good/*``: NSRL-style allowlists, internal software inventories
+
+Each file is one list, named after the file. The first field of each line
+(comma- or whitespace-separated, quotes ignored) is taken as a hash, and
+MD5, SHA-1 and SHA-256 can be mixed in one file; anything else is skipped.
+
+Each file is compiled into sorted binary arrays, one per digest length
+(16, 20 and 32 bytes per hash, no per-entry overhead). The arrays are
+memory-mapped and hot-swapped as described in ``app.transforms.localdata``;
+``APP_HASH_REPUTATION_CHECK_INTERVAL`` sets how often the files are checked
+for changes. A lookup is one binary search per list: microseconds, no
+network.
+
+The transform is listed ahead of VirusTotal for ``hash`` entities. A hash
+on any list is answered locally; only hashes no list knows, or all of them
+when no lists are configured, are passed on to VirusTotal.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import struct
+import threading
+from bisect import bisect_left
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from app.attributes import clean_attributes
+from app.config import get_settings
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
+from app.storage import store
+from app.transforms.hash import run_hash_transforms
+from app.transforms.localdata import DatasetDirectory, FixedKeys, MappedIndex, Sources, compiled, list_files
+from app.transforms.upstream import fetch
+
+_MAGIC = b"GLHASH01"
+_HEADER = struct.Struct("<8sQQQ")  # magic, then the number of MD5, SHA-1 and SHA-256 digests
+_WIDTHS = (16, 20, 32)
+_DIGEST = re.compile(r"^(?:[0-9a-f]{32}|[0-9a-f]{40}|[0-9a-f]{64})$")
+_FIELD = re.compile(r"[\s,]+")
+
+
+def is_digest(value: str) -> bool:
+    """Whether ``value`` is a lowercase hex MD5, SHA-1 or SHA-256 digest."""
+    return bool(_DIGEST.match(value))
+
+
+def read_hashes(path: str) -> Iterator[bytes]:
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            field = _FIELD.split(line.strip(), 1)[0].strip("\"'").lower()
+            if is_digest(field):
+                yield bytes.fromhex(field)
+
+
+def write_hashes(digests: Iterator[bytes], out: BinaryIO) -> None:
+    """Write ``digests`` as sorted, de-duplicated arrays, one per digest length."""
+    by_width: Dict[int, set] = {width: set() for width in _WIDTHS}
+    for digest in digests:
+        by_width[len(digest)].add(digest)
+    out.write(_HEADER.pack(_MAGIC, *(len(by_width[width]) for width in _WIDTHS)))
+    for width in _WIDTHS:
+        out.write(b"".join(sorted(by_width[width])))
+
+
+class HashSet(MappedIndex):
+    """A memory-mapped hash list written by ``write_hashes``."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        magic, *counts = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a hash index")
+        self._arrays: Dict[int, FixedKeys] = {}
+        offset = _HEADER.size
+        for width, count in zip(_WIDTHS, counts):
+            self._arrays[width] = FixedKeys(self._map, offset, width, count)
+            offset += width * count
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._arrays.values())
+
+    def __contains__(self, digest: bytes) -> bool:
+        keys = self._arrays.get(len(digest))
+        if not keys:
+            return False
+        i = bisect_left(keys, digest)
+        return i < len(keys) and keys[i] == digest
+
+
+def load_hashes(source: str) -> HashSet:
+    return HashSet(compiled(source, _MAGIC.decode(), lambda out: write_hashes(read_hashes(source), out)))
+
+
+class HashReputation(DatasetDirectory):
+    label = "hash reputation"
+
+    def sources(self) -> Sources:
+        sources: Sources = {}
+        for verdict in ("known_bad", "known_good"):
+            for name, path in list_files(os.path.join(self.directory, verdict)).items():
+                sources[f"{verdict}:{name}"] = (path, load_hashes)
+        return sources
+
+    def lookup(self, file_hash: str) -> Dict[str, List[str]]:
+        """``{"known_bad": [lists], "known_good": [lists]}`` naming the lists that contain ``file_hash``."""
+        digest = bytes.fromhex(file_hash)
+        found: Dict[str, List[str]] = {"known_bad": [], "known_good": []}
+        for name, hashes in self.current().items():
+            if digest in hashes:
+                verdict, _, list_name = name.partition(":")
+                found[verdict].append(list_name)
+        return found
+
+
+_reputation: Optional[HashReputation] = None
+_reputation_lock = threading.Lock()
+
+
+def get_hash_reputation() -> Optional[HashReputation]:
+    """The process-wide hash lists, or None when ``APP_HASH_REPUTATION_DIR`` is not set."""
+    global _reputation
+    settings = get_settings()
+    if not settings.hash_reputation_dir:
+        return None
+    if _reputation is None:
+        with _reputation_lock:
+            if _reputation is None:
+                _reputation = HashReputation(settings.hash_reputation_dir, settings.hash_reputation_check_interval)
+    return _reputation
+
+
+def run_hash_reputation_transforms(entity, owner: str) -> dict:
+    reputation = get_hash_reputation()
+    file_hash = entity.name.strip().lower()
+    if reputation is None or not is_digest(file_hash):
+        return run_hash_transforms(entity, owner)
+
+    data = fetch("hashrep", "hash", file_hash, lambda: reputation.lookup(file_hash))
+    known_bad, known_good = data.get("known_bad") or [], data.get("known_good") or []
+    if not known_bad and not known_good:
+        # unknown locally: this is the only case worth a VirusTotal call
+        return run_hash_transforms(entity, owner)
+
+    verdict = "malicious" if known_bad else "clean"
+    findings = {"verdict": verdict, "known_bad": known_bad or None, "known_good": known_good or None}
+    analysis_ent = store.create_entity(
+        owner=owner,
+        payload=EntityCreate(
+            case_id=entity.case_id,
+            name=f"Local reputation: {verdict}",
+            kind="threat" if known_bad else "analysis",
+            description="Listed in: " + ", ".join(known_bad + known_good),
+            attributes={"source": "hashrep", **clean_attributes(findings)},
+        ),
+    )
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=clean_attributes(findings)))
+    edge = store.create_relationship(
+        owner=owner,
+        payload=RelationshipCreate(
+            source_entity_id=entity.id,
+            target_entity_id=analysis_ent.id,
+            relation="analyzed_as",
+        ),
+    )
+    return {"nodes": [analysis_ent.dict()], "edges": [edge.dict()]}
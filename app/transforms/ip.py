@@ -1,8 +1,21 @@
 import requests
 
-from app.schemas import EntityCreate, RelationshipCreate
+from app.attributes import clean_attributes
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
 from app.storage import store
 from app.transforms.keys import get_api_key
+from app.transforms.upstream import fetch
+
+
+def fetch_abuseipdb(ip: str, api_key: str) -> dict:
+    r = requests.get(
+        "https://api.abuseipdb.com/api/v2/check",
+        headers={"Key": api_key, "Accept": "application/json"},
+        params={"ipAddress": ip, "maxAgeInDays": 90},
+        timeout=20,
+    )
+    r.raise_for_status()
+    return r.json().get("data", {})
 
 
 def run_ip_transforms(entity, owner: str) -> dict:
@@ -18,18 +31,19 @@ def run_ip_transforms(entity, owner: str) -> dict:
             "message": "Missing ABUSEIPDB_API_KEY in API vault",
         }
 
-    r = requests.get(
-        "https://api.abuseipdb.com/api/v2/check",
-        headers={"Key": abuse_key, "Accept": "application/json"},
-        params={"ipAddress": entity.name, "maxAgeInDays": 90},
-        timeout=20,
-    )
-    r.raise_for_status()
-    data = r.json().get("data", {})
+    data = fetch("abuseipdb", "ip", entity.name, lambda: fetch_abuseipdb(entity.name, abuse_key), api_key=abuse_key)
 
     score = data.get("abuseConfidenceScore", 0)
     country = data.get("countryCode") or "UNK"
     isp = data.get("isp") or "Unknown ISP"
+    attributes = {
+        "abuse_score": score,
+        "country": data.get("countryCode"),
+        "isp": data.get("isp"),
+        "usage_type": data.get("usageType"),
+        "total_reports": data.get("totalReports"),
+        "last_reported_at": data.get("lastReportedAt"),
+    }
 
     threat_ent = store.create_entity(
         owner=owner,
@@ -38,8 +52,10 @@ def run_ip_transforms(entity, owner: str) -> dict:
             name=f"AbuseIPDB score={score}",
             kind="threat",
             description=f"country={country}, isp={isp}",
+            attributes={"source": "abuseipdb", **attributes},
         ),
     )
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=clean_attributes(attributes)))
     nodes.append(threat_ent)
 
     rel = store.create_relationship(
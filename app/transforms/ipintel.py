@@ -0,0 +1,308 @@
+"""Offline IP intelligence: country, ASN and blocklist membership from local files.
+
+Datasets live in ``APP_IP_INTEL_DIR``:
+
+- ``country.csv``: ``start,end,country`` or ``network,country`` rows
+  (DB-IP, IP2Location and similar "lite" CSV exports)
+- ``asn.csv``: ``start,end,asn,organization`` or ``network,asn,organization``
+- ``blocklists/*``: one IP, CIDR or ``start-end`` range per line, ``#`` and
+  ``;`` comments allowed (FireHOL netsets, Spamhaus DROP); each file is one
+  list, named after the file
+
+IPv4 and IPv6 both work; IPv4 addresses are keyed as IPv4-mapped IPv6 so
+one index holds both families. Header rows and lines that don't parse are
+skipped.
+
+Each file is compiled into a sorted-range index: three fixed-width arrays
+(16-byte big-endian range starts, range ends, 4-byte value ids) and a JSON
+value table. It is memory-mapped and hot-swapped as described in
+``app.transforms.localdata``; ``APP_IP_INTEL_CHECK_INTERVAL`` sets how
+often the files are checked for changes. A lookup is a binary search over
+the mapped starts: microseconds, no network. Ranges must not overlap (a
+range overlapping the previous one is trimmed to start after it);
+blocklist ranges are merged instead.
+
+The transform fetches through ``upstream.fetch`` like the network ones, so
+its answers are archived and can be re-materialized.
+"""
+
+from __future__ import annotations
+
+import csv
+import ipaddress
+import json
+import logging
+import os
+import struct
+import threading
+from bisect import bisect_right
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.attributes import clean_attributes
+from app.config import get_settings
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
+from app.storage import store
+from app.transforms.localdata import DatasetDirectory, FixedKeys, MappedIndex, Sources, compiled, list_files
+from app.transforms.upstream import fetch
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"GLRANGE1"
+_HEADER = struct.Struct("<8sQQ")  # magic, range count, offset of the JSON value table
+_KEY = 16
+_V4_MAPPED = 0xFFFF << 32
+
+Range = Tuple[int, int, Any]
+
+
+def address_key(address: str) -> int:
+    """The address as an int in the IPv6 space, IPv4 mapped to ``::ffff:0:0/96``; ValueError if invalid."""
+    parsed = ipaddress.ip_address(address.strip())
+    if parsed.version == 4:
+        return _V4_MAPPED | int(parsed)
+    return int(parsed)
+
+
+def parse_range(text: str) -> Tuple[int, int]:
+    """``(start, end)`` keys of an IP, CIDR or ``start-end`` range; ValueError if it is none of those."""
+    text = text.strip()
+    if "-" in text:
+        first, _, last = text.partition("-")
+        start, end = address_key(first), address_key(last)
+    elif "/" in text:
+        network = ipaddress.ip_network(text, strict=False)
+        offset = _V4_MAPPED if network.version == 4 else 0
+        start, end = offset | int(network.network_address), offset | int(network.broadcast_address)
+    else:
+        start = end = address_key(text)
+    if start > end:
+        raise ValueError(f"Range '{text}' ends before it starts")
+    return start, end
+
+
+# Source files ---------------------------------------------------------------
+def read_csv_ranges(path: str, value: Callable[[List[str]], Any]) -> Iterator[Range]:
+    """Rows of ``start,end,...`` or ``network,...``; ``value`` maps the remaining columns to the range's value."""
+    with open(path, newline="", encoding="utf-8", errors="replace") as handle:
+        for row in csv.reader(handle):
+            if not row or row[0].lstrip().startswith("#"):
+                continue
+            try:
+                if "/" in row[0]:
+                    (start, end), rest = parse_range(row[0]), row[1:]
+                else:
+                    (start, end), rest = parse_range(f"{row[0]}-{row[1]}"), row[2:]
+                yield start, end, value(rest)
+            except (ValueError, IndexError):
+                continue  # header rows and malformed lines
+
+
+def read_blocklist(path: str) -> Iterator[Range]:
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            entry = line.split("#", 1)[0].split(";", 1)[0].strip()
+            if not entry:
+                continue
+            try:
+                start, end = parse_range(entry.split()[0])
+            except ValueError:
+                continue
+            yield start, end, True
+
+
+def _country(columns: List[str]) -> Optional[str]:
+    return columns[0].strip().upper() or None
+
+
+def _asn(columns: List[str]) -> List[Any]:
+    number = columns[0].strip().upper().removeprefix("AS")
+    return [f"AS{int(number)}", columns[1].strip() if len(columns) > 1 else None]
+
+
+# Compiled indexes -----------------------------------------------------------
+def write_ranges(ranges: Iterator[Range], out: BinaryIO, merge: bool = False) -> None:
+    """Write ``ranges`` as a sorted-range index, trimming (or with ``merge``, merging) overlaps."""
+    ordered: List[List[Any]] = []
+    for start, end, value in sorted(ranges, key=lambda r: (r[0], r[1])):
+        if ordered and start <= ordered[-1][1]:
+            if merge:
+                ordered[-1][1] = max(ordered[-1][1], end)
+                continue
+            if end <= ordered[-1][1]:
+                continue
+            start = ordered[-1][1] + 1
+        ordered.append([start, end, value])
+    values: List[Any] = []
+    value_ids: Dict[str, int] = {}
+    ids = []
+    for _, _, value in ordered:
+        key = json.dumps(value, sort_keys=True)
+        if key not in value_ids:
+            value_ids[key] = len(values)
+            values.append(value)
+        ids.append(value_ids[key])
+    count = len(ordered)
+    out.write(_HEADER.pack(_MAGIC, count, _HEADER.size + count * (2 * _KEY + 4)))
+    out.write(b"".join(start.to_bytes(_KEY, "big") for start, _, _ in ordered))
+    out.write(b"".join(end.to_bytes(_KEY, "big") for _, end, _ in ordered))
+    out.write(struct.pack(f"={count}I", *ids))
+    out.write(json.dumps(values).encode())
+
+
+class RangeIndex(MappedIndex):
+    """A memory-mapped sorted-range index written by ``write_ranges``."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        magic, count, table_at = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a range index")
+        self._starts = FixedKeys(self._map, _HEADER.size, _KEY, count)
+        self._ends = FixedKeys(self._map, _HEADER.size + count * _KEY, _KEY, count)
+        self._ids = memoryview(self._map)[_HEADER.size + 2 * count * _KEY:table_at].cast("I")
+        self._values = json.loads(self._map[table_at:])
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def lookup(self, key: int) -> Any:
+        """The value of the range containing ``key`` (see ``address_key``), or None."""
+        probe = key.to_bytes(_KEY, "big")
+        i = bisect_right(self._starts, probe) - 1
+        if i < 0 or self._ends[i] < probe:
+            return None
+        return self._values[self._ids[i]]
+
+    def __del__(self):
+        try:
+            self._ids.release()
+        except AttributeError:
+            pass
+        super().__del__()
+
+
+def load_ranges(source: str, read: Callable[[str], Iterator[Range]], merge: bool = False) -> RangeIndex:
+    return RangeIndex(compiled(source, _MAGIC.decode(), lambda out: write_ranges(read(source), out, merge)))
+
+
+# Datasets -------------------------------------------------------------------
+class IPIntel(DatasetDirectory):
+    label = "IP intelligence"
+
+    def sources(self) -> Sources:
+        sources: Sources = {}
+        for name, value in (("country", _country), ("asn", _asn)):
+            path = os.path.join(self.directory, f"{name}.csv")
+            if os.path.isfile(path):
+                sources[name] = (path, lambda p, value=value: load_ranges(p, lambda q: read_csv_ranges(q, value)))
+        for name, path in list_files(os.path.join(self.directory, "blocklists")).items():
+            sources[f"blocklist:{name}"] = (path, lambda p: load_ranges(p, read_blocklist, merge=True))
+        return sources
+
+    def lookup(self, address: str) -> Dict[str, Any]:
+        """Country, ASN and blocklist membership of ``address`` (ValueError if it is not an IP)."""
+        key = address_key(address)
+        indexes = self.current()
+        country = indexes["country"].lookup(key) if "country" in indexes else None
+        asn, as_org = (indexes["asn"].lookup(key) or (None, None)) if "asn" in indexes else (None, None)
+        blocklists = [
+            name.partition(":")[2] for name, index in indexes.items()
+            if name.startswith("blocklist:") and index.lookup(key)
+        ]
+        return {"country": country, "asn": asn, "as_org": as_org, "blocklists": blocklists}
+
+
+_intel: Optional[IPIntel] = None
+_intel_lock = threading.Lock()
+
+
+def get_ip_intel() -> Optional[IPIntel]:
+    """The process-wide datasets, or None when ``APP_IP_INTEL_DIR`` is not set."""
+    global _intel
+    settings = get_settings()
+    if not settings.ip_intel_dir:
+        return None
+    if _intel is None:
+        with _intel_lock:
+            if _intel is None:
+                _intel = IPIntel(settings.ip_intel_dir, settings.ip_intel_check_interval)
+    return _intel
+
+
+# Transform ------------------------------------------------------------------
+def run_ipintel_transforms(entity, owner: str) -> dict:
+    nodes = []
+    edges = []
+
+    intel = get_ip_intel()
+    if intel is None:
+        return {"nodes": [], "edges": [], "message": "No IP intelligence datasets configured (APP_IP_INTEL_DIR)"}
+
+    ip = entity.name.strip()
+    try:
+        address_key(ip)
+    except ValueError:
+        return {"nodes": [], "edges": [], "message": f"'{ip}' is not an IP address"}
+
+    data = fetch("ipintel", "ip", ip, lambda: intel.lookup(ip))
+
+    blocklists = data.get("blocklists") or []
+    attributes = {
+        "country": data.get("country"),
+        "asn": data.get("asn"),
+        "as_org": data.get("as_org"),
+        "blocklisted": bool(blocklists),
+        "blocklists": blocklists or None,
+    }
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=clean_attributes(attributes)))
+
+    if data.get("asn"):
+        asn_ent = store.create_entity(
+            owner=owner,
+            payload=EntityCreate(
+                case_id=entity.case_id,
+                name=data["asn"],
+                kind="asn",
+                description=data.get("as_org") or "",
+                attributes=clean_attributes({"source": "ipintel", "as_org": data.get("as_org")}),
+            ),
+        )
+        nodes.append(asn_ent)
+        edges.append(
+            store.create_relationship(
+                owner=owner,
+                payload=RelationshipCreate(
+                    source_entity_id=entity.id,
+                    target_entity_id=asn_ent.id,
+                    relation="announced_by",
+                ),
+            )
+        )
+
+    for name in blocklists:
+        list_ent = store.create_entity(
+            owner=owner,
+            payload=EntityCreate(
+                case_id=entity.case_id,
+                name=f"Blocklist: {name}",
+                kind="threat",
+                description=f"{ip} is listed in {name}",
+                attributes={"source": "ipintel", "blocklist": name},
+            ),
+        )
+        nodes.append(list_ent)
+        edges.append(
+            store.create_relationship(
+                owner=owner,
+                payload=RelationshipCreate(
+                    source_entity_id=entity.id,
+                    target_entity_id=list_ent.id,
+                    relation="listed_in",
+                ),
+            )
+        )
+
+    result = {"nodes": [n.dict() for n in nodes], "edges": [e.dict() for e in edges]}
+    if not nodes and not data.get("country"):
+        result["message"] = f"{ip} is not in any local dataset"
+    return result
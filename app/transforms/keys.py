@@ -1,9 +1,18 @@
+import json
+
+from app.cache import API_KEYS_KEY, cached
 from app.storage import store
+from app.transforms.archive import replaying
 
 
-def get_api_key(owner: str, name: str) -> str | None:
+def _load_keys(owner: str) -> bytes:
     keys = store.list_api_keys(owner=owner)
-    for k in keys:
-        if k.active and (k.name or "").strip().upper() == name.strip().upper():
-            return k.description
-    return None
+    return json.dumps({(k.name or "").strip().upper(): k.description for k in reversed(keys) if k.active}).encode()
+
+
+def get_api_key(owner: str, name: str) -> str | None:
+    if replaying():
+        # re-materializing answers from the archive and never sends the key
+        return "archived"
+    keys = json.loads(cached(API_KEYS_KEY.format(owner), lambda: _load_keys(owner)))
+    return keys.get(name.strip().upper())
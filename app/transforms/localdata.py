@@ -0,0 +1,184 @@
+"""Local datasets behind the offline transforms: compiled, memory-mapped and hot-swapped.
+
+A dataset file (a CSV export, a blocklist, a hash list) is compiled once
+into a binary index of fixed-width sorted keys, then memory-mapped. The
+index is written to the temp directory under a name derived from the
+source's path, size and mtime and the index format. Gunicorn workers
+therefore share one compiled copy and its pages, and a lookup is a binary
+search over the mapped keys (``FixedKeys`` lets ``bisect`` read them in
+place).
+
+A ``DatasetDirectory`` maps the files under one directory to their
+indexes. At most every ``check_interval`` seconds a lookup stats the files.
+When any changed, that one caller compiles the changed files and swaps in a
+new set of indexes while other lookups keep answering from the old one. Old
+maps are closed once no lookup holds them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_INDEX_DIR = "ghostlock-localdata"
+
+# dataset name -> (source path, loader returning its index)
+Sources = Dict[str, Tuple[str, Callable[[str], Any]]]
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+class FixedKeys:
+    """Read-only sequence view of ``count`` keys of ``width`` bytes in a mapped file, for ``bisect``."""
+
+    __slots__ = ("_buf", "_offset", "_width", "_count")
+
+    def __init__(self, buf, offset: int, width: int, count: int):
+        self._buf, self._offset, self._width, self._count = buf, offset, width, count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        at = self._offset + i * self._width
+        return self._buf[at:at + self._width]
+
+
+class MappedIndex:
+    """Base for indexes read from a memory-mapped compiled file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+
+    def __del__(self):
+        try:
+            self._map.close()
+        except (AttributeError, BufferError, ValueError):
+            pass
+
+
+def compiled(source: str, fmt: str, write: Callable[[BinaryIO], None]) -> str:
+    """Path of ``source`` compiled by ``write`` in index format ``fmt``, compiling it unless this version was."""
+    info = os.stat(source)
+    origin = hashlib.sha256(f"{os.path.realpath(source)}:{fmt}".encode()).hexdigest()[:16]
+    version = hashlib.sha256(f"{info.st_size}:{info.st_mtime_ns}".encode()).hexdigest()[:16]
+    directory = os.path.join(tempfile.gettempdir(), _INDEX_DIR)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{origin}-{version}.idx")
+    if os.path.exists(path):
+        return path
+    started = time.perf_counter()
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            write(out)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    logger.info("Compiled %s in %.2fs", source, time.perf_counter() - started)
+    # older versions of this file; processes still mapping one keep it until they swap
+    for entry in os.listdir(directory):
+        if entry.startswith(f"{origin}-") and entry.endswith(".idx") and entry != os.path.basename(path):
+            try:
+                os.unlink(os.path.join(directory, entry))
+            except OSError:
+                pass
+    return path
+
+
+def list_files(directory: str) -> Dict[str, str]:
+    """``{file name without extension: path}`` of the regular, non-hidden files in ``directory``."""
+    if not os.path.isdir(directory):
+        return {}
+    files = {}
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry)
+        if not entry.startswith(".") and os.path.isfile(path):
+            files[os.path.splitext(entry)[0]] = path
+    return files
+
+
+class DatasetDirectory(ABC):
+    """The datasets under one directory, reloaded when their files change."""
+
+    label = "local"
+
+    def __init__(self, directory: str, check_interval: float = 30.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature: Optional[Signature] = None
+        self._indexes: Dict[str, Any] = {}
+        self._next_check = 0.0
+        self.loaded_at: Optional[float] = None
+
+    @abstractmethod
+    def sources(self) -> Sources:
+        """``{dataset: (path, loader)}`` for the files currently present."""
+
+    @staticmethod
+    def _signature_of(sources: Sources) -> Signature:
+        stats = []
+        for name, (path, _) in sorted(sources.items()):
+            info = os.stat(path)
+            stats.append((name, info.st_size, info.st_mtime_ns))
+        return tuple(stats)
+
+    def reload(self) -> bool:
+        """Re-read the directory, compiling changed files and swapping them in; True if anything changed."""
+        with self._lock:
+            return self._reload()
+
+    def _reload(self) -> bool:
+        self._next_check = time.monotonic() + self.check_interval
+        sources = self.sources()
+        signature = self._signature_of(sources)
+        if signature == self._signature:
+            return False
+        previous = {stat[0]: stat for stat in self._signature or ()}
+        indexes = {}
+        for stat, (name, (path, load)) in zip(signature, sorted(sources.items())):
+            if previous.get(name) == stat and name in self._indexes:
+                indexes[name] = self._indexes[name]
+                continue
+            try:
+                indexes[name] = load(path)
+            except (OSError, ValueError):
+                logger.exception("Could not load %s dataset %s", self.label, path)
+                if name in self._indexes:
+                    indexes[name] = self._indexes[name]
+        # one assignment, so a concurrent lookup sees either the old datasets or the new ones
+        self._indexes = indexes
+        self._signature = signature
+        self.loaded_at = time.time()
+        logger.info("Loaded %s datasets: %s", self.label, ", ".join(indexes) or "none")
+        return True
+
+    def current(self) -> Dict[str, Any]:
+        """``{dataset: index}``, checking for changed files first when the check interval has passed."""
+        if self._signature is None:
+            self.reload()
+        elif time.monotonic() >= self._next_check and self._lock.acquire(blocking=False):
+            # one caller checks (and recompiles); the others keep using the current datasets
+            try:
+                self._reload()
+            except OSError:
+                logger.exception("Could not check %s datasets", self.label)
+            finally:
+                self._lock.release()
+        return self._indexes
+
+    def datasets(self) -> Dict[str, int]:
+        """``{dataset: entries}`` currently loaded."""
+        return {name: len(index) for name, index in self.current().items()}
@@ -1,8 +1,20 @@
 import requests
 
-from app.schemas import EntityCreate, RelationshipCreate
+from app.attributes import clean_attributes
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
 from app.storage import store
 from app.transforms.keys import get_api_key
+from app.transforms.upstream import fetch
+
+
+def fetch_phone_validation(phone: str, api_key: str) -> dict:
+    r = requests.get(
+        "http://apilayer.net/api/validate",
+        params={"access_key": api_key, "number": phone},
+        timeout=20,
+    )
+    r.raise_for_status()
+    return r.json()
 
 
 def run_phone_transforms(entity, owner: str) -> dict:
@@ -19,13 +31,7 @@ def run_phone_transforms(entity, owner: str) -> dict:
 
     phone = entity.name.strip().replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
 
-    r = requests.get(
-        "http://apilayer.net/api/validate",
-        params={"access_key": api_key, "number": phone},
-        timeout=20,
-    )
-    r.raise_for_status()
-    data = r.json()
+    data = fetch("numverify", "phone", phone, lambda: fetch_phone_validation(phone, api_key), api_key=api_key)
 
     if not data.get("valid", False):
         invalid_ent = store.create_entity(
@@ -35,8 +41,10 @@ def run_phone_transforms(entity, owner: str) -> dict:
                 name="Invalid Phone Number",
                 kind="verification",
                 description=f"Phone number {phone} is not valid",
+                attributes={"source": "numverify", "valid": False},
             ),
         )
+        store.update_entity(owner, entity.id, EntityUpdate(attributes={"valid": False}))
         nodes.append(invalid_ent)
         edges.append(
             store.create_relationship(
@@ -56,6 +64,15 @@ def run_phone_transforms(entity, owner: str) -> dict:
     carrier = data.get("carrier", "")
     line_type = data.get("line_type", "")
     international_format = data.get("international_format", phone)
+    attributes = clean_attributes({
+        "valid": True,
+        "country_code": country_code or None,
+        "country": data.get("country_name") or None,
+        "location": location or None,
+        "carrier": carrier or None,
+        "line_type": line_type or None,
+        "international_format": international_format,
+    })
 
     info_parts = [
         f"Country: {country_name} ({country_code})",
@@ -73,8 +90,10 @@ def run_phone_transforms(entity, owner: str) -> dict:
             name=f"Phone: Valid ({line_type})",
             kind="verification",
             description=", ".join(info_parts),
+            attributes={"source": "numverify", **attributes},
         ),
     )
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=attributes))
     nodes.append(verification_ent)
     edges.append(
         store.create_relationship(
@@ -1,8 +1,23 @@
 import requests
 
-from app.schemas import EntityCreate, RelationshipCreate
+from app.attributes import clean_attributes
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
 from app.storage import store
 from app.transforms.keys import get_api_key
+from app.transforms.upstream import fetch
+
+
+def fetch_shodan_host(ip: str, api_key: str):
+    """Shodan's host record for ``ip``, or None when Shodan has no data on it."""
+    r = requests.get(
+        f"https://api.shodan.io/shodan/host/{ip}",
+        params={"key": api_key},
+        timeout=30,
+    )
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return r.json()
 
 
 def run_shodan_transforms(entity, owner: str) -> dict:
@@ -19,13 +34,9 @@ def run_shodan_transforms(entity, owner: str) -> dict:
 
     ip = entity.name.strip()
 
-    r = requests.get(
-        f"https://api.shodan.io/shodan/host/{ip}",
-        params={"key": api_key},
-        timeout=30,
-    )
+    data = fetch("shodan", "ip", ip, lambda: fetch_shodan_host(ip, api_key), api_key=api_key)
 
-    if r.status_code == 404:
+    if data is None:
         not_found_ent = store.create_entity(
             owner=owner,
             payload=EntityCreate(
@@ -33,6 +44,7 @@ def run_shodan_transforms(entity, owner: str) -> dict:
                 name="Shodan: No data",
                 kind="analysis",
                 description=f"IP {ip} not found in Shodan database",
+                attributes={"source": "shodan", "found": False},
             ),
         )
         nodes.append(not_found_ent)
@@ -48,9 +60,6 @@ def run_shodan_transforms(entity, owner: str) -> dict:
         )
         return {"nodes": [n.dict() for n in nodes], "edges": [e.dict() for e in edges]}
 
-    r.raise_for_status()
-    data = r.json()
-
     org = data.get("org", "Unknown")
     asn = data.get("asn", "")
     isp = data.get("isp", "")
@@ -70,6 +79,18 @@ def run_shodan_transforms(entity, owner: str) -> dict:
         f"Open ports: {len(ports)}",
     ]
     info_parts = [p for p in info_parts if p]
+    attributes = {
+        "org": data.get("org"),
+        "asn": asn or None,
+        "isp": isp or None,
+        "country": country or None,
+        "city": city or None,
+        "os": os or None,
+        "open_ports": len(ports),
+        "ports": ports,
+        "hostnames": hostnames,
+        "vulns": vulns,
+    }
 
     scan_ent = store.create_entity(
         owner=owner,
@@ -78,8 +99,10 @@ def run_shodan_transforms(entity, owner: str) -> dict:
             name=f"Shodan: {org}",
             kind="analysis",
             description=", ".join(info_parts),
+            attributes={"source": "shodan", "found": True, **attributes},
         ),
     )
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=clean_attributes(attributes)))
     nodes.append(scan_ent)
     edges.append(
         store.create_relationship(
@@ -100,6 +123,7 @@ def run_shodan_transforms(entity, owner: str) -> dict:
                 name=f"Port {port}",
                 kind="port",
                 description=f"Open port on {ip}",
+                attributes={"port": port},
             ),
         )
         nodes.append(port_ent)
@@ -144,6 +168,7 @@ def run_shodan_transforms(entity, owner: str) -> dict:
                 name=vuln,
                 kind="vulnerability",
                 description=f"CVE detected on {ip}",
+                attributes={"cve": vuln},
             ),
         )
         nodes.append(vuln_ent)
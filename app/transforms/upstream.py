@@ -0,0 +1,291 @@
+"""Provider calls made by transforms: coalescing and circuit breaking.
+
+Each transform is split into a fetch step -- the provider HTTP call, which
+depends only on the indicator -- and a materialize step that writes what was
+fetched into the caller's case. Fetches go through ``fetch``, which keys them
+by provider, normalized indicator and a digest of the API key: while one is
+in flight, callers asking for the same key wait for it and share its
+response (or its exception) instead of sending their own request. Callers
+with different API keys never share a call, so nobody is served on another
+tenant's key or handed the error of a key that is not theirs. Each caller then
+materializes the shared response into its own case, so a burst of analysts
+or a bulk run enriching the same indicator costs the provider one request.
+
+Every provider also has a ``CircuitBreaker``. It judges the provider's last
+``APP_PROVIDER_BREAKER_WINDOW`` calls and opens when too many failed
+(timeouts, connection errors, 5xx, throttling) or were slow. While open,
+calls raise ``ProviderUnavailable`` at once instead of waiting out the
+provider's timeout; after ``APP_PROVIDER_BREAKER_OPEN_SECONDS`` a single
+probe call is let through, and its outcome closes or re-opens the breaker.
+Calls beyond ``APP_PROVIDER_MAX_CONCURRENCY`` also fail fast, so one slow
+provider cannot hold every request and worker thread.
+
+All of this is per process; nothing is cached once a call completes.
+Responses are handed to ``app.transforms.archive``, which stores them when
+the run is archived and supplies them when a run is re-materialized.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from app.config import get_settings
+from app.indicators import normalize_indicator
+from app.transforms.archive import record, replayed, replaying
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses that mean the provider is struggling rather than that the request was wrong
+_TRANSIENT_STATUSES = {408, 425, 429}
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether ``exc`` is a provider outage (no HTTP response, 5xx or throttling) rather than a bad request."""
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status is None or status >= 500 or status in _TRANSIENT_STATUSES
+
+
+class ProviderUnavailable(Exception):
+    """A provider call was refused without being sent; try again after ``retry_after`` seconds."""
+
+    def __init__(self, provider: str, reason: str, retry_after: float):
+        super().__init__(f"{provider} is unavailable ({reason}); retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        provider: str,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 15.0,
+        slow_call_rate: float = 0.5,
+        open_seconds: float = 30.0,
+        max_concurrency: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.provider = provider
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.max_concurrency = max_concurrency
+        self._clock = clock
+        self._outcomes: "deque[tuple[bool, bool]]" = deque(maxlen=max(window, self.min_calls))
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._active = 0
+        self.calls = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def call(self, fn: Callable[[], Any], slow_after: Optional[float] = None) -> Any:
+        """Run ``fn`` unless the breaker refuses it, recording whether it failed or was slow."""
+        probe = self._acquire()
+        failed = True
+        start = self._clock()
+        try:
+            result = fn()
+            failed = False
+            return result
+        except Exception as exc:
+            failed = is_transient(exc)
+            raise
+        finally:
+            slow = self._clock() - start > (slow_after or self.slow_call_seconds)
+            self._release(probe, failed, slow)
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.open_seconds - self._clock()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise ProviderUnavailable(self.provider, "circuit open", remaining)
+                self.state = self.HALF_OPEN
+            probe = self.state == self.HALF_OPEN
+            if probe and self._probing:
+                self.rejected += 1
+                raise ProviderUnavailable(self.provider, "probe in flight", self.open_seconds)
+            if self.max_concurrency and self._active >= self.max_concurrency:
+                self.rejected += 1
+                raise ProviderUnavailable(self.provider, "too many calls in flight", 1.0)
+            self._probing = self._probing or probe
+            self._active += 1
+            self.calls += 1
+            return probe
+
+    def _release(self, probe: bool, failed: bool, slow: bool) -> None:
+        with self._lock:
+            self._active -= 1
+            if probe:
+                self._probing = False
+                if failed or slow:
+                    self._open("probe call failed" if failed else "probe call was slow")
+                else:
+                    self.state = self.CLOSED
+                    logger.info("Circuit for %s closed", self.provider)
+                return
+            if self.state != self.CLOSED:
+                return
+            self._outcomes.append((failed, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failures, slow_calls = self._rates()
+            if failures >= self.failure_rate:
+                self._open(f"{failures:.0%} of recent calls failed")
+            elif slow_calls >= self.slow_call_rate:
+                self._open(f"{slow_calls:.0%} of recent calls were slow")
+
+    def _open(self, reason: str) -> None:
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.trips += 1
+        logger.warning("Circuit for %s opened for %.0fs: %s", self.provider, self.open_seconds, reason)
+
+    def _rates(self) -> tuple:
+        total = len(self._outcomes) or 1
+        return (
+            sum(failed for failed, _ in self._outcomes) / total,
+            sum(slow for _, slow in self._outcomes) / total,
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            failures, slow_calls = self._rates()
+            retry_after = None
+            if self.state == self.OPEN:
+                retry_after = max(0.0, self._opened_at + self.open_seconds - self._clock())
+            return {
+                "provider": self.provider,
+                "state": self.state,
+                "window_calls": len(self._outcomes),
+                "failure_rate": failures,
+                "slow_call_rate": slow_calls,
+                "in_flight": self._active,
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "trips": self.trips,
+                "retry_after": retry_after,
+            }
+
+
+upstream = SingleFlight()
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(provider: str) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(provider)
+            if breaker is None:
+                settings = get_settings()
+                breaker = _breakers[provider] = CircuitBreaker(
+                    provider,
+                    window=settings.provider_breaker_window,
+                    min_calls=settings.provider_breaker_min_calls,
+                    failure_rate=settings.provider_breaker_failure_rate,
+                    slow_call_seconds=settings.provider_breaker_slow_call_seconds,
+                    slow_call_rate=settings.provider_breaker_slow_call_rate,
+                    open_seconds=settings.provider_breaker_open_seconds,
+                    max_concurrency=settings.provider_max_concurrency,
+                )
+    return breaker
+
+
+def provider_stats() -> List[dict]:
+    """Breaker state of every provider called so far in this process."""
+    with _breakers_lock:
+        breakers = sorted(_breakers.values(), key=lambda b: b.provider)
+    return [breaker.stats() for breaker in breakers]
+
+
+def fetch(
+    provider: str,
+    kind: str,
+    value: str,
+    call: Callable[[], Any],
+    slow_after: Optional[float] = None,
+    api_key: Optional[str] = None,
+) -> Any:
+    """Run ``call`` (the provider request for ``value`` made with ``api_key``) unless an identical one is in flight.
+
+    Raises ``ProviderUnavailable`` when the provider's breaker refuses the call;
+    ``slow_after`` overrides the slow-call threshold for providers that are slow by design.
+    """
+    if replaying():
+        return replayed(provider)
+    breaker = breaker_for(provider)
+    indicator = normalize_indicator(kind, value) or value.strip().lower()
+    # a digest, so the in-flight table never holds the key itself
+    key_digest = hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else None
+    result = upstream.do((provider, indicator, key_digest), lambda: breaker.call(call, slow_after))
+    record(provider, result)
+    return result
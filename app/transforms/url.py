@@ -2,9 +2,54 @@ import time
 import requests
 from urllib.parse import urlparse
 
-from app.schemas import EntityCreate, RelationshipCreate
+from app.attributes import clean_attributes
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
 from app.storage import store
 from app.transforms.keys import get_api_key
+from app.transforms.upstream import fetch
+
+
+def fetch_urlscan(url: str, api_key: str) -> dict:
+    """Submit ``url`` to urlscan and poll for the result.
+
+    Returns ``{"uuid": ..., "result": ...}``; ``uuid`` is None when the
+    submission was refused and ``result`` is None when the scan did not
+    finish within 60s.
+    """
+    submit = requests.post(
+        "https://urlscan.io/api/v1/scan/",
+        headers={
+            "API-Key": api_key,
+            "Content-Type": "application/json",
+        },
+        json={
+            "url": url,
+            "visibility": "private",
+        },
+        timeout=20,
+    )
+    submit.raise_for_status()
+    uuid = submit.json().get("uuid")
+    if not uuid:
+        return {"uuid": None, "result": None}
+
+    for attempt in range(6):
+        time.sleep(10)
+        result = requests.get(
+            f"https://urlscan.io/api/v1/result/{uuid}/",
+            timeout=20,
+        )
+        if result.status_code == 200:
+            return {"uuid": uuid, "result": result.json()}
+        if result.status_code != 404:
+            result.raise_for_status()
+    return {"uuid": uuid, "result": None}
+
+
+def scan_url(url: str, api_key: str) -> dict:
+    """``fetch_urlscan``, shared with identical scans already in flight (domain scans included)."""
+    # polling alone takes 10s or more, so only scans that miss most of the polling window count as slow
+    return fetch("urlscan", "url", url, lambda: fetch_urlscan(url, api_key), slow_after=45.0, api_key=api_key)
 
 
 def run_url_transforms(entity, owner: str) -> dict:
@@ -49,21 +94,8 @@ def run_url_transforms(entity, owner: str) -> dict:
             )
         )
 
-    submit = requests.post(
-        "https://urlscan.io/api/v1/scan/",
-        headers={
-            "API-Key": api_key,
-            "Content-Type": "application/json",
-        },
-        json={
-            "url": url,
-            "visibility": "private",
-        },
-        timeout=20,
-    )
-    submit.raise_for_status()
-    submit_data = submit.json()
-    uuid = submit_data.get("uuid")
+    scan = scan_url(url, api_key)
+    uuid = scan["uuid"]
 
     if not uuid:
         return {
@@ -72,18 +104,7 @@ def run_url_transforms(entity, owner: str) -> dict:
             "message": "URLScan submission failed",
         }
 
-    data = None
-    for attempt in range(6):
-        time.sleep(10)
-        result = requests.get(
-            f"https://urlscan.io/api/v1/result/{uuid}/",
-            timeout=20,
-        )
-        if result.status_code == 200:
-            data = result.json()
-            break
-        if result.status_code != 404:
-            result.raise_for_status()
+    data = scan["result"]
 
     if not data:
         return {
@@ -104,6 +125,16 @@ def run_url_transforms(entity, owner: str) -> dict:
     title = page.get("title", "")
     server = page.get("server", "")
 
+    attributes = clean_attributes({
+        "verdict": "malicious" if malicious else "clean",
+        "verdict_score": score,
+        "categories": categories or None,
+        "status_code": status_code or None,
+        "title": title or None,
+        "server": server or None,
+        "scan_id": uuid,
+    })
+
     info_parts = [
         f"Status: {status_code}",
         f"Title: {title}" if title else None,
@@ -120,8 +151,10 @@ def run_url_transforms(entity, owner: str) -> dict:
             name=f"URLScan: {'MALICIOUS' if malicious else 'Clean'}",
             kind="threat" if malicious else "analysis",
             description=", ".join(info_parts),
+            attributes={"source": "urlscan", **attributes},
         ),
     )
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=attributes))
     nodes.append(analysis_ent)
     edges.append(
         store.create_relationship(
@@ -142,6 +175,7 @@ def run_url_transforms(entity, owner: str) -> dict:
                 name="URL Screenshot",
                 kind="screenshot",
                 description=screenshot_url,
+                attributes={"source": "urlscan", "screenshot_url": screenshot_url, "scan_id": uuid},
             ),
         )
         nodes.append(screenshot_ent)
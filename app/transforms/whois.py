@@ -1,8 +1,24 @@
 import requests
 
-from app.schemas import EntityCreate, RelationshipCreate
+from app.attributes import clean_attributes
+from app.schemas import EntityCreate, EntityUpdate, RelationshipCreate
 from app.storage import store
 from app.transforms.keys import get_api_key
+from app.transforms.upstream import fetch
+
+
+def fetch_whois(domain: str, api_key: str) -> dict:
+    r = requests.get(
+        "https://www.whoisxmlapi.com/whoisserver/WhoisService",
+        params={
+            "apiKey": api_key,
+            "domainName": domain,
+            "outputFormat": "JSON",
+        },
+        timeout=30,
+    )
+    r.raise_for_status()
+    return r.json().get("WhoisRecord", {})
 
 
 def run_whois_transforms(entity, owner: str) -> dict:
@@ -19,17 +35,7 @@ def run_whois_transforms(entity, owner: str) -> dict:
 
     domain = entity.name.strip()
 
-    r = requests.get(
-        "https://www.whoisxmlapi.com/whoisserver/WhoisService",
-        params={
-            "apiKey": api_key,
-            "domainName": domain,
-            "outputFormat": "JSON",
-        },
-        timeout=30,
-    )
-    r.raise_for_status()
-    data = r.json().get("WhoisRecord", {})
+    data = fetch("whoisxml", "domain", domain, lambda: fetch_whois(domain, api_key), api_key=api_key)
 
     registrar_name = data.get("registrarName", "Unknown")
     creation_date = data.get("createdDate", "")
@@ -43,6 +49,12 @@ def run_whois_transforms(entity, owner: str) -> dict:
     registrant_email = registrant.get("email", "")
 
     name_servers = data.get("nameServers", {}).get("hostNames", [])
+    attributes = {
+        "registrar": data.get("registrarName"),
+        "created": creation_date or None,
+        "expires": expiry_date or None,
+        "registrant_country": registrant_country or None,
+    }
 
     info_parts = [
         f"Registrar: {registrar_name}",
@@ -59,8 +71,16 @@ def run_whois_transforms(entity, owner: str) -> dict:
             name=f"WHOIS: {registrar_name}",
             kind="whois",
             description=", ".join(info_parts),
+            attributes=clean_attributes({
+                "source": "whoisxml",
+                **attributes,
+                "updated": updated_date or None,
+                "status": status or None,
+                "name_servers": name_servers or None,
+            }),
         ),
     )
+    store.update_entity(owner, entity.id, EntityUpdate(attributes=clean_attributes(attributes)))
     nodes.append(whois_ent)
     edges.append(
         store.create_relationship(
@@ -81,6 +101,7 @@ def run_whois_transforms(entity, owner: str) -> dict:
                 name=registrant_name,
                 kind="person" if not registrant.get("organization") else "organization",
                 description=f"Country: {registrant_country}" if registrant_country else "",
+                attributes=clean_attributes({"country": registrant_country or None}),
             ),
         )
         nodes.append(registrant_ent)
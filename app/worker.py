@@ -0,0 +1,221 @@
+"""Standalone transform worker.
+
+    python -m app.worker [--concurrency 8]
+
+Claims jobs from the durable ``transform_jobs`` queue and runs the matching
+``TRANSFORM_MAP`` provider, so enrichment capacity scales by starting more
+worker processes, on this node or others, independently of the API tier.
+
+Each claimed job is leased to this worker; a heartbeat thread keeps the
+leases alive while jobs run. If the worker dies, its leases expire and the
+jobs go back to the queue. Failures are retried with exponential backoff
+until ``APP_TRANSFORM_JOB_MAX_ATTEMPTS``, then dead-lettered (status
+``dead``) for inspection and manual retry through the API. A job whose
+transform already succeeded on the entity within
+``APP_TRANSFORM_FRESH_HOURS`` completes without calling the provider.
+With ``APP_REFRESH_TRANSFORMS`` set, the worker also queues refreshes of
+stale entities (see ``app.refresh``). It also prunes archived provider
+responses that no entity links to any more (see ``app.transforms.archive``).
+SIGTERM/SIGINT stop claiming and let running jobs finish.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.invalidation import invalidation_listener
+from app.refresh import RefreshScheduler
+from app.schemas import TransformJob
+from app.storage import store
+from app.transforms.archive import ArchivePruner
+from app.transforms.dispatcher import run_transforms
+from app.transforms.upstream import is_transient
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 3600.0
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, KeyError):  # the entity was deleted
+        return False
+    # any other 4xx from a provider will not change on retry
+    return is_transient(exc)
+
+
+class TransformWorker:
+    def __init__(
+        self,
+        store,
+        concurrency: int = 8,
+        lease_seconds: float = 120.0,
+        poll_interval: float = 1.0,
+        retry_delay: float = 15.0,
+        fresh_hours: float = 0.0,
+        worker_id: Optional[str] = None,
+    ):
+        self._store = store
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.fresh_hours = fresh_hours
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._inflight: Dict[int, TransformJob] = {}
+        self._inflight_lock = threading.Lock()
+        self._slot_free = threading.Event()
+        self._stop = threading.Event()
+        self._drained = threading.Event()
+        self.succeeded = 0
+        self.failed = 0
+
+    # Lifecycle -----------------------------------------------------------
+    def run(self) -> None:
+        """Claim and run jobs until ``stop`` is called; returns once running jobs finish."""
+        heartbeat = threading.Thread(target=self._heartbeat, name="transform-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info("Transform worker %s started (%d slots)", self.worker_id, self.concurrency)
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="transform") as pool:
+            while not self._stop.is_set():
+                free = self.concurrency - self.running()
+                if free <= 0:
+                    self._slot_free.wait(self.poll_interval)
+                    self._slot_free.clear()
+                    continue
+                try:
+                    jobs = self._store.claim_transform_jobs(self.worker_id, free, self.lease_seconds)
+                except Exception:
+                    logger.exception("Could not claim transform jobs")
+                    jobs = []
+                for job in jobs:
+                    with self._inflight_lock:
+                        self._inflight[job.id] = job
+                    pool.submit(self._execute, job)
+                if not jobs:
+                    self._stop.wait(self.poll_interval)
+        # leaving the pool waited for running jobs; their leases were kept alive meanwhile
+        self._drained.set()
+        heartbeat.join()
+        logger.info("Transform worker %s stopped (%d succeeded, %d failed)", self.worker_id, self.succeeded, self.failed)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._slot_free.set()
+
+    def running(self) -> int:
+        with self._inflight_lock:
+            return len(self._inflight)
+
+    # Jobs ----------------------------------------------------------------
+    def _execute(self, job: TransformJob) -> None:
+        try:
+            entity = self._store.get_entity(job.owner, job.entity_id)
+            result = run_transforms(
+                entity, job.owner, job.transform, job_id=job.id, fresh_hours=self.fresh_hours, refresh=job.refresh
+            )
+        except Exception as exc:
+            self.failed += 1
+            retry_in = None
+            if is_retryable(exc) and job.attempts < job.max_attempts:
+                backoff = min(self.retry_delay * 2 ** (job.attempts - 1), MAX_RETRY_DELAY)
+                # an open circuit says when the provider may be called again
+                backoff = max(backoff, getattr(exc, "retry_after", 0.0))
+                retry_in = backoff * random.uniform(0.8, 1.2)
+            logger.warning("Transform job %s attempt %d/%d failed: %s", job.id, job.attempts, job.max_attempts, exc)
+            self._finish(job, self._store.fail_transform_job, f"{type(exc).__name__}: {exc}"[:2000], retry_in)
+        else:
+            self.succeeded += 1
+            self._finish(job, self._store.complete_transform_job, result)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(job.id, None)
+            self._slot_free.set()
+
+    def _finish(self, job: TransformJob, record, *args) -> None:
+        try:
+            if not record(self.worker_id, job.id, *args):
+                logger.warning("Lease on transform job %s was lost; its outcome was not recorded", job.id)
+        except Exception:
+            # the lease will expire and the job will run again
+            logger.exception("Could not record the outcome of transform job %s", job.id)
+
+    def _heartbeat(self) -> None:
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self._drained.wait(interval):
+            with self._inflight_lock:
+                job_ids = list(self._inflight)
+            if not job_ids:
+                continue
+            try:
+                held = set(self._store.heartbeat_transform_jobs(self.worker_id, job_ids, self.lease_seconds))
+            except Exception:
+                logger.exception("Transform job heartbeat failed")
+                continue
+            for job_id in set(job_ids) - held:
+                logger.warning("Lease on transform job %s expired while it was running", job_id)
+
+
+def _build_worker(concurrency: Optional[int] = None) -> TransformWorker:
+    settings = get_settings()
+    return TransformWorker(
+        store,
+        concurrency=concurrency or settings.worker_concurrency,
+        lease_seconds=settings.transform_job_lease_seconds,
+        poll_interval=settings.worker_poll_interval,
+        retry_delay=settings.transform_job_retry_delay,
+        fresh_hours=settings.transform_fresh_hours,
+    )
+
+
+def _build_scheduler() -> RefreshScheduler:
+    settings = get_settings()
+    return RefreshScheduler(
+        store,
+        settings.refresh_transforms,
+        stale_hours=settings.refresh_stale_hours,
+        interval=settings.refresh_interval,
+        max_per_hour=settings.refresh_max_per_hour,
+        max_attempts=settings.transform_job_max_attempts,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=None, help="jobs run at once (APP_WORKER_CONCURRENCY)")
+    parser.add_argument("--no-refresh", action="store_true", help="do not schedule refreshes of stale entities")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    worker = _build_worker(args.concurrency)
+    scheduler = None if args.no_refresh else _build_scheduler()
+    pruner = ArchivePruner(store, get_settings().raw_response_prune_interval)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: worker.stop())
+    store.open()
+    # providers' API keys may be cached here; keep them in step with the API tier
+    invalidation_listener.start()
+    if scheduler is not None:
+        scheduler.start()
+    pruner.start()
+    try:
+        worker.run()
+    finally:
+        pruner.stop()
+        if scheduler is not None:
+            scheduler.stop()
+        invalidation_listener.stop()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
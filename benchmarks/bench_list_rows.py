@@ -0,0 +1,84 @@
+"""Benchmark the bulk read path of the list endpoints at 10k/100k rows.
+
+Compares, per row count, the old path (dict row -> validated pydantic
+model -> FastAPI response validation + jsonable_encoder + json.dumps)
+with the tuple-cursor path (tuple -> slotted row -> JSONResponse).
+Database time is excluded; rows are synthesized in memory.
+
+    python -m benchmarks.bench_list_rows [--rows 10000 100000]
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+
+from app.rows import ActivityLogRow, EntityRow, RelationshipRow, rows_to_json
+from app.schemas import ActivityLog, Entity, Relationship
+
+
+def entity_tuples(n):
+    return [
+        (i, i % 50, f"host-{i}.example.com", "domain", f"Seen in campaign {i % 97}", "alice", {"abuse_score": i % 101})
+        for i in range(n)
+    ]
+
+
+def relationship_tuples(n):
+    return [(i, i, i + 1, "resolves_to", "alice") for i in range(n)]
+
+
+def activity_tuples(n):
+    now = datetime.now(timezone.utc)
+    return [(i, "created", "entity", i, f"host-{i}", "Type: domain", i % 50, "alice", now) for i in range(n)]
+
+
+def old_path(model, columns, tuples):
+    dict_rows = [dict(zip(columns, t)) for t in tuples]  # what RealDictCursor hands back
+    models = [model(**r) for r in dict_rows]
+    validated = parse_obj_as(List[model], models)  # FastAPI response_model validation
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def new_path(row_type, tuples):
+    rows = [row_type(*t) for t in tuples]
+    return JSONResponse(rows_to_json(rows)).body
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    body = fn(*args)
+    return time.perf_counter() - start, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    cases = [
+        ("entities", Entity, EntityRow,
+         ["id", "case_id", "name", "kind", "description", "owner", "attributes"], entity_tuples),
+        ("relationships", Relationship, RelationshipRow,
+         ["id", "source_entity_id", "target_entity_id", "relation", "owner"], relationship_tuples),
+        ("timeline", ActivityLog, ActivityLogRow,
+         ["id", "action", "resource_type", "resource_id", "resource_name", "details", "case_id", "owner",
+          "created_at"], activity_tuples),
+    ]
+    print(f"{'endpoint':<14}{'rows':>8}{'pydantic (s)':>14}{'rows (s)':>10}{'speedup':>9}")
+    for n in args.rows:
+        for name, model, row_type, columns, make in cases:
+            tuples = make(n)
+            old_s, old_body = timed(old_path, model, columns, tuples)
+            new_s, new_body = timed(new_path, row_type, tuples)
+            assert json.loads(old_body) == json.loads(new_body), f"{name}: output differs"
+            print(f"{name:<14}{n:>8}{old_s:>14.3f}{new_s:>10.3f}{old_s / new_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Micro-benchmark of response serialization for the list and graph endpoints.
+
+Starting from the same slotted rows, compares three encoders:
+
+* ``response_model``: FastAPI's default path (pydantic re-validation of the
+  return value, ``jsonable_encoder``, stdlib ``json``);
+* ``JSONResponse``: ``rows_to_json`` dicts through stdlib ``json``;
+* ``FastJSONResponse``: rows handed straight to orjson.
+
+Every body is checked to decode to the same JSON as the ``response_model``
+path. Database time is excluded; rows are synthesized in memory.
+
+    python -m benchmarks.bench_serialization [--rows 10000 100000]
+"""
+
+import argparse
+import json
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+
+from app.responses import FastJSONResponse
+from app.rows import ActivityLogRow, EntityRow, RelationshipRow, rows_to_json
+from app.schemas import ActivityLog, Entity, GraphNeighborhood, Relationship
+from benchmarks.bench_list_rows import activity_tuples, entity_tuples, relationship_tuples
+
+
+def response_model_path(schema, content):
+    validated = parse_obj_as(schema, content)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def json_response_path(schema, content):
+    if isinstance(content, dict):
+        content = {k: rows_to_json(v) if isinstance(v, list) else v for k, v in content.items()}
+    else:
+        content = rows_to_json(content)
+    return JSONResponse(content).body
+
+
+def orjson_path(schema, content):
+    return FastJSONResponse(content).body
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    body = fn(*args)
+    return time.perf_counter() - start, body
+
+
+def as_models(content):
+    """The same payload with pydantic models in place of rows, as a route would return it."""
+    if isinstance(content, dict):
+        return {k: as_models(v) for k, v in content.items()}
+    if isinstance(content, list):
+        return [row.to_model() for row in content]
+    return content
+
+
+def payloads(n):
+    entities = [EntityRow(*t) for t in entity_tuples(n)]
+    relationships = [RelationshipRow(*t) for t in relationship_tuples(n)]
+    return [
+        ("entities", List[Entity], entities),
+        ("relationships", List[Relationship], relationships),
+        ("timeline", List[ActivityLog], [ActivityLogRow(*t) for t in activity_tuples(n)]),
+        ("neighbors", GraphNeighborhood, {"nodes": entities, "edges": relationships, "truncated": False}),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<14}{'rows':>8}{'response_model (s)':>20}{'json (s)':>10}{'orjson (s)':>12}{'speedup':>9}")
+    for n in args.rows:
+        for name, schema, rows in payloads(n):
+            base_s, base_body = timed(response_model_path, schema, as_models(rows))
+            json_s, json_body = timed(json_response_path, schema, rows)
+            fast_s, fast_body = timed(orjson_path, schema, rows)
+            expected = json.loads(base_body)
+            assert json.loads(json_body) == expected, f"{name}: JSONResponse output differs"
+            assert json.loads(fast_body) == expected, f"{name}: FastJSONResponse output differs"
+            print(f"{name:<14}{n:>8}{base_s:>20.3f}{json_s:>10.3f}{fast_s:>12.3f}{base_s / fast_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark cold start of the application in fresh interpreters.
+
+Each scenario runs in a new ``python`` process (so nothing is cached in
+``sys.modules``) and reports the median and best wall time over several runs:
+
+- ``import``: ``import app.main`` only -- no database connection is made.
+- ``ready``: import plus the lifespan startup (store open, schema setup,
+  activity writer), i.e. the point a worker can take requests.
+- ``eager``: ``ready`` plus importing every transform provider and the
+  analytics stack up front, which is what startup used to cost.
+
+The sqlite backend on a temporary file is used by default, so no database
+server is needed; pass ``--backend postgres`` to time against DATABASE_URL.
+
+    python -m benchmarks.bench_startup [--runs 7] [--backend sqlite]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ["psycopg2", "requests", "numpy", "scipy", "app.analytics", "app.transforms.ip"]
+
+_SCENARIO = r"""
+import asyncio, importlib, json, sys, time
+
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter() - start
+loaded = [m for m in {heavy!r} if m in sys.modules]
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        if {eager!r}:
+            importlib.import_module("app.analytics")
+            from app.transforms.dispatcher import TRANSFORM_MAP, load_transform
+            for providers in TRANSFORM_MAP.values():
+                for provider in providers:
+                    load_transform(provider["func"])
+        ready = time.perf_counter() - start
+    return ready
+
+ready = asyncio.run(startup()) if {startup!r} else imported
+print(json.dumps({{"seconds": ready, "loaded": loaded}}))
+"""
+
+
+def run_once(scenario, env):
+    code = _SCENARIO.format(heavy=HEAVY_MODULES, startup=scenario != "import", eager=scenario == "eager")
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite")
+    args = parser.parse_args()
+
+    env = dict(os.environ, APP_STORAGE_BACKEND=args.backend, APP_ACTIVITY_LOG_MODE="sync")
+    if args.backend == "sqlite":
+        env["APP_SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "startup.db")
+
+    print(f"{'scenario':<10}{'median (ms)':>12}{'best (ms)':>11}  modules loaded by import")
+    for scenario in ("import", "ready", "eager"):
+        results = [run_once(scenario, env) for _ in range(args.runs)]
+        times = [r["seconds"] * 1000 for r in results]
+        loaded = ", ".join(results[-1]["loaded"]) or "-"
+        print(f"{scenario:<10}{statistics.median(times):>12.1f}{min(times):>11.1f}  {loaded}")
+
+
+if __name__ == "__main__":
+    main()
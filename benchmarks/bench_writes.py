@@ -0,0 +1,196 @@
+"""Benchmark API write paths against Postgres: round trips and latency per call.
+
+Compares, per operation, the previous store flow (look the row up, write,
+read it back -- each step its own transaction) with the current single
+prepared statement that checks ownership in SQL and returns the row. Both
+run over the same pooled connections, so connection setup is excluded and
+the difference is purely statements and round trips.
+
+Needs ``DATABASE_URL``; writes under a fresh owner name and removes its case
+afterwards.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_writes [--ops 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+from app.indicators import normalize_indicator
+from app.schemas import CaseCreate, EntityCreate, EntityUpdate, RelationshipCreate, RelationshipUpdate
+from app.storage.postgres import PostgresStore, _Connection
+
+
+class _CountingCursor:
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, query, params=None):
+        _CountingConnection.statements += 1
+        return self._cur.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cur.close()
+
+
+class _CountingConnection(_Connection):
+    """Counts statements sent by the application (BEGIN/COMMIT are not included)."""
+
+    statements = 0
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(super().cursor(*args, **kwargs))
+
+
+class CountingStore(PostgresStore):
+    connection_class = _CountingConnection
+
+
+# The previous flows, one transaction per step as the store used to run them.
+def _query(store, sql, params):
+    with store._connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchone() if cur.description else None
+
+
+def legacy_create_entity(store, owner, case_id, i):
+    if not _query(store, "SELECT * FROM cases WHERE id = %s AND owner = %s", (case_id, owner)):
+        raise KeyError("Case not found")
+    name = f"10.0.{i // 256 % 256}.{i % 256}"
+    return _query(
+        store,
+        "INSERT INTO entities (case_id, name, kind, description, indicator, owner) "
+        "VALUES (%s, %s, %s, %s, %s, %s) RETURNING id",
+        (case_id, name, "ip", None, normalize_indicator("ip", name), owner),
+    )["id"]
+
+
+def legacy_update_entity(store, owner, entity_id, i):
+    _query(store, "SELECT * FROM entities WHERE id = %s AND owner = %s", (entity_id, owner))
+    _query(store, "UPDATE entities SET description=%s WHERE id=%s AND owner=%s", (f"note {i}", entity_id, owner))
+    return _query(store, "SELECT * FROM entities WHERE id = %s AND owner = %s", (entity_id, owner))
+
+
+def legacy_rename_entity(store, owner, entity_id, i):
+    current = _query(store, "SELECT * FROM entities WHERE id = %s AND owner = %s", (entity_id, owner))
+    name = f"10.2.{i // 256 % 256}.{i % 256}"
+    _query(store, "UPDATE entities SET name=%s, indicator=%s WHERE id=%s AND owner=%s",
+           (name, normalize_indicator(current["kind"], name), entity_id, owner))
+    return _query(store, "SELECT * FROM entities WHERE id = %s AND owner = %s", (entity_id, owner))
+
+
+def legacy_create_relationship(store, owner, source_id, target_id):
+    source = _query(store, "SELECT * FROM entities WHERE id = %s AND owner = %s", (source_id, owner))
+    target = _query(store, "SELECT * FROM entities WHERE id = %s AND owner = %s", (target_id, owner))
+    if source["case_id"] != target["case_id"]:
+        raise ValueError("Entities must belong to the same case")
+    return _query(
+        store,
+        "INSERT INTO relationships (source_entity_id, target_entity_id, relation, owner) "
+        "VALUES (%s, %s, %s, %s) RETURNING id",
+        (source_id, target_id, "resolves_to", owner),
+    )["id"]
+
+
+def legacy_update_relationship(store, owner, relationship_id, i):
+    _query(store, "SELECT * FROM relationships WHERE id = %s AND owner = %s", (relationship_id, owner))
+    _query(store, "UPDATE relationships SET relation=%s WHERE id=%s AND owner=%s", (f"r{i}", relationship_id, owner))
+    return _query(store, "SELECT * FROM relationships WHERE id = %s AND owner = %s", (relationship_id, owner))
+
+
+def legacy_delete_entity(store, owner, entity_id):
+    _query(store, "SELECT * FROM entities WHERE id = %s AND owner = %s", (entity_id, owner))
+    with store._connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM relationships WHERE owner = %s AND (source_entity_id = %s OR target_entity_id = %s)",
+                (owner, entity_id, entity_id),
+            )
+            cur.execute("DELETE FROM entities WHERE id = %s AND owner = %s", (entity_id, owner))
+
+
+def measure(label, legacy, current, ops):
+    rows = []
+    for fn in (legacy, current):
+        before = _CountingConnection.statements
+        start = time.perf_counter()
+        for i in range(ops):
+            fn(i)
+        elapsed = time.perf_counter() - start
+        rows.append((elapsed / ops * 1000, (_CountingConnection.statements - before) / ops))
+    (old_ms, old_q), (new_ms, new_q) = rows
+    print(f"{label:<22}{old_q:>8.1f}{new_q:>8.1f}{old_ms:>12.3f}{new_ms:>12.3f}{old_ms / new_ms:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=500)
+    args = parser.parse_args()
+    if not os.environ.get("DATABASE_URL"):
+        sys.exit("DATABASE_URL is not set")
+
+    store = CountingStore(1, 1)  # one connection, so statements never wait on each other
+    owner = f"bench-{uuid.uuid4().hex[:8]}"
+    case = store.create_case(owner, CaseCreate(name="write benchmark"))
+    hub = store.create_entity(owner, EntityCreate(case_id=case.id, name="hub.example.com", kind="domain"))
+    # warm up: prepare every statement on the connection before counting
+    warm = store.create_entity(owner, EntityCreate(case_id=case.id, name="1.1.1.1", kind="ip"))
+    rel = store.create_relationship(owner, RelationshipCreate(source_entity_id=hub.id, target_entity_id=warm.id,
+                                                              relation="resolves_to"))
+    store.update_entity(owner, warm.id, EntityUpdate(description="warm"))
+    store.update_entity(owner, warm.id, EntityUpdate(name="1.1.1.2"))
+    store.update_relationship(owner, rel.id, RelationshipUpdate(relation="warm"))
+    store.delete_entity(owner, warm.id)
+
+    created = {"previous": [], "single": []}
+
+    def create(kind):
+        def run(i):
+            if kind == "previous":
+                created[kind].append(legacy_create_entity(store, owner, case.id, i))
+            else:
+                name = f"10.1.{i // 256 % 256}.{i % 256}"
+                created[kind].append(store.create_entity(owner, EntityCreate(case_id=case.id, name=name, kind="ip")).id)
+        return run
+
+    print(f"{'operation':<22}{'stmts':>8}{'stmts':>8}{'prev (ms)':>12}{'single (ms)':>12}{'speedup':>9}")
+    print(f"{'':<22}{'prev':>8}{'single':>8}")
+    try:
+        measure("create_entity", create("previous"), create("single"), args.ops)
+        ids = created["previous"] + created["single"]
+        measure("update_entity",
+                lambda i: legacy_update_entity(store, owner, ids[i], i),
+                lambda i: store.update_entity(owner, ids[i], EntityUpdate(description=f"note {i}")), args.ops)
+        measure("rename_entity",
+                lambda i: legacy_rename_entity(store, owner, ids[i], i),
+                lambda i: store.update_entity(owner, ids[i], EntityUpdate(name=f"10.3.{i // 256 % 256}.{i % 256}")),
+                args.ops)
+        rels = {"previous": [], "single": []}
+        measure("create_relationship",
+                lambda i: rels["previous"].append(legacy_create_relationship(store, owner, hub.id, ids[i])),
+                lambda i: rels["single"].append(store.create_relationship(
+                    owner, RelationshipCreate(source_entity_id=hub.id, target_entity_id=ids[i], relation="resolves_to")
+                ).id), args.ops)
+        measure("update_relationship",
+                lambda i: legacy_update_relationship(store, owner, rels["previous"][i], i),
+                lambda i: store.update_relationship(owner, rels["single"][i], RelationshipUpdate(relation=f"r{i}")),
+                args.ops)
+        measure("delete_entity",
+                lambda i: legacy_delete_entity(store, owner, created["previous"][i]),
+                lambda i: store.delete_entity(owner, created["single"][i]), args.ops)
+    finally:
+        store.delete_case(owner, case.id)
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
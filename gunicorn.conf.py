@@ -0,0 +1,31 @@
+"""Gunicorn settings for running GhostLock with several worker processes.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Each worker is a uvicorn event loop with its own connection pool, so
+throughput scales with cores. ``WEB_CONCURRENCY`` sets the worker count
+(default: one per CPU). The app is imported once in the master and forked;
+that is safe because importing it opens no connections -- every worker opens
+its own store in the lifespan. Workers share cached principals, API keys and
+case graphs through ``APP_CACHE_URL`` and drop stale entries on Postgres
+NOTIFY (see ``app.cache`` and ``app.invalidation``).
+"""
+
+import logging
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '3000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+preload_app = True
+graceful_timeout = 30
+keepalive = 5
+# recycle workers now and then so a slow leak never takes the node down
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+if os.environ.get("APP_STORAGE_BACKEND", "postgres").lower() == "sqlite" and workers > 1:
+    # one process owns the embedded database's write lock
+    logging.getLogger("gunicorn.error").warning("APP_STORAGE_BACKEND=sqlite: running a single worker")
+    workers = 1
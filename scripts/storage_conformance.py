@@ -0,0 +1,491 @@
+"""Run the same storage checks against each backend.
+
+Exercises the ``Store`` interface end to end (users, API keys, cases,
+entities, entity attributes, relationships, graph loading, indicator
+pivots, activity paging and retention, search, comments, the transform
+job queue and refresh scheduling, transform run history and the raw
+response archive) and reports any check whose result
+differs from what the API promises. Each run uses fresh owner names, so
+it can be pointed at a shared Postgres database -- but not while transform
+workers use it: the job queue checks claim whatever jobs are due.
+
+    python -m scripts.storage_conformance                 # sqlite (temp file)
+    python -m scripts.storage_conformance --backend postgres   # needs DATABASE_URL
+    python -m scripts.storage_conformance --backend all
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.attributes import parse_filter, parse_sort
+from app.changes import changes
+from app.schemas import (
+    ApiKeyCreate,
+    ApiKeyUpdate,
+    CaseCreate,
+    CaseUpdate,
+    CommentCreate,
+    EntityCreate,
+    EntityUpdate,
+    RelationshipCreate,
+    RelationshipUpdate,
+    TransformRunCreate,
+    UserCreate,
+)
+from app.storage.base import Store
+
+
+class Check:
+    def __init__(self):
+        self.failures = []
+        self.passed = 0
+
+    def equal(self, label, actual, expected):
+        if actual == expected:
+            self.passed += 1
+        else:
+            self.failures.append(f"{label}: expected {expected!r}, got {actual!r}")
+
+    def true(self, label, condition):
+        self.equal(label, bool(condition), True)
+
+    def raises(self, label, exc_type, fn, *args, **kwargs):
+        try:
+            fn(*args, **kwargs)
+        except exc_type:
+            self.passed += 1
+        except Exception as exc:  # noqa: BLE001
+            self.failures.append(f"{label}: expected {exc_type.__name__}, got {type(exc).__name__}: {exc}")
+        else:
+            self.failures.append(f"{label}: expected {exc_type.__name__}, nothing raised")
+
+
+def check_users(store: Store, check: Check, owner: str):
+    user = store.create_user(UserCreate(username=owner, password="conformance-pw"))
+    check.equal("create_user username", user.username, owner)
+    check.raises("create_user duplicate", ValueError, store.create_user, UserCreate(username=owner, password="x" * 8))
+    check.equal("get_user", store.get_user(owner).username, owner)
+    check.equal("get_user missing", store.get_user(owner + "-missing"), None)
+    check.equal("authenticate ok", store.authenticate(owner, "conformance-pw").username, owner)
+    check.equal("authenticate bad password", store.authenticate(owner, "wrong"), None)
+
+
+def check_api_keys(store: Store, check: Check, owner: str):
+    key = store.create_api_key(owner, ApiKeyCreate(name="shodan", description="primary"))
+    check.true("create_api_key active", key.active)
+    check.true("create_api_key value", key.key.startswith("key-"))
+    check.equal("list_api_keys", [k.id for k in store.list_api_keys(owner)], [key.id])
+    updated = store.update_api_key(owner, key.id, ApiKeyUpdate(active=False))
+    check.equal("update_api_key active", updated.active, False)
+    check.equal("update_api_key keeps fields", (updated.name, updated.description), ("shodan", "primary"))
+    check.raises("get_api_key other owner", KeyError, store.get_api_key, owner + "-other", key.id)
+    check.raises("update_api_key other owner", KeyError, store.update_api_key, owner + "-other", key.id,
+                 ApiKeyUpdate(active=True))
+    check.raises("delete_api_key other owner", KeyError, store.delete_api_key, owner + "-other", key.id)
+    store.delete_api_key(owner, key.id)
+    check.equal("delete_api_key", store.list_api_keys(owner), [])
+
+
+def check_graph_data(store: Store, check: Check, owner: str):
+    case = store.create_case(owner, CaseCreate(name="Conformance case", description="first"))
+    other = store.create_case(owner, CaseCreate(name="Second case"))
+    check.equal("get_case", store.get_case(owner, case.id).name, "Conformance case")
+    check.equal("update_case", store.update_case(owner, case.id, CaseUpdate(description="edited")).description, "edited")
+    check.raises("get_case other owner", KeyError, store.get_case, owner + "-other", case.id)
+    check.raises("update_case other owner", KeyError, store.update_case, owner + "-other", case.id,
+                 CaseUpdate(name="stolen"))
+    check.equal("list_cases", sorted(c.id for c in store.list_cases(owner)), sorted([case.id, other.id]))
+
+    ip = store.create_entity(owner, EntityCreate(case_id=case.id, name="8.8.8.8", kind="ip", description="resolver"))
+    domain = store.create_entity(owner, EntityCreate(case_id=case.id, name="Evil.Example.COM", kind="domain"))
+    host = store.create_entity(
+        owner, EntityCreate(case_id=case.id, name="mailhost", kind="hostname", description="beacon relay")
+    )
+    defanged = store.create_entity(owner, EntityCreate(case_id=other.id, name="evil[.]example[.]com", kind="domain"))
+    check.raises("create_entity missing case", KeyError, store.create_entity,
+                 owner, EntityCreate(case_id=other.id + 10_000, name="x", kind="ip"))
+    check.equal("list_entity_rows by case", [r.id for r in store.list_entity_rows(owner, case.id)],
+                [ip.id, domain.id, host.id])
+    check.equal("list_entities all", [e.id for e in store.list_entities(owner)], [ip.id, domain.id, host.id, defanged.id])
+    check.equal("get_entity_rows order", [r.id for r in store.get_entity_rows(owner, [host.id, ip.id, 10**9])],
+                [host.id, ip.id])
+    check.equal("update_entity", store.update_entity(owner, host.id, EntityUpdate(description="c2 relay")).description,
+                "c2 relay")
+    check.raises("update_entity other owner", KeyError, store.update_entity, owner + "-other", host.id,
+                 EntityUpdate(name="x"))
+    check.raises("create_entity other owner's case", KeyError, store.create_entity,
+                 owner + "-other", EntityCreate(case_id=case.id, name="x", kind="ip"))
+    renamed = store.update_entity(owner, defanged.id, EntityUpdate(name="evil[.]example[.]org"))
+    check.equal("update_entity name only keeps kind", renamed.kind, "domain")
+    check.equal("update_entity reindexes indicator",
+                [p.entity_ids for p in store.find_indicator_cases(owner, "evil.example.org")], [[defanged.id]])
+    store.update_entity(owner, defanged.id, EntityUpdate(name="evil[.]example[.]com"))
+    store.update_entity(owner, defanged.id, EntityUpdate(kind="note"))
+    check.equal("update_entity kind only drops indicator",
+                [p.entity_ids for p in store.find_indicator_cases(owner, "evil.example.com")], [[domain.id]])
+    store.update_entity(owner, defanged.id, EntityUpdate(kind="Hostname"))
+    check.equal("update_entity kind only reindexes indicator",
+                [p.entity_ids for p in store.find_indicator_cases(owner, "evil.example.com")],
+                [[domain.id], [defanged.id]])
+    store.update_entity(owner, defanged.id, EntityUpdate(name="EVIL[.]example[.]com"))
+    check.equal("update_entity name only uses stored kind alias",
+                [p.entity_ids for p in store.find_indicator_cases(owner, "evil.example.com")],
+                [[domain.id], [defanged.id]])
+    store.update_entity(owner, defanged.id, EntityUpdate(kind="domain"))
+
+    pivot = store.find_indicator_cases(owner, "evil.example.com")
+    check.equal("find_indicator_cases cases", [p.case_id for p in pivot], [case.id, other.id])
+    check.equal("find_indicator_cases entities", [p.entity_ids for p in pivot], [[domain.id], [defanged.id]])
+
+    resolves = store.create_relationship(
+        owner, RelationshipCreate(source_entity_id=domain.id, target_entity_id=ip.id, relation="resolves_to")
+    )
+    relays = store.create_relationship(
+        owner, RelationshipCreate(source_entity_id=host.id, target_entity_id=domain.id, relation="contacts")
+    )
+    check.raises("create_relationship across cases", ValueError, store.create_relationship, owner,
+                 RelationshipCreate(source_entity_id=ip.id, target_entity_id=defanged.id, relation="x"))
+    check.raises("create_relationship missing entity", KeyError, store.create_relationship, owner,
+                 RelationshipCreate(source_entity_id=ip.id, target_entity_id=10**9, relation="x"))
+    check.raises("create_relationship other owner", KeyError, store.create_relationship, owner + "-other",
+                 RelationshipCreate(source_entity_id=ip.id, target_entity_id=domain.id, relation="x"))
+    check.equal("update_relationship",
+                store.update_relationship(owner, relays.id, RelationshipUpdate(relation="beacons_to")).relation,
+                "beacons_to")
+    check.equal("list_relationship_rows by case", [r.id for r in store.list_relationship_rows(owner, case.id)],
+                [resolves.id, relays.id])
+    check.equal("list_relationships all", [r.id for r in store.list_relationships(owner)], [resolves.id, relays.id])
+    check.equal("get_relationship_rows order",
+                [r.id for r in store.get_relationship_rows(owner, [relays.id, resolves.id])], [relays.id, resolves.id])
+
+    graph = store.load_case_graph(owner, case.id)
+    check.equal("load_case_graph nodes", sorted(graph.nodes), sorted([ip.id, domain.id, host.id]))
+    check.equal("load_case_graph edges", sorted(graph.edge_ids), sorted([resolves.id, relays.id]))
+
+    comment = store.create_comment(owner, CommentCreate(entity_id=ip.id, text="Observed beaconing from the resolver"))
+    store.create_comment(owner, CommentCreate(entity_id=ip.id, text="second note"))
+    check.equal("list_comments newest first", [c.text for c in store.list_comments(owner, ip.id)],
+                ["second note", comment.text])
+    check.raises("create_comment other owner's entity", KeyError, store.create_comment, owner + "-other",
+                 CommentCreate(entity_id=ip.id, text="beaconing spotted"))
+    check.raises("create_comment missing entity", KeyError, store.create_comment, owner,
+                 CommentCreate(entity_id=10**9, text="x"))
+
+    hits = store.search(owner, "evil")
+    check.true("search finds entity by name", domain.id in {h.entity_id for h in hits if h.type == "entity"})
+    check.equal("search exact name ranks first", store.search(owner, "mailhost")[0].entity_id, host.id)
+    check.true("search finds description", host.id in {h.entity_id for h in store.search(owner, "relay")})
+    check.true("search finds comment",
+               any(h.type == "comment" and h.id == comment.id for h in store.search(owner, "beaconing")))
+    check.equal("search include_comments=False",
+                [h for h in store.search(owner, "beaconing", include_comments=False) if h.type == "comment"], [])
+    check.equal("search prefix", [h.entity_id for h in store.search(owner, "MAIL", prefix=True)], [host.id])
+    check.equal("search case scope", {h.case_id for h in store.search(owner, "evil", case_id=other.id)}, {other.id})
+    check.equal("search kinds", {h.kind for h in store.search(owner, "evil", kinds=["DOMAIN"])}, {"domain"})
+    check.equal("search other owner", store.search(owner + "-other", "evil"), [])
+    check.equal("search other owner's comments", store.search(owner + "-other", "beaconing"), [])
+
+    check.raises("delete_relationship other owner", KeyError, store.delete_relationship, owner + "-other", resolves.id)
+    check.equal("delete_relationship returns row", store.delete_relationship(owner, resolves.id).relation, "resolves_to")
+    check.equal("delete_relationship", [r.id for r in store.list_relationship_rows(owner, case.id)], [relays.id])
+    check.raises("delete_relationship missing", KeyError, store.delete_relationship, owner, resolves.id)
+    check.raises("delete_entity other owner", KeyError, store.delete_entity, owner + "-other", domain.id)
+    check.equal("delete_entity returns row", store.delete_entity(owner, domain.id).case_id, case.id)
+    check.equal("delete_entity cascades relationships", store.list_relationships(owner), [])
+    check.equal("search after delete", [h for h in store.search(owner, "evil") if h.entity_id == domain.id], [])
+    check.raises("delete_case other owner", KeyError, store.delete_case, owner + "-other", other.id)
+    check.equal("delete_case returns row", store.delete_case(owner, other.id).name, "Second case")
+    check.raises("delete_case", KeyError, store.get_case, owner, other.id)
+    check.equal("delete_case entities", [e.id for e in store.list_entities(owner)], [ip.id, host.id])
+
+
+def check_attributes(store: Store, check: Check, owner: str):
+    case = store.create_case(owner, CaseCreate(name="Attribute case"))
+
+    def make(name, **attributes):
+        return store.create_entity(owner, EntityCreate(case_id=case.id, name=name, kind="ip", attributes=attributes))
+
+    low = make("10.0.0.1", abuse_score=12, country="US", registrant={"country": "RU"})
+    high = make("10.0.0.2", abuse_score=95, country="NL", open_ports=3)
+    mid = make("10.0.0.3", abuse_score=80, country="US", isp=None)
+    text = make("10.0.0.4", abuse_score="95")
+    bare = make("10.0.0.5")
+    tagged = make("10.0.0.6", tags=["tor", "vpn"], whois={"registrar": "x", "country": "RU"})
+    check.equal("create_entity attributes", store.get_entity(owner, low.id).attributes,
+                {"abuse_score": 12, "country": "US", "registrant": {"country": "RU"}})
+    check.equal("create_entity drops null attributes", mid.attributes, {"abuse_score": 80, "country": "US"})
+    check.equal("entity without attributes", store.get_entity(owner, bare.id).attributes, {})
+
+    def ids(*filters, sort=None, limit=None):
+        rows = store.list_entity_rows(owner, case.id, filters=[parse_filter(f) for f in filters],
+                                      sort=parse_sort(sort) if sort else None, limit=limit)
+        return [r.id for r in rows]
+
+    check.equal("attr range", ids("abuse_score>80"), [high.id])
+    check.equal("attr range inclusive", ids("abuse_score>=80"), [high.id, mid.id])
+    check.equal("attr range is type-strict", ids('abuse_score>="80"'), [text.id])
+    check.equal("attr equality", ids("country=US"), [low.id, mid.id])
+    check.equal("attr equality is type-strict", ids("abuse_score=95"), [high.id])
+    check.equal("attr inequality", ids("country!=US"), [high.id])
+    check.equal("attr exists", ids("open_ports"), [high.id])
+    check.equal("attr nested path", ids("registrant.country=RU"), [low.id])
+    check.equal("attr array equality", ids('tags=["tor", "vpn"]'), [tagged.id])
+    check.equal("attr array equality is not containment", ids('tags=["tor"]'), [])
+    check.equal("attr object equality is not containment", ids('whois={"country": "RU"}'), [])
+    check.equal("attr filters combine", ids("country=US", "abuse_score<50"), [low.id])
+    # how numbers and strings interleave in a mixed-type sort is up to the backend
+    check.equal("attr sort descending", ids("abuse_score>=0", sort="-abuse_score"), [high.id, mid.id, low.id])
+    check.equal("attr sort missing last", ids(sort="-open_ports")[0], high.id)
+    check.equal("attr sort ascending, missing last", ids(sort="open_ports")[0], high.id)
+    check.equal("attr sort ties by id", ids("country=US", sort="country"), [low.id, mid.id])
+    check.equal("attr limit", ids("abuse_score>=0", sort="-abuse_score", limit=2), [high.id, mid.id])
+    check.equal("attr other owner", store.list_entity_rows(owner + "-other", case.id,
+                                                           filters=[parse_filter("abuse_score")]), [])
+
+    updated = store.update_entity(owner, low.id, EntityUpdate(attributes={"abuse_score": 99, "country": None, "asn": 64500}))
+    check.equal("update_entity merges attributes", updated.attributes,
+                {"abuse_score": 99, "registrant": {"country": "RU"}, "asn": 64500})
+    check.equal("update_entity keeps attributes",
+                store.update_entity(owner, low.id, EntityUpdate(description="noisy")).attributes, updated.attributes)
+    check.equal("attr after update", ids("abuse_score>90"), [low.id, high.id])
+    check.equal("attr removed by update", ids("country=US"), [mid.id])
+
+
+def check_activity(store: Store, check: Check, owner: str):
+    base = datetime.now(timezone.utc) - timedelta(minutes=10)
+    events = [
+        {"owner": owner, "action": "created" if i % 2 else "deleted", "resource_type": "entity",
+         "resource_id": i, "resource_name": f"e{i}", "case_id": 1 if i < 5 else 2,
+         "created_at": base + timedelta(seconds=i)}
+        for i in range(10)
+    ]
+    check.equal("log_activities", store.log_activities(events), 10)
+    single = store.log_activity(owner, "updated", "case", resource_id=1, resource_name="c", case_id=1)
+    check.true("log_activity created_at", single.created_at.tzinfo is not None)
+
+    first = store.list_activity_log_rows(owner, limit=4)
+    check.equal("activity newest first", first[0].id, single.id)
+    check.true("activity created_at is datetime", isinstance(first[0].created_at, datetime))
+    seen = [r.id for r in first]
+    cursor = (first[-1].created_at, first[-1].id)
+    while True:
+        page = store.list_activity_log_rows(owner, limit=4, before=cursor)
+        seen.extend(r.id for r in page)
+        if len(page) < 4:
+            break
+        cursor = (page[-1].created_at, page[-1].id)
+    check.equal("activity keyset covers everything once", len(seen), len(set(seen)))
+    check.equal("activity keyset total", len(seen), 11)
+    check.equal("activity case filter", len(store.list_activity_log_rows(owner, limit=50, case_id=2)), 5)
+    check.equal("activity action filter", len(store.list_activity_logs(owner, limit=50, action="deleted")), 5)
+    check.equal("activity since filter",
+                len(store.list_activity_log_rows(owner, limit=50, since=base + timedelta(seconds=8))), 3)
+    check.true("maintain_activity_logs", isinstance(store.maintain_activity_logs(retention_days=0), list))
+
+
+def check_transform_jobs(store: Store, check: Check, owner: str):
+    case = store.create_case(owner, CaseCreate(name="Job queue case"))
+    entity = store.create_entity(owner, EntityCreate(case_id=case.id, name="9.9.9.9", kind="ip"))
+    check.raises("enqueue other owner's entity", KeyError, store.enqueue_transform_job,
+                 owner + "-other", entity.id, "Shodan", 2)
+    job = store.enqueue_transform_job(owner, entity.id, "Shodan", 2)
+    check.equal("enqueue status", (job.status, job.attempts, job.transform), ("queued", 0, "Shodan"))
+    check.equal("list_transform_jobs", [j.id for j in store.list_transform_jobs(owner, status="queued")], [job.id])
+
+    # claims are not per owner: ignore anything else that happened to be due
+    claimed = [j for j in store.claim_transform_jobs("worker-a", 10, 30) if j.owner == owner]
+    check.equal("claim leases the job", [(j.id, j.status, j.attempts, j.lease_owner) for j in claimed],
+                [(job.id, "running", 1, "worker-a")])
+    check.equal("claimed job is not handed out twice",
+                [j.id for j in store.claim_transform_jobs("worker-b", 10, 30) if j.owner == owner], [])
+    check.equal("heartbeat by holder", store.heartbeat_transform_jobs("worker-a", [job.id], 30), [job.id])
+    check.equal("heartbeat by stranger", store.heartbeat_transform_jobs("worker-b", [job.id], 30), [])
+    check.equal("complete by stranger", store.complete_transform_job("worker-b", job.id, {}), False)
+    check.equal("fail with retry", store.fail_transform_job("worker-a", job.id, "HTTPError: 503", 0), True)
+    retried = store.get_transform_job(owner, job.id)
+    check.equal("retry re-queues", (retried.status, retried.last_error), ("queued", "HTTPError: 503"))
+
+    [second] = [j for j in store.claim_transform_jobs("worker-b", 10, 0.2) if j.owner == owner]
+    check.equal("second attempt", second.attempts, 2)
+    time.sleep(0.3)
+    store.claim_transform_jobs("worker-c", 0, 30)
+    dead = store.get_transform_job(owner, job.id)
+    check.equal("expired lease on last attempt dead-letters", dead.status, "dead")
+    check.true("expired lease records why", "worker-b" in (dead.last_error or ""))
+    check.equal("late completion is ignored", store.complete_transform_job("worker-b", job.id, {}), False)
+
+    check.raises("retry of a queued job", ValueError, store.retry_transform_job, owner,
+                 store.enqueue_transform_job(owner, entity.id, "AbuseIPDB", 1).id)
+    revived = store.retry_transform_job(owner, job.id)
+    check.equal("retry_transform_job", (revived.status, revived.attempts), ("queued", 0))
+    done = [j for j in store.claim_transform_jobs("worker-a", 10, 30) if j.id == job.id]
+    check.equal("revived job is claimable", len(done), 1)
+    check.equal("complete", store.complete_transform_job("worker-a", job.id, {"nodes": [1], "message": "ok"}), True)
+    finished = store.get_transform_job(owner, job.id)
+    check.equal("complete stores result", (finished.status, finished.result), ("succeeded", {"nodes": [1], "message": "ok"}))
+    check.true("complete sets finished_at", finished.finished_at is not None)
+    check.raises("get_transform_job other owner", KeyError, store.get_transform_job, owner + "-other", job.id)
+
+
+def check_transform_runs(store: Store, check: Check, owner: str):
+    case = store.create_case(owner, CaseCreate(name="Run history case"))
+    entity = store.create_entity(owner, EntityCreate(case_id=case.id, name="7.7.7.7", kind="ip"))
+    base = datetime.now(timezone.utc) - timedelta(hours=3)
+
+    def record(transform, status, hours_ago, **fields):
+        return store.create_transform_run(owner, TransformRunCreate(
+            entity_id=entity.id, transform=transform, status=status,
+            started_at=base + timedelta(hours=3 - hours_ago), duration_ms=12.5, **fields,
+        ))
+
+    stranger = TransformRunCreate(entity_id=entity.id, transform="Shodan", status="succeeded",
+                                  started_at=base, duration_ms=1)
+    check.raises("create_transform_run other owner's entity", KeyError, store.create_transform_run,
+                 owner + "-other", stranger)
+    version = changes.version(owner)
+    old = record("AbuseIPDB", "succeeded", 3, nodes=2, edges=2, fetched=1)
+    check.true("create_transform_run bumps the owner's ETag", changes.version(owner) != version)
+    check.equal("create_transform_run", (old.owner, old.nodes, old.edges, old.fetched, old.duration_ms),
+                (owner, 2, 2, 1, 12.5))
+    check.true("create_transform_run started_at", abs((old.started_at - base).total_seconds()) < 1)
+    recent = record("AbuseIPDB", "succeeded", 1, job_id=5, changes={"abuse_score": {"old": 10, "new": 90}})
+    check.equal("create_transform_run changes", recent.changes, {"abuse_score": {"old": 10, "new": 90}})
+    failed = record("AbuseIPDB", "failed", 0, error="HTTPError: 503")
+    shodan = record("Shodan", "skipped", 0, message="Missing SHODAN_API_KEY")
+    check.equal("list_transform_runs newest first", [r.id for r in store.list_transform_runs(owner)],
+                [shodan.id, failed.id, recent.id, old.id])
+    check.equal("list_transform_runs filters",
+                [r.id for r in store.list_transform_runs(owner, entity_id=entity.id, transform="AbuseIPDB",
+                                                         status="succeeded")], [recent.id, old.id])
+    page = store.list_transform_runs(owner, limit=2, before_id=failed.id)
+    check.equal("list_transform_runs pages", [r.id for r in page], [recent.id, old.id])
+    check.equal("list_transform_runs other owner", store.list_transform_runs(owner + "-other"), [])
+    check.equal("last_transform_run", store.last_transform_run(owner, entity.id, "AbuseIPDB").id, recent.id)
+    check.equal("last_transform_run status", store.last_transform_run(owner, entity.id, "AbuseIPDB", "failed").id,
+                failed.id)
+    check.equal("last_transform_run none", store.last_transform_run(owner, entity.id, "Shodan"), None)
+    check.equal("last_transform_run other owner", store.last_transform_run(owner + "-other", entity.id, "AbuseIPDB"),
+                None)
+
+
+def check_refresh_jobs(store: Store, check: Check, owner: str):
+    owner += "-refresh"  # keeps these runs out of check_transform_runs' listings
+    case = store.create_case(owner, CaseCreate(name="Refresh case"))
+    stale = store.create_entity(owner, EntityCreate(case_id=case.id, name="6.6.6.6", kind="ip"))
+    staler = store.create_entity(owner, EntityCreate(case_id=case.id, name="6.6.6.7", kind="IP"))
+    fresh = store.create_entity(owner, EntityCreate(case_id=case.id, name="6.6.6.8", kind="ip"))
+    never_ok = store.create_entity(owner, EntityCreate(case_id=case.id, name="6.6.6.9", kind="ip"))
+    # unique per run: refresh scheduling looks at every owner's runs
+    transform = f"Refresh-{uuid.uuid4().hex[:8]}"
+    now = datetime.now(timezone.utc)
+
+    def record(entity, status, hours_ago):
+        store.create_transform_run(owner, TransformRunCreate(
+            entity_id=entity.id, transform=transform, status=status, started_at=now - timedelta(hours=hours_ago),
+            duration_ms=1,
+        ))
+
+    record(stale, "succeeded", 30)
+    record(staler, "succeeded", 50)
+    record(staler, "failed", 40)
+    record(fresh, "succeeded", 30)
+    record(fresh, "failed", 1)  # tried recently: not stale, whatever the outcome
+    record(never_ok, "skipped", 30)
+    cutoff = now - timedelta(hours=24)
+    check.equal("schedule_refresh_jobs other kinds", store.schedule_refresh_jobs(
+        transform, ["domain"], cutoff, 10, 10, 3, 600), [])
+    jobs = store.schedule_refresh_jobs(transform, ["ip"], cutoff, 10, 10, 3, 600)
+    check.equal("schedule_refresh_jobs least recently run first", [j.entity_id for j in jobs], [staler.id, stale.id])
+    check.equal("schedule_refresh_jobs fields", {(j.owner, j.transform, j.refresh, j.max_attempts, j.status)
+                                                 for j in jobs}, {(owner, transform, True, 3, "queued")})
+    if len(jobs) == 2:
+        check.true("schedule_refresh_jobs spreads run_at",
+                   290 <= (jobs[1].run_at - jobs[0].run_at).total_seconds() <= 310)
+    check.equal("schedule_refresh_jobs skips pending", store.schedule_refresh_jobs(
+        transform, ["ip"], cutoff, 10, 10, 3, 600), [])
+    check.equal("schedule_refresh_jobs hourly cap", store.schedule_refresh_jobs(
+        transform, ["ip"], now, 10, 2, 3, 600), [])
+    check.equal("schedule_refresh_jobs limit", len(store.schedule_refresh_jobs(transform, ["ip"], now, 1, 10, 3, 600)),
+                1)
+
+
+def check_raw_responses(store: Store, check: Check, owner: str):
+    case = store.create_case(owner, CaseCreate(name="Archive case"))
+    first = store.create_entity(owner, EntityCreate(case_id=case.id, name="8.8.4.4", kind="ip"))
+    second = store.create_entity(owner, EntityCreate(case_id=case.id, name="8.8.4.4", kind="ip"))
+    content_hash = uuid.uuid4().hex  # unique per run: the payload table is shared by every owner
+    check.raises("archive other owner's entity", KeyError, store.archive_raw_response,
+                 owner + "-other", first.id, "AbuseIPDB", "abuseipdb", content_hash, "zlib", 10, b"payload-1")
+    version = changes.version(owner)
+    old = store.archive_raw_response(owner, first.id, "AbuseIPDB", "abuseipdb", content_hash, "zlib", 10, b"payload-1")
+    check.true("archive_raw_response bumps the owner's ETag", changes.version(owner) != version)
+    check.equal("archive_raw_response", (old.provider, old.content_hash, old.size, old.stored_size, old.job_id),
+                ("abuseipdb", content_hash, 10, 9, None))
+    store.archive_raw_response(owner, second.id, "AbuseIPDB", "abuseipdb", content_hash, "zlib", 10, b"ignored")
+    check.equal("archive dedupes by content hash", store.get_raw_response(owner, old.id)[1], b"payload-1")
+    newer_hash = uuid.uuid4().hex
+    newer = store.archive_raw_response(owner, first.id, "AbuseIPDB", "abuseipdb", newer_hash, "zlib", 10,
+                                       b"payload-2", job_id=7, run_id=3)
+    other = store.archive_raw_response(owner, first.id, "Shodan", "shodan", content_hash, "zlib", 10, b"")
+    check.equal("list_raw_responses newest first", [r.id for r in store.list_raw_responses(owner, first.id)],
+                [other.id, newer.id, old.id])
+    check.equal("list_raw_responses other owner", store.list_raw_responses(owner + "-other", first.id), [])
+    check.raises("get_raw_response other owner", KeyError, store.get_raw_response, owner + "-other", old.id)
+    latest = store.latest_raw_responses(owner, first.id, "AbuseIPDB")
+    check.equal("latest_raw_responses", [(r.id, r.run_id, r.job_id, payload) for r, payload in latest],
+                [(newer.id, 3, 7, b"payload-2")])
+    check.equal("latest_raw_responses unknown transform", store.latest_raw_responses(owner, first.id, "WHOIS"), [])
+
+    store.delete_entity(owner, first.id)
+    check.equal("delete_entity drops its links", store.list_raw_responses(owner, first.id), [])
+    store.prune_raw_responses()
+    check.raises("deleted entity's responses are gone", KeyError, store.get_raw_response, owner, newer.id)
+    check.equal("prune keeps linked payloads",
+                store.get_raw_response(owner, store.list_raw_responses(owner, second.id)[0].id)[1], b"payload-1")
+
+
+def run(store: Store) -> Check:
+    check = Check()
+    owner = f"conformance-{uuid.uuid4().hex[:10]}"
+    for section in (check_users, check_api_keys, check_graph_data, check_attributes, check_activity,
+                    check_transform_jobs, check_refresh_jobs, check_transform_runs, check_raw_responses):
+        try:
+            section(store, check, owner)
+        except Exception:  # noqa: BLE001
+            check.failures.append(f"{section.__name__} crashed:\n{traceback.format_exc()}")
+    return check
+
+
+def build(backend: str) -> Store:
+    if backend == "sqlite":
+        from app.storage.sqlite import SQLiteStore
+
+        return SQLiteStore(os.path.join(tempfile.mkdtemp(), "conformance.db"))
+    from app.storage.postgres import PostgresStore
+
+    return PostgresStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["sqlite", "postgres", "all"], default="sqlite")
+    args = parser.parse_args()
+
+    ok = True
+    for backend in (["sqlite", "postgres"] if args.backend == "all" else [args.backend]):
+        check = run(build(backend))
+        print(f"{backend}: {check.passed} passed, {len(check.failures)} failed")
+        for failure in check.failures:
+            print(f"  FAIL {failure}")
+        ok = ok and not check.failures
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
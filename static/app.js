@@ -479,7 +479,7 @@ async function showTransformOptions(entityId, entityName, entityKind) {
         const transformList = transforms.map(t => 
             `<button class="transform-option-btn" onclick="hideModal('transform-select-modal'); runTransform(${entityId}, '${escapeHtml(entityName)}', '${escapeHtml(entityKind)}', '${escapeHtml(t.name)}')">
                 <strong>${escapeHtml(t.name)}</strong>
-                <small>Requires: ${escapeHtml(t.key_required)}</small>
+                <small>${!t.key_required ? 'Offline, no API key needed' : t.local_first ? `Local data first; the rest requires: ${escapeHtml(t.key_required)}` : `Requires: ${escapeHtml(t.key_required)}`}</small>
             </button>`
         ).join('');
         